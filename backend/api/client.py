@@ -1,14 +1,50 @@
 """
 API client for Open Notebook API.
 This module provides a client interface to interact with the Open Notebook API.
+
+APIClient keeps one pooled keep-alive connection to the API for the life of the
+process, instead of connecting for every request. Idempotent requests are
+retried with jittered exponential backoff when the API is unreachable or
+overloaded. AsyncAPIClient offers the same methods as coroutines.
 """
 
+import asyncio
 import os
-from typing import Dict, List, Optional
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
 import httpx
 from loguru import logger
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+DEFAULT_PAGE_SIZE = 200
+
+# Methods that are safe to send twice; others are only retried when the request
+# could not be sent at all
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUSES = {429, 502, 503, 504}
+RETRY_BASE_DELAY = 0.25
+RETRY_MAX_DELAY = 5.0
+
+# Ids sent per request by the bulk helpers, to keep URLs short
+BULK_BATCH_SIZE = 100
+
+
+def retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Seconds before a retry: the server's Retry-After, or full-jitter backoff."""
+    if retry_after:
+        try:
+            return min(float(retry_after), RETRY_MAX_DELAY)
+        except ValueError:
+            pass
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2**attempt))
+
+
+def batched(ids: List[str], size: int = BULK_BATCH_SIZE) -> List[List[str]]:
+    return [ids[i : i + size] for i in range(0, len(ids), size)]
+
 
 class APIClient:
     """Client for Open Notebook API."""
@@ -21,48 +57,199 @@ class APIClient:
         password = os.getenv("OPEN_NOTEBOOK_PASSWORD")
         if password:
             self.headers["Authorization"] = f"Bearer {password}"
+        self.retries = int(os.getenv("API_CLIENT_RETRIES", "3"))
+        self.http2 = os.getenv("API_CLIENT_HTTP2", "false").lower() == "true"
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv("API_CLIENT_MAX_CONNECTIONS", "20")),
+            keepalive_expiry=30.0,
+        )
+        self._client: Any = None
+        self._client_lock = threading.Lock()
+
+    def _client_options(self) -> Dict[str, Any]:
+        options: Dict[str, Any] = dict(
+            base_url=self.base_url,
+            timeout=self.timeout,
+            headers=self.headers,
+            limits=self.limits,
+        )
+        if self.http2:
+            try:
+                import h2  # noqa: F401
+
+                options["http2"] = True
+            except ImportError:
+                logger.warning(
+                    "API_CLIENT_HTTP2 needs the h2 package (httpx[http2]), "
+                    "using HTTP/1.1"
+                )
+        return options
+
+    @property
+    def client(self) -> httpx.Client:
+        """The pooled HTTP client, created on first use."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = httpx.Client(**self._client_options())
+        return self._client
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def __enter__(self) -> "APIClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _retry_after(
+        self,
+        method: str,
+        idempotent: Optional[bool],
+        attempt: int,
+        response: Optional[httpx.Response] = None,
+        error: Optional[Exception] = None,
+    ) -> Optional[float]:
+        """Seconds to wait before retrying a failed attempt, None to give up."""
+        if attempt >= self.retries:
+            return None
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        if error is not None:
+            # Requests that never reached the API can be sent again whatever
+            # their method
+            unsent = isinstance(error, (httpx.ConnectError, httpx.PoolTimeout))
+            if not (unsent or (idempotent and isinstance(error, httpx.TransportError))):
+                return None
+            return retry_delay(attempt)
+        if response is None or not idempotent:
+            return None
+        if response.status_code in RETRY_STATUSES:
+            return retry_delay(attempt, response.headers.get("Retry-After"))
+        return None
+
+    def _check(self, method: str, response: httpx.Response) -> httpx.Response:
+        """Raise RuntimeError for error statuses; 304 answers a conditional request."""
+        if response.status_code != 304 and response.is_error:
+            logger.error(
+                f"HTTP error {response.status_code} for {method} {response.url}: "
+                f"{response.text}"
+            )
+            raise RuntimeError(
+                f"API request failed: {response.status_code} - {response.text}"
+            )
+        return response
 
     def _make_request(
         self, method: str, endpoint: str, timeout: Optional[float] = None, **kwargs
     ) -> Dict:
         """Make HTTP request to the API."""
-        url = f"{self.base_url}{endpoint}"
-        request_timeout = timeout if timeout is not None else self.timeout
-        
-        # Merge headers
-        headers = kwargs.get("headers", {})
-        headers.update(self.headers)
-        kwargs["headers"] = headers
+        return self._send(method, endpoint, timeout, **kwargs).json()
 
-        try:
-            with httpx.Client(timeout=request_timeout) as client:
-                response = client.request(method, url, **kwargs)
-                response.raise_for_status()
-                return response.json()
-        except httpx.RequestError as e:
-            logger.error(f"Request error for {method} {url}: {str(e)}")
-            raise ConnectionError(f"Failed to connect to API: {str(e)}")
-        except httpx.HTTPStatusError as e:
-            logger.error(
-                f"HTTP error {e.response.status_code} for {method} {url}: {e.response.text}"
-            )
-            raise RuntimeError(
-                f"API request failed: {e.response.status_code} - {e.response.text}"
-            )
-        except Exception as e:
-            logger.error(f"Unexpected error for {method} {url}: {str(e)}")
-            raise
+    def _make_conditional_request(
+        self, method: str, endpoint: str, timeout: Optional[float] = None, **kwargs
+    ) -> Optional[Dict]:
+        """Make HTTP request to the API, returning None for 304 Not Modified."""
+        response = self._send(method, endpoint, timeout, **kwargs)
+        return None if response.status_code == 304 else response.json()
+
+    def _send(
+        self,
+        method: str,
+        endpoint: str,
+        timeout: Optional[float] = None,
+        idempotent: Optional[bool] = None,
+        **kwargs,
+    ) -> httpx.Response:
+        """
+        Send an HTTP request to the API and return the raw response.
+
+        Pass `idempotent=True` for POST requests that only read, so they are
+        retried like GETs.
+        """
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        attempt = 0
+        while True:
+            try:
+                response = self.client.request(method, endpoint, **kwargs)
+            except httpx.RequestError as e:
+                delay = self._retry_after(method, idempotent, attempt, error=e)
+                if delay is None:
+                    logger.error(f"Request error for {method} {endpoint}: {str(e)}")
+                    raise ConnectionError(f"Failed to connect to API: {str(e)}")
+            else:
+                delay = self._retry_after(
+                    method, idempotent, attempt, response=response
+                )
+                if delay is None:
+                    return self._check(method, response)
+            logger.debug(f"Retrying {method} {endpoint} in {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
+
+    # Pagination
+    def get_page(
+        self,
+        endpoint: str,
+        params: Optional[Dict] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        after: Optional[str] = None,
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Get one page of a list endpoint and the cursor of the next page."""
+        params = {**(params or {}), "limit": limit}
+        if after:
+            params["after"] = after
+        response = self._send("GET", endpoint, params=params)
+        return response.json(), response.headers.get(NEXT_CURSOR_HEADER)
+
+    def iter_pages(
+        self,
+        endpoint: str,
+        params: Optional[Dict] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> Iterator[Dict]:
+        """Iterate over every item of a list endpoint, one page at a time."""
+        after = None
+        while True:
+            items, after = self.get_page(endpoint, params, page_size, after)
+            yield from items
+            if not after:
+                return
+
+    def _list(
+        self,
+        endpoint: str,
+        params: Optional[Dict] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> List[Dict]:
+        """Every item of a list endpoint."""
+        return list(self.iter_pages(endpoint, params, page_size))
+
+    def _list_by_ids(self, endpoint: str, ids: List[str]) -> List[Dict]:
+        """Items of a list endpoint with the given ids, a batch of ids per request."""
+        return [
+            item
+            for batch in batched(ids)
+            for item in self._list(endpoint, {"ids": batch}, BULK_BATCH_SIZE)
+        ]
 
     # Notebooks API methods
     def get_notebooks(
-        self, archived: Optional[bool] = None, order_by: str = "updated desc"
+        self,
+        archived: Optional[bool] = None,
+        order_by: str = "updated desc",
+        page_size: int = DEFAULT_PAGE_SIZE,
     ) -> List[Dict]:
         """Get all notebooks."""
         params = {"order_by": order_by}
         if archived is not None:
             params["archived"] = archived
 
-        return self._make_request("GET", "/api/notebooks", params=params)
+        return self._list("/api/notebooks", params, page_size)
 
     def create_notebook(self, name: str, description: str = "") -> Dict:
         """Create a new notebook."""
@@ -108,6 +295,7 @@ class APIClient:
         strategy_model: str,
         answer_model: str,
         final_answer_model: str,
+        use_cache: bool = True,
     ) -> Dict:
         """Ask the knowledge base a question (simple, non-streaming)."""
         data = {
@@ -115,6 +303,7 @@ class APIClient:
             "strategy_model": strategy_model,
             "answer_model": answer_model,
             "final_answer_model": final_answer_model,
+            "use_cache": use_cache,
         }
         # Use 5 minute timeout for long-running ask operations
         return self._make_request(
@@ -202,12 +391,18 @@ class APIClient:
         )
 
     # Notes API methods
-    def get_notes(self, notebook_id: Optional[str] = None) -> List[Dict]:
+    def get_notes(
+        self, notebook_id: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> List[Dict]:
         """Get all notes with optional notebook filtering."""
         params = {}
         if notebook_id:
             params["notebook_id"] = notebook_id
-        return self._make_request("GET", "/api/notes", params=params)
+        return self._list("/api/notes", params, page_size)
+
+    def get_notes_by_ids(self, note_ids: List[str]) -> List[Dict]:
+        """Get many notes by ID, in as few requests as possible."""
+        return self._list_by_ids("/api/notes", note_ids)
 
     def create_note(
         self,
@@ -260,23 +455,44 @@ class APIClient:
 
     # Context API methods
     def get_notebook_context(
-        self, notebook_id: str, context_config: Optional[Dict] = None
-    ) -> Dict:
-        """Get context for a notebook."""
+        self,
+        notebook_id: str,
+        context_config: Optional[Dict] = None,
+        question: Optional[str] = None,
+        model_id: Optional[str] = None,
+        version: Optional[str] = None,
+    ) -> Optional[Dict]:
+        """Get context for a notebook, or None if unchanged since `version`."""
         data = {"notebook_id": notebook_id}
         if context_config:
             data["context_config"] = context_config
-        return self._make_request(
-            "POST", f"/api/notebooks/{notebook_id}/context", json=data
+        if question:
+            data["question"] = question
+        if model_id:
+            data["model_id"] = model_id
+        headers = {"If-None-Match": f'"{version}"'} if version else {}
+        # Building a context only reads, so it is retried like a GET
+        return self._make_conditional_request(
+            "POST",
+            f"/api/notebooks/{notebook_id}/context",
+            json=data,
+            headers=headers,
+            idempotent=True,
         )
 
     # Sources API methods
-    def get_sources(self, notebook_id: Optional[str] = None) -> List[Dict]:
+    def get_sources(
+        self, notebook_id: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> List[Dict]:
         """Get all sources with optional notebook filtering."""
         params = {}
         if notebook_id:
             params["notebook_id"] = notebook_id
-        return self._make_request("GET", "/api/sources", params=params)
+        return self._list("/api/sources", params, page_size)
+
+    def get_sources_by_ids(self, source_ids: List[str]) -> List[Dict]:
+        """Get many sources by ID, in as few requests as possible."""
+        return self._list_by_ids("/api/sources", source_ids)
 
     def create_source(
         self,
@@ -289,13 +505,15 @@ class APIClient:
         transformations: Optional[List[str]] = None,
         embed: bool = False,
         delete_source: bool = False,
+        async_processing: bool = False,
     ) -> Dict:
-        """Create a new source."""
+        """Create a new source, or submit it for background processing."""
         data = {
             "notebook_id": notebook_id,
             "type": source_type,
             "embed": embed,
             "delete_source": delete_source,
+            "async_processing": async_processing,
         }
         if url:
             data["url"] = url
@@ -323,6 +541,10 @@ class APIClient:
         """Delete a source."""
         return self._make_request("DELETE", f"/api/sources/{source_id}")
 
+    def get_command_status(self, job_id: str) -> Dict:
+        """Get the status and progress of a background command."""
+        return self._make_request("GET", f"/api/commands/jobs/{job_id}")
+
     # Insights API methods
     def get_source_insights(self, source_id: str) -> List[Dict]:
         """Get all insights for a specific source."""
@@ -359,6 +581,11 @@ class APIClient:
         )
 
     # Episode Profiles API methods
+    # Podcast API methods
+    def get_podcast_episodes(self, page_size: int = DEFAULT_PAGE_SIZE) -> List[Dict]:
+        """Get all podcast episodes."""
+        return self._list("/api/podcasts/episodes", page_size=page_size)
+
     def get_episode_profiles(self) -> List[Dict]:
         """Get all episode profiles."""
         return self._make_request("GET", "/api/episode-profiles")
@@ -402,5 +629,132 @@ class APIClient:
         return self._make_request("DELETE", f"/api/episode-profiles/{profile_id}")
 
 
+class AsyncAPIClient(APIClient):
+    """
+    Asynchronous client for Open Notebook API.
+
+    Every APIClient method is available and returns an awaitable, and
+    iter_pages is an async iterator. The pooled connection belongs to the event
+    loop it was opened on, so use one instance per loop:
+
+        async with AsyncAPIClient() as client:
+            notebooks = await client.get_notebooks()
+    """
+
+    @property
+    def client(self) -> httpx.AsyncClient:  # type: ignore[override]
+        """The pooled HTTP client, created on first use."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(**self._client_options())
+        return self._client
+
+    def close(self) -> None:
+        raise TypeError("AsyncAPIClient is closed with `await client.aclose()`")
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self) -> "AsyncAPIClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def _make_request(  # type: ignore[override]
+        self, method: str, endpoint: str, timeout: Optional[float] = None, **kwargs
+    ) -> Dict:
+        """Make HTTP request to the API."""
+        return (await self._send(method, endpoint, timeout, **kwargs)).json()
+
+    async def _make_conditional_request(  # type: ignore[override]
+        self, method: str, endpoint: str, timeout: Optional[float] = None, **kwargs
+    ) -> Optional[Dict]:
+        """Make HTTP request to the API, returning None for 304 Not Modified."""
+        response = await self._send(method, endpoint, timeout, **kwargs)
+        return None if response.status_code == 304 else response.json()
+
+    async def _send(  # type: ignore[override]
+        self,
+        method: str,
+        endpoint: str,
+        timeout: Optional[float] = None,
+        idempotent: Optional[bool] = None,
+        **kwargs,
+    ) -> httpx.Response:
+        """Send an HTTP request to the API and return the raw response."""
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        attempt = 0
+        while True:
+            try:
+                response = await self.client.request(method, endpoint, **kwargs)
+            except httpx.RequestError as e:
+                delay = self._retry_after(method, idempotent, attempt, error=e)
+                if delay is None:
+                    logger.error(f"Request error for {method} {endpoint}: {str(e)}")
+                    raise ConnectionError(f"Failed to connect to API: {str(e)}")
+            else:
+                delay = self._retry_after(
+                    method, idempotent, attempt, response=response
+                )
+                if delay is None:
+                    return self._check(method, response)
+            logger.debug(f"Retrying {method} {endpoint} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def get_page(  # type: ignore[override]
+        self,
+        endpoint: str,
+        params: Optional[Dict] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        after: Optional[str] = None,
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Get one page of a list endpoint and the cursor of the next page."""
+        params = {**(params or {}), "limit": limit}
+        if after:
+            params["after"] = after
+        response = await self._send("GET", endpoint, params=params)
+        return response.json(), response.headers.get(NEXT_CURSOR_HEADER)
+
+    async def iter_pages(  # type: ignore[override]
+        self,
+        endpoint: str,
+        params: Optional[Dict] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> AsyncIterator[Dict]:
+        """Iterate over every item of a list endpoint, one page at a time."""
+        after = None
+        while True:
+            items, after = await self.get_page(endpoint, params, page_size, after)
+            for item in items:
+                yield item
+            if not after:
+                return
+
+    async def _list(  # type: ignore[override]
+        self,
+        endpoint: str,
+        params: Optional[Dict] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> List[Dict]:
+        """Every item of a list endpoint."""
+        return [item async for item in self.iter_pages(endpoint, params, page_size)]
+
+    async def _list_by_ids(  # type: ignore[override]
+        self, endpoint: str, ids: List[str]
+    ) -> List[Dict]:
+        """Items of a list endpoint with the given ids, batches fetched concurrently."""
+        pages = await asyncio.gather(
+            *(
+                self._list(endpoint, {"ids": batch}, BULK_BATCH_SIZE)
+                for batch in batched(ids)
+            )
+        )
+        return [item for page in pages for item in page]
+
+
 # Global client instance
 api_client = APIClient()
@@ -1,9 +1,35 @@
 from typing import Any, Dict, List, Optional
 
 from loguru import logger
-from surreal_commands import get_command_status, submit_command
 
 from api.models import ErrorResponse
+from open_notebook.database.repository import ensure_record_id, repo_query
+from open_notebook.domain.transformation import TransformationBatch
+
+
+def load_commands() -> None:
+    """
+    Import the command modules, registering their commands in this process.
+
+    Deferred until a command is first needed, since the commands pull in the
+    ingestion and podcast pipelines.
+    """
+    try:
+        import commands.maintenance_commands  # noqa: F401
+        import commands.podcast_commands  # noqa: F401
+        import commands.source_commands  # noqa: F401
+        import commands.transformation_commands  # noqa: F401
+    except ImportError as import_err:
+        logger.error(f"Failed to import command modules: {import_err}")
+        raise ValueError("Command modules not available")
+
+
+async def submit_transformation_batch(batch: TransformationBatch) -> None:
+    """Queue a saved transformation batch for the command worker."""
+    batch.command = await CommandService.submit_command_job(
+        "open_notebook", "apply_transformations", {"batch_id": batch.id}
+    )
+    await batch.save()
 
 
 class CommandService:
@@ -17,14 +43,12 @@ class CommandService:
         context: Optional[Dict[str, Any]] = None,
     ) -> str:
         """Submit a generic command job for background processing"""
+        from surreal_commands import submit_command
+
         try:
             # Ensure command modules are imported before submitting
             # This is needed because submit_command validates against local registry
-            try:
-                import commands.podcast_commands  # noqa: F401
-            except ImportError as import_err:
-                logger.error(f"Failed to import command modules: {import_err}")
-                raise ValueError("Command modules not available")
+            load_commands()
 
             # surreal-commands expects: submit_command(app_name, command_name, args)
             cmd_id = submit_command(
@@ -46,8 +70,18 @@ class CommandService:
     @staticmethod
     async def get_command_status(job_id: str) -> Dict[str, Any]:
         """Get status of any command job"""
+        from surreal_commands import get_command_status
+
         try:
             status = await get_command_status(job_id)
+            progress = getattr(status, "progress", None) if status else None
+            if status and progress is None:
+                # Stage progress is written to the command record by the
+                # command itself, outside of the surreal-commands status model
+                result = await repo_query(
+                    "SELECT progress FROM $id", {"id": ensure_record_id(job_id)}
+                )
+                progress = result[0].get("progress") if result else None
             return {
                 "job_id": job_id,
                 "status": status.status if status else "unknown",
@@ -61,7 +95,7 @@ class CommandService:
                 "updated": str(status.updated)
                 if status and hasattr(status, "updated") and status.updated
                 else None,
-                "progress": getattr(status, "progress", None) if status else None,
+                "progress": progress,
             }
         except Exception as e:
             logger.error(f"Failed to get command status: {e}")
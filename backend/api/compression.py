@@ -0,0 +1,20 @@
+from starlette.middleware.gzip import GZipMiddleware
+
+# Responses streamed while they are generated; compressing them would hold
+# chunks back in the compressor's buffer
+STREAMED_PATHS = {"/api/search/ask"}
+
+# Smaller bodies don't gain enough to be worth compressing
+GZIP_MINIMUM_SIZE = 1024
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Gzip large responses for clients that accept it, except streamed ones."""
+
+    def __init__(self, app, minimum_size: int = GZIP_MINIMUM_SIZE):
+        super().__init__(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in STREAMED_PATHS:
+            return await self.app(scope, receive, send)
+        await super().__call__(scope, receive, send)
@@ -18,12 +18,18 @@ class ContextService:
     def get_notebook_context(
         self,
         notebook_id: str,
-        context_config: Optional[Dict] = None
-    ) -> Dict:
-        """Get context for a notebook."""
+        context_config: Optional[Dict] = None,
+        question: Optional[str] = None,
+        model_id: Optional[str] = None,
+        version: Optional[str] = None,
+    ) -> Optional[Dict]:
+        """Get context for a notebook, or None if unchanged since `version`."""
         result = api_client.get_notebook_context(
             notebook_id=notebook_id,
-            context_config=context_config
+            context_config=context_config,
+            question=question,
+            model_id=model_id,
+            version=version,
         )
         return result
 
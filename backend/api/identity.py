@@ -0,0 +1,18 @@
+from open_notebook.domain.identity import identity_scope
+
+
+class IdentityMapMiddleware:
+    """
+    Give every HTTP request its own identity map, so repeated gets of the same
+    record within a request are served from memory and concurrent ones are
+    batched into a single query.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        with identity_scope():
+            await self.app(scope, receive, send)
@@ -1,10 +1,16 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 from api.auth import PasswordAuthMiddleware
-# from api.routers import commands as commands_router  # Temporarily disabled due to missing surreal_commands
+from api.compression import CompressionMiddleware
+from api.identity import IdentityMapMiddleware
+from api.pagination import NEXT_CURSOR_HEADER
 from api.routers import (
     books,
+    commands as commands_router,
     context,
     embedding,
     episode_profiles,
@@ -18,26 +24,33 @@ from api.routers import (
     sources,
     speaker_profiles,
     transformations,
+    usage,
 )
+from open_notebook.lifecycle import shutdown, startup
 
-# Import commands to register them in the API process
-try:
-    from loguru import logger
+# Commands are registered on first use, see api.command_service.load_commands;
+# graphs and model providers are also imported when first needed, keeping API
+# cold start fast (check with `make startup-profile`)
 
-    import commands.podcast_commands
 
-    logger.info("Commands imported in API process")
-except Exception as e:
-    from loguru import logger
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup()
+    yield
+    await shutdown()
 
-    logger.error(f"Failed to import commands in API process: {e}")
 
 app = FastAPI(
     title="Open Notebook API",
     description="API for Open Notebook - Research Assistant",
     version="0.2.2",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
+# Scope an identity map to each request; added first so it wraps the routes directly
+app.add_middleware(IdentityMapMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -45,11 +58,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
 # Add password authentication middleware
 app.add_middleware(PasswordAuthMiddleware)
 
+# Compress large responses; outermost so it sees the final body and headers
+app.add_middleware(CompressionMiddleware)
+
 # Include routers
 app.include_router(books.router, prefix="/api", tags=["books"])
 app.include_router(notebooks.router, prefix="/api", tags=["notebooks"])
@@ -62,10 +79,11 @@ app.include_router(settings.router, prefix="/api", tags=["settings"])
 app.include_router(context.router, prefix="/api", tags=["context"])
 app.include_router(sources.router, prefix="/api", tags=["sources"])
 app.include_router(insights.router, prefix="/api", tags=["insights"])
-# app.include_router(commands_router.router, prefix="/api", tags=["commands"])  # Temporarily disabled
+app.include_router(commands_router.router, prefix="/api", tags=["commands"])
 app.include_router(podcasts.router, prefix="/api", tags=["podcasts"])
 app.include_router(episode_profiles.router, prefix="/api", tags=["episode-profiles"])
 app.include_router(speaker_profiles.router, prefix="/api", tags=["speaker-profiles"])
+app.include_router(usage.router, prefix="/api", tags=["usage"])
 
 
 @app.get("/")
@@ -21,6 +21,10 @@ class NotebookResponse(BaseModel):
     archived: bool
     created: str
     updated: str
+    source_count: int = 0
+    note_count: int = 0
+    token_count: int = 0
+    last_ingested: Optional[str] = None
 
 
 # Search models
@@ -44,11 +48,15 @@ class AskRequest(BaseModel):
     strategy_model: str = Field(..., description="Model ID for query strategy")
     answer_model: str = Field(..., description="Model ID for individual answers")
     final_answer_model: str = Field(..., description="Model ID for final answer")
+    use_cache: bool = Field(
+        True, description="Serve a cached answer for similar questions when still valid"
+    )
 
 
 class AskResponse(BaseModel):
     answer: str = Field(..., description="Final answer from the knowledge base")
     question: str = Field(..., description="Original question")
+    cached: bool = Field(False, description="Whether the answer came from the cache")
 
 
 # Models API models
@@ -56,6 +64,22 @@ class ModelCreate(BaseModel):
     name: str = Field(..., description="Model name (e.g., gpt-4o-mini, claude, gemini)")
     provider: str = Field(..., description="Provider name (e.g., openai, anthropic, gemini)")
     type: str = Field(..., description="Model type (language, embedding, text_to_speech, speech_to_text)")
+    rpm: Optional[int] = Field(None, gt=0, description="Requests per minute allowed by the provider")
+    tpm: Optional[int] = Field(None, gt=0, description="Tokens per minute allowed by the provider")
+    input_cost: Optional[float] = Field(None, ge=0, description="Price per million input tokens")
+    output_cost: Optional[float] = Field(None, ge=0, description="Price per million output tokens")
+    context_window: Optional[int] = Field(None, gt=0, description="Tokens the model accepts")
+
+
+class ModelPricingUpdate(BaseModel):
+    input_cost: Optional[float] = Field(None, ge=0, description="Price per million input tokens")
+    output_cost: Optional[float] = Field(None, ge=0, description="Price per million output tokens")
+
+
+class ModelLimitsUpdate(BaseModel):
+    rpm: Optional[int] = Field(None, gt=0, description="Requests per minute, null for no limit")
+    tpm: Optional[int] = Field(None, gt=0, description="Tokens per minute, null for no limit")
+    context_window: Optional[int] = Field(None, gt=0, description="Tokens the model accepts, null if unknown")
 
 
 class ModelResponse(BaseModel):
@@ -63,6 +87,11 @@ class ModelResponse(BaseModel):
     name: str
     provider: str
     type: str
+    rpm: Optional[int] = None
+    tpm: Optional[int] = None
+    input_cost: Optional[float] = None
+    output_cost: Optional[float] = None
+    context_window: Optional[int] = None
     created: str
     updated: str
 
@@ -75,6 +104,9 @@ class DefaultModelsResponse(BaseModel):
     default_speech_to_text_model: Optional[str] = None
     default_embedding_model: Optional[str] = None
     default_tools_model: Optional[str] = None
+    fallback_models: Optional[Dict[str, List[str]]] = Field(
+        None, description="Model ids to fall back to, in order, per model type (chat, transformation, tools, large_context)"
+    )
 
 
 # Transformations API models
@@ -111,6 +143,10 @@ class TransformationExecuteRequest(BaseModel):
     transformation_id: str = Field(..., description="ID of the transformation to execute")
     input_text: str = Field(..., description="Text to transform")
     model_id: str = Field(..., description="Model ID to use for the transformation")
+    use_cache: Optional[bool] = Field(
+        None,
+        description="Reuse a cached response for identical input (defaults to LLM_CACHE_ENABLED)",
+    )
 
 
 class TransformationExecuteResponse(BaseModel):
@@ -121,6 +157,107 @@ class TransformationExecuteResponse(BaseModel):
     model_id: str = Field(..., description="Model ID used")
 
 
+class TransformationBatchCreate(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+
+    transformation_ids: List[str] = Field(..., description="Transformations to apply")
+    source_ids: Optional[List[str]] = Field(
+        None, description="Sources to transform (ignored when notebook_id is set)"
+    )
+    notebook_id: Optional[str] = Field(
+        None, description="Transform every source of this notebook"
+    )
+    model_id: Optional[str] = Field(
+        None, description="Model ID to use (defaults to the transformation model)"
+    )
+
+
+class TransformationBatchFailure(BaseModel):
+    task: str = Field(..., description="source_id|transformation_id")
+    error: str
+
+
+class TransformationBatchResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+
+    id: str
+    status: str
+    transformations: List[str]
+    sources: List[str]
+    notebook_id: Optional[str] = None
+    model_id: Optional[str] = None
+    total: int
+    completed: int
+    skipped: int
+    failed: List[TransformationBatchFailure]
+    command_id: Optional[str] = None
+    created: str
+    updated: str
+
+
+class LLMCacheStatsResponse(BaseModel):
+    hits: int
+    misses: int
+    tokens_saved: int = Field(..., description="Estimated prompt + completion tokens avoided")
+    latency_saved_seconds: float = Field(..., description="Model latency avoided by cache hits")
+    size_bytes: Optional[int] = Field(None, description="Cache size on disk, once known")
+    max_bytes: int
+
+
+class ModelCacheStatsResponse(BaseModel):
+    hits: int
+    instantiations: int
+    variants_shared: int = Field(..., description="Clients derived from a cached base with different settings")
+    instantiations_avoided: int
+    cached_clients: int
+    max_cached_clients: int
+    defaults_refreshes: int
+
+
+class RateLimitStatsResponse(BaseModel):
+    key: str = Field(..., description="provider/model_name")
+    rpm: Optional[int] = None
+    tpm: Optional[int] = None
+    admitted: int = Field(..., description="Calls let through since the process started")
+    queued: int = Field(..., description="Calls that had to wait for their turn")
+    waiting: int = Field(..., description="Calls waiting right now")
+    avg_wait_seconds: float
+    max_wait_seconds: float
+
+
+class RoutingStatsResponse(BaseModel):
+    key: str = Field(..., description="provider/model_name")
+    samples: int = Field(..., description="Calls whose time to first token was measured")
+    p50_seconds: Optional[float] = None
+    p95_seconds: Optional[float] = Field(None, description="Time to first token after which a hedged call starts a fallback")
+    failures: int
+    fallbacks: int = Field(..., description="Calls this model took over after a failure")
+    hedges: int = Field(..., description="Backup calls started on this model")
+    hedge_wins: int = Field(..., description="Backup calls that answered first")
+
+
+# Usage API models
+class UsageSummaryResponse(BaseModel):
+    notebook: Optional[str] = None
+    model: Optional[str] = None
+    caller: Optional[str] = Field(None, description="Pipeline stage that made the calls (chat, ask, transformation, ...)")
+    kind: Optional[str] = Field(None, description="llm or embedding")
+    day: Optional[str] = None
+    calls: int
+    prompt_tokens: int
+    completion_tokens: int
+    cost: float
+    avg_latency: float = Field(..., description="Average seconds per call")
+    max_latency: float
+
+
+class UsageLedgerStatsResponse(BaseModel):
+    recorded: int
+    written: int
+    buffered: int = Field(..., description="Records waiting to be written")
+    dropped: int = Field(..., description="Records lost while the database could not be written")
+
+
 # Notes API models
 class NoteCreate(BaseModel):
     title: Optional[str] = Field(None, description="Note title")
@@ -167,10 +304,14 @@ class SettingsResponse(BaseModel):
 
 
 class SettingsUpdate(BaseModel):
-    default_content_processing_engine_doc: Optional[str] = None
-    default_content_processing_engine_url: Optional[str] = None
-    default_embedding_option: Optional[str] = None
-    auto_delete_files: Optional[str] = None
+    default_content_processing_engine_doc: Optional[
+        Literal["auto", "docling", "simple"]
+    ] = None
+    default_content_processing_engine_url: Optional[
+        Literal["auto", "firecrawl", "jina", "simple"]
+    ] = None
+    default_embedding_option: Optional[Literal["ask", "always", "never"]] = None
+    auto_delete_files: Optional[Literal["yes", "no"]] = None
     youtube_preferred_languages: Optional[List[str]] = None
 
 
@@ -189,7 +330,27 @@ class SourceCreate(BaseModel):
     title: Optional[str] = Field(None, description="Source title")
     transformations: Optional[List[str]] = Field(default_factory=list, description="Transformation IDs to apply")
     embed: bool = Field(False, description="Whether to embed content for vector search")
-    delete_source: bool = Field(False, description="Whether to delete uploaded file after processing")
+    delete_source: bool = Field(False, description="Whether to delete uploaded file after processing (files in the blob store are kept)")
+    async_processing: bool = Field(
+        False,
+        description="Process the source in the background and return a job ID immediately",
+    )
+    force_reingest: bool = Field(
+        False,
+        description="Process the content even if it was already ingested into this notebook",
+    )
+
+
+class SourceUploadForm(BaseModel):
+    """Form fields sent with the file to POST /sources/upload."""
+
+    notebook_id: str = Field(..., description="Notebook ID to add the source to")
+    title: Optional[str] = Field(None, description="Source title")
+    transformations: Optional[str] = Field("", description="Comma-separated transformation IDs")
+    embed: bool = Field(False, description="Whether to embed content for vector search")
+    delete_source: bool = Field(False, description="Ignored: uploads are kept in the blob store, where sources with the same content share them")
+    async_processing: bool = Field(False, description="Process in the background and return a job ID")
+    force_reingest: bool = Field(False, description="Process the file even if identical content was already uploaded")
 
 
 class SourceUpdate(BaseModel):
@@ -206,6 +367,19 @@ class SourceResponse(BaseModel):
     embedded_chunks: int
     created: str
     updated: str
+    deduplicated: bool = Field(
+        False, description="True when an existing source with identical content was reused"
+    )
+    transformation_batch_id: Optional[str] = Field(
+        None,
+        description="Batch applying the requested transformations to a reused source",
+    )
+
+
+class SourceJobResponse(BaseModel):
+    job_id: str = Field(..., description="Command ID to poll at /api/commands/jobs/{job_id}")
+    status: str
+    message: str
 
 
 class SourceListResponse(BaseModel):
@@ -215,6 +389,8 @@ class SourceListResponse(BaseModel):
     asset: Optional[AssetModel]
     embedded_chunks: int
     insights_count: int
+    token_count: int = 0
+    last_ingested: Optional[str] = None
     created: str
     updated: str
 
@@ -228,6 +404,9 @@ class ContextConfig(BaseModel):
 class ContextRequest(BaseModel):
     notebook_id: str = Field(..., description="Notebook ID to get context for")
     context_config: Optional[ContextConfig] = Field(None, description="Context configuration")
+    question: Optional[str] = Field(None, description="Question the context is for, to include the most relevant content first")
+    model_id: Optional[str] = Field(None, description="Model the context is for, sets the token budget (default chat model if omitted)")
+    token_budget: Optional[int] = Field(None, gt=0, description="Maximum context tokens, overrides the model's budget")
 
 
 class ContextResponse(BaseModel):
@@ -235,6 +414,9 @@ class ContextResponse(BaseModel):
     sources: List[Dict[str, Any]] = Field(..., description="Source context data")
     notes: List[Dict[str, Any]] = Field(..., description="Note context data")
     total_tokens: Optional[int] = Field(None, description="Estimated token count")
+    token_budget: Optional[int] = Field(None, description="Token budget the context was packed into")
+    truncated: bool = Field(False, description="Whether content was left out to fit the budget")
+    version: Optional[str] = Field(None, description="Context version, also sent as the ETag header")
 
 
 # Insights API models
@@ -256,6 +438,10 @@ class CreateSourceInsightRequest(BaseModel):
     
     transformation_id: str = Field(..., description="ID of transformation to apply")
     model_id: Optional[str] = Field(None, description="Model ID (uses default if not provided)")
+    use_cache: Optional[bool] = Field(
+        None,
+        description="Reuse a cached response for identical input (defaults to LLM_CACHE_ENABLED)",
+    )
 
 
 # Books API models
@@ -268,6 +454,16 @@ class BookUploadRequest(BaseModel):
     delete_source: bool = Field(False, description="Whether to delete uploaded file after processing")
 
 
+class BookUploadForm(BaseModel):
+    """Form fields sent with the file to POST /books."""
+
+    notebook_id: str = Field(..., description="Notebook ID to add the book to")
+    title: Optional[str] = Field(None, description="Book title")
+    transformations: Optional[str] = Field("", description="Comma-separated transformation IDs")
+    embed: bool = Field(False, description="Whether to embed content for vector search")
+    delete_source: bool = Field(False, description="Whether to delete uploaded file after processing")
+
+
 class BookUploadResponse(BaseModel):
     id: str
     title: Optional[str]
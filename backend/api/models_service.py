@@ -64,6 +64,7 @@ class ModelsService:
         defaults.default_speech_to_text_model = defaults_data.get("default_speech_to_text_model")
         defaults.default_embedding_model = defaults_data.get("default_embedding_model")
         defaults.default_tools_model = defaults_data.get("default_tools_model")
+        defaults.fallback_models = defaults_data.get("fallback_models")
         
         return defaults
     
@@ -77,6 +78,7 @@ class ModelsService:
             "default_speech_to_text_model": defaults.default_speech_to_text_model,
             "default_embedding_model": defaults.default_embedding_model,
             "default_tools_model": defaults.default_tools_model,
+            "fallback_models": defaults.fallback_models,
         }
         
         defaults_data = api_client.update_default_models(**updates)
@@ -89,6 +91,7 @@ class ModelsService:
         defaults.default_speech_to_text_model = defaults_data.get("default_speech_to_text_model")
         defaults.default_embedding_model = defaults_data.get("default_embedding_model")
         defaults.default_tools_model = defaults_data.get("default_tools_model")
+        defaults.fallback_models = defaults_data.get("fallback_models")
         
         return defaults
 
@@ -19,7 +19,14 @@ class NotesService:
     def get_all_notes(self, notebook_id: Optional[str] = None) -> List[Note]:
         """Get all notes with optional notebook filtering."""
         notes_data = api_client.get_notes(notebook_id=notebook_id)
-        # Convert API response to Note objects
+        return self._to_notes(notes_data)
+
+    def get_notes_by_ids(self, note_ids: List[str]) -> List[Note]:
+        """Get many notes by ID in batched requests."""
+        return self._to_notes(api_client.get_notes_by_ids(note_ids))
+
+    def _to_notes(self, notes_data: List[Dict]) -> List[Note]:
+        """Convert API response to Note objects."""
         notes = []
         for note_data in notes_data:
             note = Note(
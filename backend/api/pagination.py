@@ -0,0 +1,29 @@
+"""
+Keyset pagination for list endpoints.
+
+List endpoints take `limit` and `after` query parameters. When more rows are
+available, the cursor to pass as `after` for the next page is returned in the
+X-Next-Cursor response header, so the response bodies stay plain lists.
+"""
+
+from typing import Optional
+
+from fastapi import Query, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 1000
+
+LimitQuery = Query(
+    None,
+    ge=1,
+    le=MAX_PAGE_SIZE,
+    description="Maximum number of items per page (all items if omitted)",
+)
+AfterQuery = Query(
+    None, description=f"Cursor of the page to fetch, from the {NEXT_CURSOR_HEADER} header"
+)
+
+
+def set_next_cursor(response: Response, cursor: Optional[str]) -> None:
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
@@ -1,12 +1,12 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from fastapi import HTTPException
 from loguru import logger
 from pydantic import BaseModel
-from surreal_commands import get_command_status, submit_command
 
 from open_notebook.domain.notebook import Notebook
 from open_notebook.domain.podcast import EpisodeProfile, PodcastEpisode, SpeakerProfile
+from open_notebook.exceptions import InvalidInputError
 
 
 class PodcastGenerationRequest(BaseModel):
@@ -93,6 +93,8 @@ class PodcastService:
                 raise ValueError("Podcast commands not available")
 
             # Submit command to surreal-commands
+            from surreal_commands import submit_command
+
             job_id = submit_command("open_notebook", "generate_podcast", command_args)
 
             # Convert RecordID to string if needed
@@ -112,6 +114,8 @@ class PodcastService:
     @staticmethod
     async def get_job_status(job_id: str) -> Dict[str, Any]:
         """Get status of a podcast generation job"""
+        from surreal_commands import get_command_status
+
         try:
             status = await get_command_status(job_id)
             return {
@@ -136,11 +140,20 @@ class PodcastService:
             )
 
     @staticmethod
-    async def list_episodes() -> list:
-        """List all podcast episodes"""
+    async def list_episodes(
+        limit: Optional[int] = None, after: Optional[str] = None
+    ) -> Tuple[List[PodcastEpisode], Optional[str]]:
+        """List podcast episodes that were generated or imported, newest first"""
         try:
-            episodes = await PodcastEpisode.get_all(order_by="created desc")
-            return episodes
+            # Episodes without a command or audio are leftovers of failed submissions
+            return await PodcastEpisode.get_page(
+                limit=limit,
+                after=after,
+                order_by="created desc",
+                where="(command OR audio_file)",
+            )
+        except InvalidInputError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             logger.error(f"Failed to list podcast episodes: {e}")
             raise HTTPException(
@@ -0,0 +1,48 @@
+"""
+Fast JSON responses.
+
+The app renders responses with orjson (see api.main). Routes that return large
+or many rows can also skip FastAPI's validation of their return value: they
+build their response models from trusted query rows with `model_construct` and
+return them through `json_response`, so each row is serialized once instead of
+being validated twice first.
+"""
+
+from typing import Any, Optional
+
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class ModelJSONResponse(ORJSONResponse):
+    """orjson response that also renders Pydantic models."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def json_response(
+    content: Any, response: Optional[Response] = None
+) -> ModelJSONResponse:
+    """
+    Return content as is, bypassing the route's response_model validation.
+
+    Headers set on the route's injected `response` (like the pagination
+    cursor) are carried over.
+    """
+    headers = None
+    if response is not None:
+        headers = {
+            key: value
+            for key, value in response.headers.items()
+            if key != "content-length"
+        }
+    return ModelJSONResponse(content, headers=headers)
@@ -2,35 +2,54 @@
 Books API router for handling book uploads.
 """
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
 from loguru import logger
 from typing import Optional, List
-import os
 import tempfile
 from pathlib import Path
 
-from api.models import BookUploadRequest, BookUploadResponse, SourceResponse
+from api.models import (
+    BookUploadForm,
+    BookUploadRequest,
+    BookUploadResponse,
+    SourceResponse,
+)
+from api.uploads import ReceivedUpload, receive_upload, upload_openapi
+from open_notebook.exceptions import FileTooLargeError, InvalidInputError
 
 router = APIRouter()
 
 
-@router.post("/books", response_model=BookUploadResponse)
-async def upload_book(
-    notebook_id: str = Form(..., description="Notebook ID to add the book to"),
-    title: Optional[str] = Form(None, description="Book title"),
-    file: UploadFile = File(..., description="Book file to upload"),
-    transformations: Optional[str] = Form(default="", description="Comma-separated transformation IDs"),
-    embed: bool = Form(False, description="Whether to embed content for vector search"),
-    delete_source: bool = Form(False, description="Whether to delete uploaded file after processing")
-):
-    """Upload a book file and process it as a source."""
+@router.post(
+    "/books",
+    response_model=BookUploadResponse,
+    openapi_extra=upload_openapi(BookUploadForm, "Book file to upload"),
+)
+async def upload_book(request: Request):
+    """
+    Upload a book file and process it as a source.
+
+    Takes the fields of BookUploadForm and the file as multipart/form-data.
+    """
+    received: Optional[ReceivedUpload] = None
     try:
+        # The file is streamed into the blob store while the body is read
+        try:
+            received = await receive_upload(request)
+        except FileTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except InvalidInputError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        form = received.parse(BookUploadForm)
+        filename = received.filename
+
         # Validate file
-        if not file.filename:
+        if not filename:
             raise HTTPException(status_code=400, detail="No file provided")
 
         # Check file extension
-        file_extension = Path(file.filename).suffix.lower()
+        file_extension = Path(filename).suffix.lower()
         supported_extensions = ['.pdf', '.epub', '.txt', '.md', '.docx', '.doc', '.html', '.htm']
         if file_extension not in supported_extensions:
             raise HTTPException(
@@ -38,25 +57,9 @@ async def upload_book(
                 detail=f"Unsupported file type. Supported types: {', '.join(supported_extensions)}"
             )
 
-        # Create uploads directory if it doesn't exist
-        uploads_dir = os.path.join(os.getcwd(), "data", "uploads")
-        os.makedirs(uploads_dir, exist_ok=True)
-
-        # Generate unique filename
-        base_name = Path(file.filename).stem
-        counter = 0
-        new_filename = file.filename
-        while os.path.exists(os.path.join(uploads_dir, new_filename)):
-            counter += 1
-            new_filename = f"{base_name}_{counter}{file_extension}"
-
-        file_path = os.path.join(uploads_dir, new_filename)
-
-        # Save the uploaded file
+        # Save the uploaded file, once per content hash
         try:
-            with open(file_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
+            await received.store()
         except Exception as e:
             logger.error(f"Error saving uploaded file: {str(e)}")
             raise HTTPException(status_code=500, detail="Error saving uploaded file")
@@ -66,21 +69,24 @@ async def upload_book(
         
         return BookUploadResponse(
             id="source:mock123",
-            title=title or file.filename,
+            title=form.title or filename,
             topics=["book", "upload"],
             asset=None,
-            full_text=f"Mock content for {file.filename}",
+            full_text=f"Mock content for {filename}",
             embedded_chunks=0,
             created="2024-01-01T00:00:00Z",
             updated="2024-01-01T00:00:00Z",
             message="Book upload endpoint is working! (Mock response - dependencies need to be resolved)"
         )
 
-    except HTTPException:
+    except (HTTPException, RequestValidationError):
         raise
     except Exception as e:
         logger.error(f"Error uploading book: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error uploading book: {str(e)}")
+    finally:
+        if received:
+            await received.discard()
 
 
 @router.get("/books/{book_id}", response_model=SourceResponse)
@@ -97,6 +103,8 @@ async def get_book(book_id: str):
             embedded_chunks=0,
             created="2024-01-01T00:00:00Z",
             updated="2024-01-01T00:00:00Z",
+            deduplicated=False,
+            transformation_batch_id=None,
         )
     except Exception as e:
         logger.error(f"Error fetching book: {str(e)}")
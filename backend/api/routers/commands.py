@@ -3,9 +3,8 @@ from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, Field
 from loguru import logger
 
-from api.command_service import CommandService
+from api.command_service import CommandService, load_commands
 from api.models import ErrorResponse
-from surreal_commands import registry
 
 router = APIRouter()
 
@@ -120,6 +119,9 @@ async def debug_registry():
     """Debug endpoint to see what commands are registered"""
     try:
         # Get all registered commands
+        from surreal_commands import registry
+
+        load_commands()
         all_items = registry.get_all_commands()
         
         # Create JSON-serializable data
@@ -1,112 +1,112 @@
-from typing import Dict, List, Union
+from typing import Dict, List, Optional, cast
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Response
 from loguru import logger
 
 from api.models import ContextRequest, ContextResponse
-from open_notebook.domain.base import ObjectModel
-from open_notebook.domain.notebook import Note, Notebook, Source
-from open_notebook.exceptions import DatabaseOperationError, InvalidInputError
-from open_notebook.utils import token_count
+from open_notebook.database.repository import ensure_record_id, repo_query
+from open_notebook.domain.context import (
+    Level,
+    build_context,
+    get_context_version,
+    get_item_versions,
+    get_token_budget,
+)
+from open_notebook.domain.notebook import Notebook
+from open_notebook.exceptions import InvalidInputError
 
 router = APIRouter()
 
 
+def context_levels(config: Dict[str, str], table: str) -> Dict[str, Level]:
+    """Map the UI statuses of a context config to context levels, by full record id."""
+    levels: Dict[str, Level] = {}
+    for item_id, status in config.items():
+        # Add table prefix if not present
+        full_id = item_id if item_id.startswith(f"{table}:") else f"{table}:{item_id}"
+        if "not in" in status:
+            continue
+        if "full content" in status:
+            levels[full_id] = "long"
+        elif table == "source" and "insights" in status:
+            levels[full_id] = "short"
+    return levels
+
+
 @router.post("/notebooks/{notebook_id}/context", response_model=ContextResponse)
-async def get_notebook_context(notebook_id: str, context_request: ContextRequest):
-    """Get context for a notebook based on configuration."""
+async def get_notebook_context(
+    notebook_id: str,
+    context_request: ContextRequest,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Get context for a notebook based on configuration.
+
+    Without a configuration, the insights of every source and a preview of every
+    note are included. Content is packed into the model's token budget, most
+    relevant to `question` first when one is given.
+
+    The response carries the context version as its ETag. Sending it back in
+    If-None-Match returns 304 Not Modified while the context is unchanged.
+    """
     try:
         # Verify notebook exists
-        notebook = await Notebook.get(notebook_id)
+        notebook = await Notebook.get(notebook_id, fields=["name", "description"])
         if not notebook:
             raise HTTPException(status_code=404, detail="Notebook not found")
 
-        context_data = {"note": [], "source": []}
-        total_content = ""
-
-        # Process context configuration if provided
         if context_request.context_config:
-            # Process sources
-            for source_id, status in context_request.context_config.sources.items():
-                if "not in" in status:
-                    continue
-
-                try:
-                    # Add table prefix if not present
-                    full_source_id = (
-                        source_id
-                        if source_id.startswith("source:")
-                        else f"source:{source_id}"
-                    )
-
-                    try:
-                        source = await Source.get(full_source_id)
-                    except Exception as e:
-                        continue
-
-                    if "insights" in status:
-                        source_context = await source.get_context(context_size="short")
-                        context_data["source"].append(source_context)
-                        total_content += str(source_context)
-                    elif "full content" in status:
-                        source_context = await source.get_context(context_size="long")
-                        context_data["source"].append(source_context)
-                        total_content += str(source_context)
-                except Exception as e:
-                    logger.warning(f"Error processing source {source_id}: {str(e)}")
-                    continue
-
-            # Process notes
-            for note_id, status in context_request.context_config.notes.items():
-                if "not in" in status:
-                    continue
-
-                try:
-                    # Add table prefix if not present
-                    full_note_id = (
-                        note_id if note_id.startswith("note:") else f"note:{note_id}"
-                    )
-                    note = await Note.get(full_note_id)
-                    if not note:
-                        continue
-
-                    if "full content" in status:
-                        note_context = note.get_context(context_size="long")
-                        context_data["note"].append(note_context)
-                        total_content += str(note_context)
-                except Exception as e:
-                    logger.warning(f"Error processing note {note_id}: {str(e)}")
-                    continue
+            sources = context_levels(context_request.context_config.sources, "source")
+            notes = context_levels(context_request.context_config.notes, "note")
         else:
             # Default behavior - include all sources and notes with short context
-            sources = await notebook.get_sources()
-            for source in sources:
-                try:
-                    source_context = await source.get_context(context_size="short")
-                    context_data["source"].append(source_context)
-                    total_content += str(source_context)
-                except Exception as e:
-                    logger.warning(f"Error processing source {source.id}: {str(e)}")
-                    continue
-
-            notes = await notebook.get_notes()
-            for note in notes:
-                try:
-                    note_context = note.get_context(context_size="short")
-                    context_data["note"].append(note_context)
-                    total_content += str(note_context)
-                except Exception as e:
-                    logger.warning(f"Error processing note {note.id}: {str(e)}")
-                    continue
-
-        # Calculate estimated token count
-        estimated_tokens = token_count(total_content) if total_content else 0
+            params = {"notebook": ensure_record_id(notebook_id)}
+            # SELECT VALUE returns the record ids themselves, not rows
+            source_ids = cast(
+                List[str],
+                await repo_query(
+                    "SELECT VALUE in FROM reference WHERE out = $notebook", params
+                ),
+            )
+            note_ids = cast(
+                List[str],
+                await repo_query(
+                    "SELECT VALUE in FROM artifact WHERE out = $notebook", params
+                ),
+            )
+            sources = {source_id: "short" for source_id in source_ids}
+            notes = {note_id: "short" for note_id in note_ids}
+
+        budget = context_request.token_budget or await get_token_budget(
+            context_request.model_id
+        )
+        versions = await get_item_versions([*sources, *notes])
+        version = get_context_version(
+            notebook_id, sources, notes, context_request.question, budget, versions
+        )
+        etag = f'"{version}"'
+        if if_none_match and etag in if_none_match:
+            return Response(status_code=304, headers={"ETag": etag})
+
+        context = await build_context(
+            notebook_id,
+            sources,
+            notes,
+            question=context_request.question,
+            token_budget=budget,
+            versions=versions,
+        )
+        response.headers["ETag"] = etag
 
         return ContextResponse(
             notebook_id=notebook_id,
-            sources=context_data["source"],
-            notes=context_data["note"],
-            total_tokens=estimated_tokens,
+            sources=context.sources,
+            notes=context.notes,
+            total_tokens=context.total_tokens,
+            token_budget=context.token_budget,
+            truncated=context.truncated,
+            version=context.version,
         )
 
     except HTTPException:
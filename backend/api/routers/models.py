@@ -3,13 +3,40 @@ from typing import List, Optional
 from fastapi import APIRouter, HTTPException, Query
 from loguru import logger
 
-from api.models import DefaultModelsResponse, ModelCreate, ModelResponse
-from open_notebook.domain.models import DefaultModels, Model
+from api.models import (
+    DefaultModelsResponse,
+    ModelCacheStatsResponse,
+    ModelCreate,
+    ModelLimitsUpdate,
+    ModelPricingUpdate,
+    ModelResponse,
+    RateLimitStatsResponse,
+    RoutingStatsResponse,
+)
+from open_notebook.domain.models import DefaultModels, Model, model_manager
 from open_notebook.exceptions import DatabaseOperationError, InvalidInputError
+from open_notebook.routing import get_routing_stats
+from open_notebook.scheduler import scheduler
 
 router = APIRouter()
 
 
+def model_to_response(model: Model) -> ModelResponse:
+    return ModelResponse(
+        id=model.id,
+        name=model.name,
+        provider=model.provider,
+        type=model.type,
+        rpm=model.rpm,
+        tpm=model.tpm,
+        input_cost=model.input_cost,
+        output_cost=model.output_cost,
+        context_window=model.context_window,
+        created=str(model.created),
+        updated=str(model.updated),
+    )
+
+
 @router.get("/models", response_model=List[ModelResponse])
 async def get_models(
     type: Optional[str] = Query(None, description="Filter by model type")
@@ -21,17 +48,7 @@ async def get_models(
         else:
             models = await Model.get_all()
         
-        return [
-            ModelResponse(
-                id=model.id,
-                name=model.name,
-                provider=model.provider,
-                type=model.type,
-                created=str(model.created),
-                updated=str(model.updated),
-            )
-            for model in models
-        ]
+        return [model_to_response(model) for model in models]
     except Exception as e:
         logger.error(f"Error fetching models: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error fetching models: {str(e)}")
@@ -53,17 +70,15 @@ async def create_model(model_data: ModelCreate):
             name=model_data.name,
             provider=model_data.provider,
             type=model_data.type,
+            rpm=model_data.rpm,
+            tpm=model_data.tpm,
+            input_cost=model_data.input_cost,
+            output_cost=model_data.output_cost,
+            context_window=model_data.context_window,
         )
         await new_model.save()
         
-        return ModelResponse(
-            id=new_model.id,
-            name=new_model.name,
-            provider=new_model.provider,
-            type=new_model.type,
-            created=str(new_model.created),
-            updated=str(new_model.updated),
-        )
+        return model_to_response(new_model)
     except InvalidInputError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -71,6 +86,51 @@ async def create_model(model_data: ModelCreate):
         raise HTTPException(status_code=500, detail=f"Error creating model: {str(e)}")
 
 
+@router.put("/models/{model_id}/limits", response_model=ModelResponse)
+async def update_model_limits(model_id: str, limits: ModelLimitsUpdate):
+    """Set the requests and tokens per minute allowed for a model, and its context window."""
+    try:
+        model = await Model.get(model_id)
+        if not model:
+            raise HTTPException(status_code=404, detail="Model not found")
+
+        model.rpm = limits.rpm
+        model.tpm = limits.tpm
+        model.context_window = limits.context_window
+        await model.save()
+        # Applied to the scheduler when the clients are created again
+        model_manager.invalidate_model(model_id)
+
+        return model_to_response(model)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating limits of model {model_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error updating model limits: {str(e)}")
+
+
+@router.put("/models/{model_id}/pricing", response_model=ModelResponse)
+async def update_model_pricing(model_id: str, pricing: ModelPricingUpdate):
+    """Set the prices per million tokens used to cost a model's usage."""
+    try:
+        model = await Model.get(model_id)
+        if not model:
+            raise HTTPException(status_code=404, detail="Model not found")
+
+        model.input_cost = pricing.input_cost
+        model.output_cost = pricing.output_cost
+        await model.save()
+        # Applied to the usage ledger when the clients are created again
+        model_manager.invalidate_model(model_id)
+
+        return model_to_response(model)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating pricing of model {model_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error updating model pricing: {str(e)}")
+
+
 @router.delete("/models/{model_id}")
 async def delete_model(model_id: str):
     """Delete a model configuration."""
@@ -80,6 +140,7 @@ async def delete_model(model_id: str):
             raise HTTPException(status_code=404, detail="Model not found")
         
         await model.delete()
+        model_manager.invalidate_model(model_id)
         
         return {"message": "Model deleted successfully"}
     except HTTPException:
@@ -103,6 +164,7 @@ async def get_default_models():
             default_speech_to_text_model=defaults.default_speech_to_text_model,
             default_embedding_model=defaults.default_embedding_model,
             default_tools_model=defaults.default_tools_model,
+            fallback_models=defaults.fallback_models,
         )
     except Exception as e:
         logger.error(f"Error fetching default models: {str(e)}")
@@ -130,11 +192,12 @@ async def update_default_models(defaults_data: DefaultModelsResponse):
             defaults.default_embedding_model = defaults_data.default_embedding_model
         if defaults_data.default_tools_model is not None:
             defaults.default_tools_model = defaults_data.default_tools_model
+        if defaults_data.fallback_models is not None:
+            defaults.fallback_models = defaults_data.fallback_models
         
         await defaults.update()
         
         # Refresh the model manager cache
-        from open_notebook.domain.models import model_manager
         await model_manager.refresh_defaults()
         
         return DefaultModelsResponse(
@@ -145,9 +208,28 @@ async def update_default_models(defaults_data: DefaultModelsResponse):
             default_speech_to_text_model=defaults.default_speech_to_text_model,
             default_embedding_model=defaults.default_embedding_model,
             default_tools_model=defaults.default_tools_model,
+            fallback_models=defaults.fallback_models,
         )
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error updating default models: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error updating default models: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error updating default models: {str(e)}")
+
+
+@router.get("/models/cache/stats", response_model=ModelCacheStatsResponse)
+async def get_model_cache_stats():
+    """Get counters of the model client cache for this process."""
+    return ModelCacheStatsResponse(**model_manager.get_stats())
+
+
+@router.get("/models/rate-limits/stats", response_model=List[RateLimitStatsResponse])
+async def get_rate_limit_stats():
+    """Get the limits and queue times of each provider/model in this process."""
+    return [RateLimitStatsResponse(**stats) for stats in scheduler.get_stats()]
+
+
+@router.get("/models/routing/stats", response_model=List[RoutingStatsResponse])
+async def get_model_routing_stats():
+    """Get time to first token, fallbacks and hedges of each provider/model in this process."""
+    return [RoutingStatsResponse(**stats) for stats in get_routing_stats()]
@@ -1,39 +1,73 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Response
 from loguru import logger
 
 from api.models import ErrorResponse, NotebookCreate, NotebookResponse, NotebookUpdate
+from api.pagination import AfterQuery, LimitQuery, set_next_cursor
+from api.responses import json_response
 from open_notebook.domain.notebook import Notebook
+from open_notebook.domain.stats import get_notebook_stats
 from open_notebook.exceptions import DatabaseOperationError, InvalidInputError
 
 router = APIRouter()
 
 
+def notebook_to_response(
+    notebook: Notebook, stats: Optional[Dict[str, Any]] = None
+) -> NotebookResponse:
+    stats = stats or {}
+    # Built from a loaded record, so it skips validation
+    return NotebookResponse.model_construct(
+        id=notebook.id,
+        name=notebook.name,
+        description=notebook.description,
+        archived=notebook.archived or False,
+        created=str(notebook.created),
+        updated=str(notebook.updated),
+        source_count=stats.get("source_count", 0),
+        note_count=stats.get("note_count", 0),
+        token_count=stats.get("token_count", 0),
+        last_ingested=str(stats["last_ingested"])
+        if stats.get("last_ingested")
+        else None,
+    )
+
+
+async def notebooks_to_response(notebooks: List[Notebook]) -> List[NotebookResponse]:
+    """Responses for loaded notebooks, with the stats of all of them in one query."""
+    stats = await get_notebook_stats([nb.id for nb in notebooks if nb.id])
+    return [
+        notebook_to_response(nb, stats.get(nb.id) if nb.id else None)
+        for nb in notebooks
+    ]
+
+
 @router.get("/notebooks", response_model=List[NotebookResponse])
 async def get_notebooks(
+    response: Response,
     archived: Optional[bool] = Query(None, description="Filter by archived status"),
-    order_by: str = Query("updated desc", description="Order by field and direction"),
+    order_by: str = Query(
+        "updated desc",
+        description="Order by field (created, updated or name) and direction",
+    ),
+    limit: Optional[int] = LimitQuery,
+    after: Optional[str] = AfterQuery,
 ):
-    """Get all notebooks with optional filtering and ordering."""
+    """Get notebooks with optional filtering and ordering."""
     try:
-        notebooks = await Notebook.get_all(order_by=order_by)
-        
-        # Filter by archived status if specified
-        if archived is not None:
-            notebooks = [nb for nb in notebooks if nb.archived == archived]
-        
-        return [
-            NotebookResponse(
-                id=nb.id,
-                name=nb.name,
-                description=nb.description,
-                archived=nb.archived or False,
-                created=str(nb.created),
-                updated=str(nb.updated),
-            )
-            for nb in notebooks
-        ]
+        notebooks, next_cursor = await Notebook.get_page(
+            limit=limit,
+            after=after,
+            order_by=order_by,
+            where="archived = $archived" if archived is not None else None,
+            params={"archived": archived},
+        )
+        set_next_cursor(response, next_cursor)
+
+        return json_response(await notebooks_to_response(notebooks), response)
+    except InvalidInputError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching notebooks: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error fetching notebooks: {str(e)}")
@@ -72,14 +106,7 @@ async def get_notebook(notebook_id: str):
         if not notebook:
             raise HTTPException(status_code=404, detail="Notebook not found")
         
-        return NotebookResponse(
-            id=notebook.id,
-            name=notebook.name,
-            description=notebook.description,
-            archived=notebook.archived or False,
-            created=str(notebook.created),
-            updated=str(notebook.updated),
-        )
+        return (await notebooks_to_response([notebook]))[0]
     except HTTPException:
         raise
     except Exception as e:
@@ -105,14 +132,7 @@ async def update_notebook(notebook_id: str, notebook_update: NotebookUpdate):
         
         await notebook.save()
         
-        return NotebookResponse(
-            id=notebook.id,
-            name=notebook.name,
-            description=notebook.description,
-            archived=notebook.archived or False,
-            created=str(notebook.created),
-            updated=str(notebook.updated),
-        )
+        return (await notebooks_to_response([notebook]))[0]
     except HTTPException:
         raise
     except InvalidInputError as e:
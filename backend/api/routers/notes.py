@@ -1,45 +1,75 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Response
 from loguru import logger
 
 from api.models import NoteCreate, NoteResponse, NoteUpdate
+from api.pagination import AfterQuery, LimitQuery, set_next_cursor
+from api.responses import json_response
+from open_notebook.database.repository import ensure_record_id
 from open_notebook.domain.notebook import Note
 from open_notebook.exceptions import InvalidInputError
 
 router = APIRouter()
 
+# Everything NoteResponse serializes; the embedding is never loaded
+NOTE_RESPONSE_FIELDS = ["title", "content", "note_type"]
+
 
 @router.get("/notes", response_model=List[NoteResponse])
 async def get_notes(
-    notebook_id: Optional[str] = Query(None, description="Filter by notebook ID")
+    response: Response,
+    notebook_id: Optional[str] = Query(None, description="Filter by notebook ID"),
+    ids: Optional[List[str]] = Query(None, description="Only these note IDs"),
+    limit: Optional[int] = LimitQuery,
+    after: Optional[str] = AfterQuery,
 ):
-    """Get all notes with optional notebook filtering."""
+    """Get notes, newest first, with optional notebook and ID filtering."""
     try:
+        conditions: List[str] = []
+        params: Dict[str, Any] = {}
         if notebook_id:
             # Get notes for a specific notebook
             from open_notebook.domain.notebook import Notebook
             notebook = await Notebook.get(notebook_id)
             if not notebook:
                 raise HTTPException(status_code=404, detail="Notebook not found")
-            notes = await notebook.get_notes()
-        else:
-            # Get all notes
-            notes = await Note.get_all(order_by="updated desc")
-        
-        return [
-            NoteResponse(
-                id=note.id,
-                title=note.title,
-                content=note.content,
-                note_type=note.note_type,
-                created=str(note.created),
-                updated=str(note.updated),
+            conditions.append(
+                "id IN (SELECT VALUE in FROM artifact WHERE out = $notebook)"
             )
-            for note in notes
-        ]
+            params["notebook"] = ensure_record_id(notebook_id)
+        if ids:
+            conditions.append("id IN $ids")
+            params["ids"] = [ensure_record_id(note_id) for note_id in ids]
+
+        notes, next_cursor = await Note.get_page(
+            limit=limit,
+            after=after,
+            order_by="updated desc",
+            where=" AND ".join(conditions) or None,
+            params=params,
+            fields=NOTE_RESPONSE_FIELDS,
+        )
+        set_next_cursor(response, next_cursor)
+        
+        return json_response(
+            [
+                NoteResponse.model_construct(
+                    id=note.id,
+                    title=note.title,
+                    content=note.content,
+                    note_type=note.note_type,
+                    created=str(note.created),
+                    updated=str(note.updated),
+                )
+                for note in notes
+            ],
+            response,
+        )
     except HTTPException:
         raise
+    except InvalidInputError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching notes: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error fetching notes: {str(e)}")
@@ -52,9 +82,9 @@ async def create_note(note_data: NoteCreate):
         # Auto-generate title if not provided and it's an AI note
         title = note_data.title
         if not title and note_data.note_type == "ai" and note_data.content:
-            from open_notebook.graphs.prompt import graph as prompt_graph
+            from open_notebook.graphs.prompt import get_graph
             prompt = "Based on the Note below, please provide a Title for this content, with max 15 words"
-            result = await prompt_graph.ainvoke({
+            result = await get_graph().ainvoke({
                 "input_text": note_data.content,
                 "prompt": prompt
             })
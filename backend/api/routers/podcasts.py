@@ -1,10 +1,11 @@
 from typing import List, Optional
 from pathlib import Path
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from loguru import logger
 from pydantic import BaseModel
 
+from api.pagination import AfterQuery, LimitQuery, set_next_cursor
 from api.podcast_service import (
     PodcastGenerationRequest,
     PodcastGenerationResponse,
@@ -74,17 +75,18 @@ async def get_podcast_job_status(job_id: str):
 
 
 @router.get("/podcasts/episodes", response_model=List[PodcastEpisodeResponse])
-async def list_podcast_episodes():
-    """List all podcast episodes"""
+async def list_podcast_episodes(
+    response: Response,
+    limit: Optional[int] = LimitQuery,
+    after: Optional[str] = AfterQuery,
+):
+    """List podcast episodes, newest first"""
     try:
-        episodes = await PodcastService.list_episodes()
+        episodes, next_cursor = await PodcastService.list_episodes(limit, after)
+        set_next_cursor(response, next_cursor)
 
         response_episodes = []
         for episode in episodes:
-            # Skip incomplete episodes without command or audio
-            if not episode.command and not episode.audio_file:
-                continue
-            
             # Get job status if available
             job_status = None
             if episode.command:
@@ -113,6 +115,8 @@ async def list_podcast_episodes():
 
         return response_episodes
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing podcast episodes: {str(e)}")
         raise HTTPException(
@@ -6,10 +6,12 @@ from fastapi.responses import StreamingResponse
 from loguru import logger
 
 from api.models import AskRequest, AskResponse, SearchRequest, SearchResponse
+from api.responses import json_response
+from open_notebook.cache import ask_cache
 from open_notebook.domain.models import Model, model_manager
 from open_notebook.domain.notebook import text_search, vector_search
 from open_notebook.exceptions import DatabaseOperationError, InvalidInputError
-from open_notebook.graphs.ask import graph as ask_graph
+from open_notebook.scheduler import aembed
 
 router = APIRouter()
 
@@ -42,10 +44,13 @@ async def search_knowledge_base(search_request: SearchRequest):
                 note=search_request.search_notes,
             )
 
-        return SearchResponse(
-            results=results or [],
-            total_count=len(results) if results else 0,
-            search_type=search_request.type,
+        # Result rows come straight from the database and are returned as is
+        return json_response(
+            SearchResponse.model_construct(
+                results=results or [],
+                total_count=len(results) if results else 0,
+                search_type=search_request.type,
+            )
         )
 
     except InvalidInputError as e:
@@ -62,10 +67,12 @@ async def stream_ask_response(
     question: str, strategy_model: Model, answer_model: Model, final_answer_model: Model
 ) -> AsyncGenerator[str, None]:
     """Stream the ask response as Server-Sent Events."""
+    from open_notebook.graphs.ask import get_graph as get_ask_graph
+
     try:
         final_answer = None
 
-        async for chunk in ask_graph.astream(
+        async for chunk in get_ask_graph().astream(
             input=dict(question=question),
             config=dict(
                 configurable=dict(
@@ -110,10 +117,13 @@ async def stream_ask_response(
 async def ask_knowledge_base(ask_request: AskRequest):
     """Ask the knowledge base a question using AI models."""
     try:
-        # Validate models exist
-        strategy_model = await Model.get(ask_request.strategy_model)
-        answer_model = await Model.get(ask_request.answer_model)
-        final_answer_model = await Model.get(ask_request.final_answer_model)
+        # Validate models exist; fetched together so they load in one query,
+        # and the graph's own lookups of them are served by the identity map
+        strategy_model, answer_model, final_answer_model = await asyncio.gather(
+            Model.get(ask_request.strategy_model),
+            Model.get(ask_request.answer_model),
+            Model.get(ask_request.final_answer_model),
+        )
 
         if not strategy_model:
             raise HTTPException(
@@ -157,10 +167,13 @@ async def ask_knowledge_base(ask_request: AskRequest):
 async def ask_knowledge_base_simple(ask_request: AskRequest):
     """Ask the knowledge base a question and return a simple response (non-streaming)."""
     try:
-        # Validate models exist
-        strategy_model = await Model.get(ask_request.strategy_model)
-        answer_model = await Model.get(ask_request.answer_model)
-        final_answer_model = await Model.get(ask_request.final_answer_model)
+        # Validate models exist; fetched together so they load in one query,
+        # and the graph's own lookups of them are served by the identity map
+        strategy_model, answer_model, final_answer_model = await asyncio.gather(
+            Model.get(ask_request.strategy_model),
+            Model.get(ask_request.answer_model),
+            Model.get(ask_request.final_answer_model),
+        )
 
         if not strategy_model:
             raise HTTPException(
@@ -179,15 +192,37 @@ async def ask_knowledge_base_simple(ask_request: AskRequest):
             )
 
         # Check if embedding model is available
-        if not await model_manager.get_embedding_model():
+        embedding_model = await model_manager.get_embedding_model()
+        if not embedding_model:
             raise HTTPException(
                 status_code=400,
                 detail="Ask feature requires an embedding model. Please configure one in the Models section.",
             )
 
+        # Serve a previous answer to a near-identical question if still valid
+        models = (
+            ask_request.strategy_model,
+            ask_request.answer_model,
+            ask_request.final_answer_model,
+        )
+        question_embedding = None
+        if ask_request.use_cache:
+            question_embedding = (
+                await aembed(embedding_model, [ask_request.question])
+            )[0]
+            cached_answer = await ask_cache.lookup(
+                ask_request.question, question_embedding, models
+            )
+            if cached_answer:
+                return AskResponse(
+                    answer=cached_answer, question=ask_request.question, cached=True
+                )
+
         # Run the ask graph and get final result
+        from open_notebook.graphs.ask import get_graph as get_ask_graph
+
         final_answer = None
-        async for chunk in ask_graph.astream(
+        async for chunk in get_ask_graph().astream(
             input=dict(question=ask_request.question),
             config=dict(
                 configurable=dict(
@@ -204,7 +239,14 @@ async def ask_knowledge_base_simple(ask_request: AskRequest):
         if not final_answer:
             raise HTTPException(status_code=500, detail="No answer generated")
 
-        return AskResponse(answer=final_answer, question=ask_request.question)
+        if question_embedding is not None:
+            await ask_cache.store(
+                ask_request.question, question_embedding, models, final_answer
+            )
+
+        return AskResponse(
+            answer=final_answer, question=ask_request.question, cached=False
+        )
 
     except HTTPException:
         raise
@@ -1,82 +1,171 @@
-from typing import List, Optional
+import uuid
+from typing import Any, Dict, List, Optional, Union
 
-from fastapi import APIRouter, HTTPException, Query, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.exceptions import RequestValidationError
 from loguru import logger
 
+from api.command_service import CommandService, submit_transformation_batch
 from api.models import (
     AssetModel,
     CreateSourceInsightRequest,
     SourceCreate,
     SourceInsightResponse,
+    SourceJobResponse,
     SourceListResponse,
     SourceResponse,
     SourceUpdate,
+    SourceUploadForm,
 )
+from api.pagination import AfterQuery, LimitQuery, set_next_cursor
+from api.responses import json_response
+from api.uploads import ReceivedUpload, is_blob, receive_upload, upload_openapi
 from open_notebook.domain.notebook import Notebook, Source
-from open_notebook.domain.transformation import Transformation
-from open_notebook.exceptions import InvalidInputError
-from open_notebook.graphs.source import source_graph
+from open_notebook.domain.transformation import Transformation, TransformationBatch
+from open_notebook.exceptions import FileTooLargeError, InvalidInputError
 
 router = APIRouter()
 
 
+async def get_ingest_key(
+    content_state: Dict[str, Any],
+    notebook_id: str,
+    content_hash: Optional[str] = None,
+    force_reingest: bool = False,
+) -> str:
+    """Idempotency key for an ingestion; forced re-ingests get a unique one."""
+    from open_notebook.graphs.source import compute_ingest_key
+
+    ingest_key = await compute_ingest_key(content_state, notebook_id, content_hash)
+    return f"{ingest_key}:{uuid.uuid4().hex}" if force_reingest else ingest_key
+
+
+async def submit_source_job(
+    content_state: Dict[str, Any],
+    notebook_id: str,
+    transformation_ids: List[str],
+    embed: bool,
+    ingest_key: str,
+    content_hash: Optional[str] = None,
+) -> SourceJobResponse:
+    """Queue a source for processing by the command worker."""
+    job_id = await CommandService.submit_command_job(
+        "open_notebook",
+        "process_source",
+        {
+            "content_state": content_state,
+            "notebook_id": notebook_id,
+            "transformations": transformation_ids,
+            "embed": embed,
+            "ingest_key": ingest_key,
+            "content_hash": content_hash,
+        },
+    )
+    return SourceJobResponse(
+        job_id=job_id,
+        status="submitted",
+        message="Source submitted for processing",
+    )
+
+
+async def build_source_response(
+    source: Source,
+    deduplicated: bool = False,
+    transformation_batch_id: Optional[str] = None,
+) -> SourceResponse:
+    return SourceResponse(
+        id=source.id,
+        title=source.title,
+        topics=source.topics or [],
+        asset=AssetModel(
+            file_path=source.asset.file_path if source.asset else None,
+            url=source.asset.url if source.asset else None,
+        )
+        if source.asset
+        else None,
+        full_text=source.full_text,
+        embedded_chunks=await source.get_embedded_chunks(),
+        created=str(source.created),
+        updated=str(source.updated),
+        deduplicated=deduplicated,
+        transformation_batch_id=transformation_batch_id,
+    )
+
+
 @router.get("/sources", response_model=List[SourceListResponse])
 async def get_sources(
+    response: Response,
     notebook_id: Optional[str] = Query(None, description="Filter by notebook ID"),
+    ids: Optional[List[str]] = Query(None, description="Only these source IDs"),
+    limit: Optional[int] = LimitQuery,
+    after: Optional[str] = AfterQuery,
 ):
-    """Get all sources with optional notebook filtering."""
+    """Get sources, newest first, with optional notebook and ID filtering."""
     try:
         if notebook_id:
             # Get sources for a specific notebook
             notebook = await Notebook.get(notebook_id)
             if not notebook:
                 raise HTTPException(status_code=404, detail="Notebook not found")
-            sources = await notebook.get_sources()
-        else:
-            # Get all sources
-            sources = await Source.get_all(order_by="updated desc")
-
-        # Create response list with async insights count
-        response_list = []
-        for source in sources:
-            insights = await source.get_insights()
-            response_list.append(
-                SourceListResponse(
-                    id=source.id,
-                    title=source.title,
-                    topics=source.topics or [],
-                    asset=AssetModel(
-                        file_path=source.asset.file_path if source.asset else None,
-                        url=source.asset.url if source.asset else None,
-                    )
-                    if source.asset
-                    else None,
-                    embedded_chunks=await source.get_embedded_chunks(),
-                    insights_count=len(insights),
-                    created=str(source.created),
-                    updated=str(source.updated),
+
+        sources, next_cursor = await Source.get_summaries(
+            notebook_id, limit, after, ids=ids
+        )
+        set_next_cursor(response, next_cursor)
+
+        response_list = [
+            SourceListResponse.model_construct(
+                id=source["id"],
+                title=source.get("title"),
+                topics=source.get("topics") or [],
+                asset=AssetModel.model_construct(
+                    file_path=source["asset"].get("file_path"),
+                    url=source["asset"].get("url"),
                 )
+                if source.get("asset")
+                else None,
+                embedded_chunks=source["embedded_chunks"],
+                insights_count=source["insights_count"],
+                token_count=source["token_count"],
+                last_ingested=str(source["last_ingested"])
+                if source.get("last_ingested")
+                else None,
+                created=str(source["created"]),
+                updated=str(source["updated"]),
             )
+            for source in sources
+        ]
 
-        return response_list
+        return json_response(response_list, response)
     except HTTPException:
         raise
+    except InvalidInputError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching sources: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error fetching sources: {str(e)}")
 
 
-@router.post("/sources/upload", response_model=SourceResponse)
-async def upload_source_file(
-    notebook_id: str = Form(..., description="Notebook ID to add the source to"),
-    title: Optional[str] = Form(None, description="Source title"),
-    file: UploadFile = File(..., description="Source file to upload"),
-    transformations: Optional[str] = Form(default="", description="Comma-separated transformation IDs"),
-    embed: bool = Form(False, description="Whether to embed content for vector search"),
-    delete_source: bool = Form(False, description="Whether to delete uploaded file after processing")
-):
-    """Upload a source file directly (for frontend compatibility)."""
+@router.post(
+    "/sources/upload",
+    response_model=Union[SourceResponse, SourceJobResponse],
+    openapi_extra=upload_openapi(SourceUploadForm, "Source file to upload"),
+)
+async def upload_source_file(request: Request):
+    """
+    Upload a source file directly (for frontend compatibility).
+
+    Takes the fields of SourceUploadForm and the file as multipart/form-data.
+    """
+    received: Optional[ReceivedUpload] = None
     try:
+        # The file is streamed into the blob store while the body is read
+        received = await receive_upload(request)
+        form = received.parse(SourceUploadForm)
+        notebook_id = form.notebook_id
+        transformations = form.transformations
+        force_reingest = form.force_reingest
+
         # Verify notebook exists
         notebook = await Notebook.get(notebook_id)
         if not notebook:
@@ -85,22 +174,6 @@ async def upload_source_file(
                 detail=f"Notebook with ID '{notebook_id}' not found. Please create a notebook first or use a valid notebook ID."
             )
 
-        # Save uploaded file
-        import os
-        import uuid
-        uploads_dir = os.path.join(os.getcwd(), "data", "uploads")
-        os.makedirs(uploads_dir, exist_ok=True)
-        
-        # Generate unique filename
-        file_extension = os.path.splitext(file.filename)[1] if file.filename else ""
-        unique_filename = f"{uuid.uuid4().hex[:10]}{file_extension}"
-        file_path = os.path.join(uploads_dir, unique_filename)
-        
-        # Write file
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-
         # Parse transformations
         transformation_list = []
         if transformations:
@@ -117,50 +190,80 @@ async def upload_source_file(
                     )
                 transformations_objects.append(transformation)
 
-        # Prepare content_state for source_graph
+        # Store the file once per content hash
+        upload = await received.store()
+
+        # Identical content was already processed: link it instead of re-processing
+        if not force_reingest:
+            existing = await Source.get_by_content_hash(upload.content_hash)
+            if existing and existing.id:
+                if not await existing.is_in_notebook(notebook_id):
+                    await existing.add_to_notebook(notebook_id)
+                logger.info(
+                    f"Upload matches source {existing.id}, linked to notebook {notebook_id}"
+                )
+                # The requested transformations run in the background; types
+                # the source already has an insight for are skipped
+                batch_id = None
+                if transformation_list:
+                    batch = TransformationBatch(
+                        transformations=transformation_list, sources=[existing.id]
+                    )
+                    await batch.save()
+                    await submit_transformation_batch(batch)
+                    batch_id = batch.id
+                return await build_source_response(
+                    existing, deduplicated=True, transformation_batch_id=batch_id
+                )
+
+        # The blob may be shared by other sources, so content_core must never
+        # delete it (delete_source is ignored)
         content_state = {
-            "file_path": file_path,
-            "delete_source": delete_source,
-            "title": title or file.filename
+            "file_path": upload.file_path,
+            "title": form.title or received.filename
         }
-
-        # Process source using the source_graph
-        result = await source_graph.ainvoke(
-            {
-                "content_state": content_state,
-                "notebook_id": notebook_id,
-                "apply_transformations": transformations_objects,
-                "embed": embed,
-            }
+        ingest_key = await get_ingest_key(
+            content_state, notebook_id, upload.content_hash, force_reingest
         )
 
-        source = result["source"]
-
-        return SourceResponse(
-            id=source.id,
-            title=source.title,
-            topics=source.topics or [],
-            asset=AssetModel(
-                file_path=source.asset.file_path if source.asset else None,
-                url=source.asset.url if source.asset else None,
+        if form.async_processing:
+            return await submit_source_job(
+                content_state,
+                notebook_id,
+                transformation_list,
+                form.embed,
+                ingest_key,
+                upload.content_hash,
             )
-            if source.asset
-            else None,
-            full_text=source.full_text,
-            embedded_chunks=await source.get_embedded_chunks(),
-            created=str(source.created),
-            updated=str(source.updated),
+
+        # Process source using the source_graph, resuming a failed attempt
+        from open_notebook.graphs.source import ingest_source
+
+        result = await ingest_source(
+            content_state,
+            notebook_id,
+            transformations_objects,
+            form.embed,
+            ingest_key=ingest_key,
+            content_hash=upload.content_hash,
         )
-    except HTTPException:
+
+        return await build_source_response(result["source"])
+    except (HTTPException, RequestValidationError):
         raise
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except InvalidInputError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error uploading source file: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error uploading source file: {str(e)}")
+    finally:
+        if received:
+            await received.discard()
 
 
-@router.post("/sources", response_model=SourceResponse)
+@router.post("/sources", response_model=Union[SourceResponse, SourceJobResponse])
 async def create_source(source_data: SourceCreate):
     """Create a new source."""
     try:
@@ -184,7 +287,10 @@ async def create_source(source_data: SourceCreate):
                     status_code=400, detail="File path is required for upload type"
                 )
             content_state["file_path"] = source_data.file_path
-            content_state["delete_source"] = source_data.delete_source
+            # Files in the blob store may be shared by other sources
+            content_state["delete_source"] = source_data.delete_source and not is_blob(
+                source_data.file_path
+            )
         elif source_data.type == "text":
             if not source_data.content:
                 raise HTTPException(
@@ -208,33 +314,33 @@ async def create_source(source_data: SourceCreate):
                     )
                 transformations.append(transformation)
 
-        # Process source using the source_graph
-        result = await source_graph.ainvoke(
-            {
-                "content_state": content_state,
-                "notebook_id": source_data.notebook_id,
-                "apply_transformations": transformations,
-                "embed": source_data.embed,
-            }
+        ingest_key = await get_ingest_key(
+            content_state,
+            source_data.notebook_id,
+            force_reingest=source_data.force_reingest,
         )
 
-        source = result["source"]
-
-        return SourceResponse(
-            id=source.id,
-            title=source.title,
-            topics=source.topics or [],
-            asset=AssetModel(
-                file_path=source.asset.file_path if source.asset else None,
-                url=source.asset.url if source.asset else None,
+        if source_data.async_processing:
+            return await submit_source_job(
+                content_state,
+                source_data.notebook_id,
+                source_data.transformations or [],
+                source_data.embed,
+                ingest_key,
             )
-            if source.asset
-            else None,
-            full_text=source.full_text,
-            embedded_chunks=await source.get_embedded_chunks(),
-            created=str(source.created),
-            updated=str(source.updated),
+
+        # Process source using the source_graph, resuming a failed attempt
+        from open_notebook.graphs.source import ingest_source
+
+        result = await ingest_source(
+            content_state,
+            source_data.notebook_id,
+            transformations,
+            source_data.embed,
+            ingest_key=ingest_key,
         )
+
+        return await build_source_response(result["source"])
     except HTTPException:
         raise
     except InvalidInputError as e:
@@ -252,20 +358,23 @@ async def get_source(source_id: str):
         if not source:
             raise HTTPException(status_code=404, detail="Source not found")
 
-        return SourceResponse(
-            id=source.id,
-            title=source.title,
-            topics=source.topics or [],
-            asset=AssetModel(
-                file_path=source.asset.file_path if source.asset else None,
-                url=source.asset.url if source.asset else None,
+        # full_text can be large, so it is serialized once and not validated
+        return json_response(
+            SourceResponse.model_construct(
+                id=source.id,
+                title=source.title,
+                topics=source.topics or [],
+                asset=AssetModel.model_construct(
+                    file_path=source.asset.file_path,
+                    url=source.asset.url,
+                )
+                if source.asset
+                else None,
+                full_text=source.full_text,
+                embedded_chunks=await source.get_embedded_chunks(),
+                created=str(source.created),
+                updated=str(source.updated),
             )
-            if source.asset
-            else None,
-            full_text=source.full_text,
-            embedded_chunks=await source.get_embedded_chunks(),
-            created=str(source.created),
-            updated=str(source.updated),
         )
     except HTTPException:
         raise
@@ -290,21 +399,7 @@ async def update_source(source_id: str, source_update: SourceUpdate):
 
         await source.save()
 
-        return SourceResponse(
-            id=source.id,
-            title=source.title,
-            topics=source.topics or [],
-            asset=AssetModel(
-                file_path=source.asset.file_path if source.asset else None,
-                url=source.asset.url if source.asset else None,
-            )
-            if source.asset
-            else None,
-            full_text=source.full_text,
-            embedded_chunks=await source.get_embedded_chunks(),
-            created=str(source.created),
-            updated=str(source.updated),
-        )
+        return await build_source_response(source)
     except HTTPException:
         raise
     except InvalidInputError as e:
@@ -318,7 +413,7 @@ async def update_source(source_id: str, source_update: SourceUpdate):
 async def delete_source(source_id: str):
     """Delete a source."""
     try:
-        source = await Source.get(source_id)
+        source = await Source.get(source_id, omit=["full_text"])
         if not source:
             raise HTTPException(status_code=404, detail="Source not found")
 
@@ -336,7 +431,7 @@ async def delete_source(source_id: str):
 async def get_source_insights(source_id: str):
     """Get all insights for a specific source."""
     try:
-        source = await Source.get(source_id)
+        source = await Source.get(source_id, omit=["full_text"])
         if not source:
             raise HTTPException(status_code=404, detail="Source not found")
         
@@ -377,9 +472,13 @@ async def create_source_insight(
             raise HTTPException(status_code=404, detail="Transformation not found")
         
         # Run transformation graph
-        from open_notebook.graphs.transformation import graph as transform_graph
-        await transform_graph.ainvoke(
-            input=dict(source=source, transformation=transformation)
+        from open_notebook.graphs.transformation import get_graph
+        configurable = {}
+        if request.use_cache is not None:
+            configurable["use_cache"] = request.use_cache
+        await get_graph().ainvoke(
+            input=dict(source=source, transformation=transformation),
+            config=dict(configurable=configurable),
         )
         
         # Get the newly created insight (last one)
@@ -1,19 +1,31 @@
-from typing import List
+from datetime import datetime, timezone
+from typing import Any, Dict, List
 
 from fastapi import APIRouter, HTTPException
 from loguru import logger
 
+from api.command_service import CommandService, submit_transformation_batch
 from api.models import (
+    LLMCacheStatsResponse,
+    TransformationBatchCreate,
+    TransformationBatchFailure,
+    TransformationBatchResponse,
     TransformationCreate,
     TransformationExecuteRequest,
     TransformationExecuteResponse,
     TransformationResponse,
     TransformationUpdate,
 )
+from open_notebook.cache import response_cache
+from open_notebook.config import BATCH_STALE_SECONDS
 from open_notebook.domain.models import Model
-from open_notebook.domain.transformation import Transformation
-from open_notebook.exceptions import DatabaseOperationError, InvalidInputError
-from open_notebook.graphs.transformation import graph as transformation_graph
+from open_notebook.domain.notebook import Notebook
+from open_notebook.domain.transformation import Transformation, TransformationBatch
+from open_notebook.exceptions import (
+    DatabaseOperationError,
+    InvalidInputError,
+    NotFoundError,
+)
 
 router = APIRouter()
 
@@ -187,12 +199,17 @@ async def execute_transformation(execute_request: TransformationExecuteRequest):
             raise HTTPException(status_code=404, detail="Model not found")
 
         # Execute the transformation
-        result = await transformation_graph.ainvoke(
+        from open_notebook.graphs.transformation import get_graph
+
+        configurable: Dict[str, Any] = {"model_id": execute_request.model_id}
+        if execute_request.use_cache is not None:
+            configurable["use_cache"] = execute_request.use_cache
+        result = await get_graph().ainvoke(
             dict(
                 input_text=execute_request.input_text,
                 transformation=transformation,
             ),
-            config=dict(configurable={"model_id": execute_request.model_id}),
+            config=dict(configurable=configurable),
         )
 
         return TransformationExecuteResponse(
@@ -208,3 +225,155 @@ async def execute_transformation(execute_request: TransformationExecuteRequest):
         raise HTTPException(
             status_code=500, detail=f"Error executing transformation: {str(e)}"
         )
+
+
+@router.get("/transformations/cache/stats", response_model=LLMCacheStatsResponse)
+async def get_transformation_cache_stats():
+    """Get hit counters and savings of the LLM response cache for this process."""
+    return LLMCacheStatsResponse(**response_cache.get_stats())
+
+
+def batch_to_response(batch: TransformationBatch) -> TransformationBatchResponse:
+    return TransformationBatchResponse(
+        id=batch.id or "",
+        status=batch.status,
+        transformations=batch.transformations,
+        sources=batch.sources,
+        notebook_id=batch.notebook_id,
+        model_id=batch.model_id,
+        total=batch.total,
+        completed=len(batch.completed),
+        skipped=len(batch.skipped),
+        failed=[TransformationBatchFailure(**failure) for failure in batch.failed],
+        command_id=batch.command,
+        created=str(batch.created),
+        updated=str(batch.updated),
+    )
+
+
+async def is_batch_running(batch: TransformationBatch) -> bool:
+    """
+    Whether a batch is still being worked on.
+
+    A batch stays marked running when its worker dies, so it only counts as
+    running while its command is queued or running and it made progress within
+    BATCH_STALE_SECONDS.
+    """
+    if batch.status != "running":
+        return False
+    if batch.command:
+        command = await CommandService.get_command_status(batch.command)
+        if command["status"] not in ("new", "running"):
+            return False
+    if batch.updated:
+        updated = batch.updated
+        if updated.tzinfo is None:
+            updated = updated.replace(tzinfo=timezone.utc)
+        idle = (datetime.now(timezone.utc) - updated).total_seconds()
+        if idle > BATCH_STALE_SECONDS:
+            return False
+    return True
+
+
+@router.post("/transformations/batches", response_model=TransformationBatchResponse)
+async def create_transformation_batch(batch_data: TransformationBatchCreate):
+    """Apply transformations to many sources in a background job."""
+    try:
+        if not batch_data.transformation_ids:
+            raise HTTPException(
+                status_code=400, detail="At least one transformation is required"
+            )
+        for transformation_id in batch_data.transformation_ids:
+            await Transformation.get(transformation_id)
+
+        if batch_data.notebook_id:
+            notebook = await Notebook.get(batch_data.notebook_id)
+            if not notebook:
+                raise HTTPException(status_code=404, detail="Notebook not found")
+            source_ids: List[str] = [
+                source.id
+                for source in await notebook.get_sources(fields=[])
+                if source.id
+            ]
+        else:
+            source_ids = list(dict.fromkeys(batch_data.source_ids or []))
+        if not source_ids:
+            raise HTTPException(status_code=400, detail="No sources to transform")
+
+        if batch_data.model_id and not await Model.get(batch_data.model_id):
+            raise HTTPException(status_code=404, detail="Model not found")
+
+        batch = TransformationBatch(
+            transformations=batch_data.transformation_ids,
+            sources=source_ids,
+            notebook_id=batch_data.notebook_id,
+            model_id=batch_data.model_id,
+        )
+        await batch.save()
+        await submit_transformation_batch(batch)
+
+        return batch_to_response(batch)
+
+    except HTTPException:
+        raise
+    except NotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except InvalidInputError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error creating transformation batch: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Error creating transformation batch: {str(e)}"
+        )
+
+
+@router.get(
+    "/transformations/batches/{batch_id}", response_model=TransformationBatchResponse
+)
+async def get_transformation_batch(batch_id: str):
+    """Get the progress of a transformation batch."""
+    try:
+        batch = await TransformationBatch.get(batch_id)
+        if not batch:
+            raise HTTPException(status_code=404, detail="Batch not found")
+        return batch_to_response(batch)
+    except HTTPException:
+        raise
+    except NotFoundError:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    except Exception as e:
+        logger.error(f"Error fetching transformation batch {batch_id}: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Error fetching transformation batch: {str(e)}"
+        )
+
+
+@router.post(
+    "/transformations/batches/{batch_id}/resume",
+    response_model=TransformationBatchResponse,
+)
+async def resume_transformation_batch(batch_id: str):
+    """Resubmit a batch; completed and skipped pairs are not run again, failed ones are retried."""
+    try:
+        batch = await TransformationBatch.get(batch_id)
+        if not batch:
+            raise HTTPException(status_code=404, detail="Batch not found")
+        if await is_batch_running(batch):
+            raise HTTPException(status_code=409, detail="Batch is already running")
+        if not batch.pending_tasks():
+            return batch_to_response(batch)
+
+        batch.status = "pending"
+        await submit_transformation_batch(batch)
+
+        return batch_to_response(batch)
+
+    except HTTPException:
+        raise
+    except NotFoundError:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    except Exception as e:
+        logger.error(f"Error resuming transformation batch {batch_id}: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Error resuming transformation batch: {str(e)}"
+        )
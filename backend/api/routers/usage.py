@@ -0,0 +1,53 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from loguru import logger
+
+from api.models import UsageLedgerStatsResponse, UsageSummaryResponse
+from open_notebook.usage import get_usage_summary, ledger
+
+router = APIRouter()
+
+GroupField = Literal["notebook", "model", "caller", "kind", "day"]
+
+
+@router.get("/usage", response_model=List[UsageSummaryResponse])
+async def get_usage(
+    group_by: List[GroupField] = Query(
+        ["model"], description="Fields to group by, repeat for several"
+    ),
+    since: Optional[datetime] = Query(None, description="Only calls from this time"),
+    until: Optional[datetime] = Query(None, description="Only calls before this time"),
+    notebook_id: Optional[str] = Query(None, description="Only calls for this notebook"),
+):
+    """Get calls, tokens, cost and latency of model usage, grouped by the given fields."""
+    try:
+        rows = await get_usage_summary(
+            list(dict.fromkeys(group_by)), since, until, notebook_id
+        )
+        return [
+            UsageSummaryResponse(
+                notebook=row.get("notebook"),
+                model=row.get("model"),
+                caller=row.get("caller"),
+                kind=row.get("kind"),
+                day=row.get("day"),
+                calls=row.get("calls") or 0,
+                prompt_tokens=row.get("prompt_tokens") or 0,
+                completion_tokens=row.get("completion_tokens") or 0,
+                cost=row.get("cost") or 0.0,
+                avg_latency=row.get("avg_latency") or 0.0,
+                max_latency=row.get("max_latency") or 0.0,
+            )
+            for row in rows
+        ]
+    except Exception as e:
+        logger.error(f"Error fetching usage: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error fetching usage: {str(e)}")
+
+
+@router.get("/usage/stats", response_model=UsageLedgerStatsResponse)
+async def get_usage_ledger_stats():
+    """Get counters of the usage writer for this process."""
+    return UsageLedgerStatsResponse(**ledger.get_stats())
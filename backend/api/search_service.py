@@ -40,14 +40,16 @@ class SearchService:
         question: str,
         strategy_model: str,
         answer_model: str,
-        final_answer_model: str
+        final_answer_model: str,
+        use_cache: bool = True
     ) -> Dict[str, str]:
         """Ask the knowledge base a question."""
         response = api_client.ask_simple(
             question=question,
             strategy_model=strategy_model,
             answer_model=answer_model,
-            final_answer_model=final_answer_model
+            final_answer_model=final_answer_model,
+            use_cache=use_cache
         )
         return response
 
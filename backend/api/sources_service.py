@@ -3,7 +3,7 @@ Sources service layer using API.
 """
 
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from loguru import logger
 
@@ -60,7 +60,14 @@ class SourcesService:
     def get_all_sources(self, notebook_id: Optional[str] = None) -> List[SourceWithMetadata]:
         """Get all sources with optional notebook filtering."""
         sources_data = api_client.get_sources(notebook_id=notebook_id)
-        # Convert API response to SourceWithMetadata objects
+        return self._to_sources(sources_data)
+
+    def get_sources_by_ids(self, source_ids: List[str]) -> List[SourceWithMetadata]:
+        """Get many sources by ID in batched requests."""
+        return self._to_sources(api_client.get_sources_by_ids(source_ids))
+
+    def _to_sources(self, sources_data: List[Dict]) -> List[SourceWithMetadata]:
+        """Convert API response to SourceWithMetadata objects."""
         sources = []
         for source_data in sources_data:
             source = Source(
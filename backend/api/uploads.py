@@ -0,0 +1,274 @@
+"""
+Content-addressed storage for uploaded files.
+
+Upload endpoints parse their multipart body straight from the request stream
+with receive_upload, instead of declaring Form and File parameters, which make
+FastAPI read and spool the whole body before the endpoint runs.
+"""
+
+import asyncio
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, List, Optional, Type, TypeVar
+
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from open_notebook.config import BLOBS_FOLDER, MAX_UPLOAD_MB
+from open_notebook.exceptions import FileTooLargeError, InvalidInputError
+
+if TYPE_CHECKING:
+    # Only declared for type checkers
+    from python_multipart.multipart import MultipartCallbacks
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = MAX_UPLOAD_MB * 1024 * 1024
+
+# Room for the other form fields and multipart boundaries around the file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Size limit of each form field other than the file
+MAX_FIELD_BYTES = 64 * 1024
+
+FormModel = TypeVar("FormModel", bound=BaseModel)
+
+
+@dataclass
+class StoredUpload:
+    file_path: str
+    content_hash: str
+    size: int
+
+
+def is_blob(file_path: str) -> bool:
+    """Whether a file is in the blob store, where several sources may share it."""
+    blobs = os.path.abspath(BLOBS_FOLDER)
+    return os.path.commonpath([blobs, os.path.abspath(file_path)]) == blobs
+
+
+def upload_openapi(form: Type[BaseModel], description: str) -> Dict[str, Any]:
+    """OpenAPI request body of an upload endpoint: the form's fields plus `file`."""
+    schema = form.model_json_schema()
+    schema["properties"]["file"] = {
+        "type": "string",
+        "format": "binary",
+        "description": description,
+    }
+    schema["required"] = [*schema.get("required", []), "file"]
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"multipart/form-data": {"schema": schema}},
+        }
+    }
+
+
+def _write_chunk(buffer: BinaryIO, digest, chunk: bytes) -> None:
+    digest.update(chunk)
+    buffer.write(chunk)
+
+
+def _commit_blob(temp_path: str, blob_path: str) -> None:
+    if os.path.exists(blob_path):
+        os.remove(temp_path)
+    else:
+        os.replace(temp_path, blob_path)
+
+
+def _discard(temp_path: str) -> None:
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+
+@dataclass
+class ReceivedUpload:
+    """
+    A multipart upload read from the request, its file still pending.
+
+    The file was written to a temporary file in the blob store as it arrived.
+    store() moves it under its content hash; discard() removes it, so requests
+    rejected after the body was read leave nothing behind.
+    """
+
+    fields: Dict[str, str]
+    filename: Optional[str]
+    temp_path: str
+    content_hash: str
+    size: int
+    stored: Optional[StoredUpload] = field(default=None, init=False)
+
+    def parse(self, form: Type[FormModel]) -> FormModel:
+        """Validate the form fields, failing with 422 like FastAPI's Form params."""
+        try:
+            return form.model_validate(self.fields)
+        except ValidationError as e:
+            raise RequestValidationError(
+                [
+                    {**error, "loc": ("body", *error["loc"])}
+                    for error in e.errors(include_url=False)
+                ]
+            )
+
+    async def store(self) -> StoredUpload:
+        """Move the file into the blob store, reusing a blob with the same content."""
+        if self.stored is None:
+            extension = os.path.splitext(self.filename or "")[1].lower()
+            blob_path = os.path.abspath(
+                os.path.join(BLOBS_FOLDER, f"{self.content_hash}{extension}")
+            )
+            await asyncio.to_thread(_commit_blob, self.temp_path, blob_path)
+            self.stored = StoredUpload(
+                file_path=blob_path, content_hash=self.content_hash, size=self.size
+            )
+        return self.stored
+
+    async def discard(self) -> None:
+        """Remove the file unless it was stored."""
+        if self.stored is None:
+            await asyncio.to_thread(_discard, self.temp_path)
+
+
+class _MultipartReader:
+    """Callbacks of the multipart parser, collecting fields and file chunks."""
+
+    def __init__(self, file_field: str):
+        self.file_field = file_field
+        self.fields: Dict[str, str] = {}
+        self.filename: Optional[str] = None
+        self.has_file = False
+        # File data parsed from the last chunk, written by receive_upload
+        self.file_chunks: List[bytes] = []
+        self._header_field = b""
+        self._header_value = b""
+        self._name = ""
+        self._is_file = False
+        self._skip = False
+        self._data = bytearray()
+
+    def callbacks(self) -> "MultipartCallbacks":
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        }
+
+    def on_part_begin(self) -> None:
+        self._name = ""
+        self._is_file = False
+        self._skip = False
+        self._data = bytearray()
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        if self._header_field.lower() == b"content-disposition":
+            _, options = parse_options_header(self._header_value)
+            self._name = options.get(b"name", b"").decode()
+            filename = options.get(b"filename")
+            if filename is not None:
+                # Only the first file of the expected field is kept
+                self._is_file = self._name == self.file_field and not self.has_file
+                self._skip = not self._is_file
+                if self._is_file:
+                    self.filename = filename.decode()
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        if self._is_file:
+            self.has_file = True
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._is_file:
+            self.file_chunks.append(data[start:end])
+        elif not self._skip:
+            self._data += data[start:end]
+            if len(self._data) > MAX_FIELD_BYTES:
+                raise InvalidInputError(
+                    f"Form field {self._name} is over {MAX_FIELD_BYTES // 1024} KB"
+                )
+
+    def on_part_end(self) -> None:
+        if not self._is_file and not self._skip and self._name:
+            self.fields[self._name] = self._data.decode()
+
+
+async def receive_upload(request: Request, file_field: str = "file") -> ReceivedUpload:
+    """
+    Read a multipart upload from the request stream, hashing its file on the way.
+
+    The file is written in the chunks it arrives in, with the disk writes running
+    in a thread, straight to a temporary file in the blob store: it is written to
+    disk once, memory stays constant per upload and the event loop is never
+    blocked. Uploads over MAX_UPLOAD_MB are rejected before anything is read when
+    their Content-Length says so, and otherwise as soon as they pass the limit.
+    """
+    content_length = request.headers.get("content-length")
+    if (
+        content_length
+        and content_length.isdigit()
+        and int(content_length) > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES
+    ):
+        raise FileTooLargeError(f"File is too large, the limit is {MAX_UPLOAD_MB} MB")
+
+    content_type, options = parse_options_header(
+        request.headers.get("content-type", "")
+    )
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise InvalidInputError("Expected a multipart/form-data upload")
+
+    reader = _MultipartReader(file_field)
+    parser = MultipartParser(options[b"boundary"], reader.callbacks())
+    digest = hashlib.sha256()
+    size = 0
+
+    os.makedirs(BLOBS_FOLDER, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=BLOBS_FOLDER, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            async for data in request.stream():
+                parser.write(data)
+                for chunk in reader.file_chunks:
+                    size += len(chunk)
+                    if size > MAX_UPLOAD_BYTES:
+                        raise FileTooLargeError(
+                            f"File is too large, the limit is {MAX_UPLOAD_MB} MB"
+                        )
+                    await asyncio.to_thread(_write_chunk, buffer, digest, chunk)
+                reader.file_chunks.clear()
+            parser.finalize()
+
+        if not reader.has_file:
+            raise RequestValidationError(
+                [
+                    {
+                        "type": "missing",
+                        "loc": ("body", file_field),
+                        "msg": "Field required",
+                        "input": None,
+                    }
+                ]
+            )
+    except BaseException:
+        await asyncio.to_thread(_discard, temp_path)
+        raise
+
+    return ReceivedUpload(
+        fields=reader.fields,
+        filename=reader.filename,
+        temp_path=temp_path,
+        content_hash=digest.hexdigest(),
+        size=size,
+    )
@@ -1,10 +1,16 @@
 """Surreal-commands integration for Open Notebook"""
 
 from .example_commands import analyze_data_command, process_text_command
+from .maintenance_commands import rebuild_stats_command
 from .podcast_commands import generate_podcast_command
+from .source_commands import process_source_command
+from .transformation_commands import apply_transformations_command
 
 __all__ = [
     "generate_podcast_command",
+    "process_source_command",
+    "apply_transformations_command",
+    "rebuild_stats_command",
     "process_text_command",
     "analyze_data_command",
 ]
@@ -140,10 +140,4 @@ async def analyze_data_command(input_data: DataAnalysisInput) -> DataAnalysisOut
 logger.info("✅ Commands registered: process_text and analyze_data")
 logger.info("=== FINISHED IMPORTING example_commands.py ===")
 
-# Let's also verify what the registry contains
-try:
-    from surreal_commands import registry
-    commands = registry.list_commands()
-    logger.info(f"Registry after import: {commands}")
-except Exception as e:
-    logger.error(f"Error checking registry: {e}")
\ No newline at end of file
+# The registry can be inspected with GET /api/commands/registry/debug
\ No newline at end of file
@@ -0,0 +1,46 @@
+import time
+from typing import Optional
+
+from loguru import logger
+from surreal_commands import CommandInput, CommandOutput, command
+
+from open_notebook.domain.stats import rebuild_stats
+
+
+class RebuildStatsInput(CommandInput):
+    pass
+
+
+class RebuildStatsOutput(CommandOutput):
+    success: bool
+    sources: int = 0
+    notebooks: int = 0
+    processing_time: float
+    error_message: Optional[str] = None
+
+
+@command("rebuild_stats", app="open_notebook")
+async def rebuild_stats_command(input_data: RebuildStatsInput) -> RebuildStatsOutput:
+    """
+    Recompute the materialized source and notebook stats from scratch.
+    """
+    start_time = time.time()
+
+    try:
+        result = await rebuild_stats()
+        return RebuildStatsOutput(
+            success=True,
+            sources=result["sources"],
+            notebooks=result["notebooks"],
+            processing_time=time.time() - start_time,
+        )
+
+    except Exception as e:
+        logger.error(f"Rebuilding stats failed: {e}")
+        logger.exception(e)
+
+        return RebuildStatsOutput(
+            success=False,
+            processing_time=time.time() - start_time,
+            error_message=str(e),
+        )
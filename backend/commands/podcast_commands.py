@@ -9,6 +9,7 @@ from surreal_commands import CommandInput, CommandOutput, command
 from open_notebook.config import DATA_FOLDER
 from open_notebook.database.repository import ensure_record_id, repo_query
 from open_notebook.domain.podcast import EpisodeProfile, PodcastEpisode, SpeakerProfile
+from open_notebook.usage import usage_scope
 
 try:
     from podcast_creator import configure, create_podcast
@@ -133,14 +134,15 @@ async def generate_podcast_command(
         # 6. Generate podcast using podcast-creator
         logger.info("Starting podcast generation with podcast-creator...")
 
-        result = await create_podcast(
-            content=input_data.content,
-            briefing=briefing,
-            episode_name=input_data.episode_name,
-            output_dir=str(output_dir),
-            speaker_config=speaker_profile.name,
-            episode_profile=episode_profile.name,
-        )
+        with usage_scope("podcast"):
+            result = await create_podcast(
+                content=input_data.content,
+                briefing=briefing,
+                episode_name=input_data.episode_name,
+                output_dir=str(output_dir),
+                speaker_config=speaker_profile.name,
+                episode_profile=episode_profile.name,
+            )
 
         episode.audio_file = (
             str(result.get("final_output_file_path")) if result else None
@@ -0,0 +1,112 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+from surreal_commands import CommandInput, CommandOutput, command
+
+from open_notebook.config import INGESTION_MAX_CONCURRENCY
+from open_notebook.database.repository import ensure_record_id, repo_query
+from open_notebook.domain.transformation import Transformation
+from open_notebook.graphs.source import ingest_source
+from open_notebook.progress import ProgressTracker
+from open_notebook.scheduler import BACKGROUND, priority
+from open_notebook.usage import usage_scope
+
+# Limits how many sources a single worker ingests at once; embedding and
+# transformation calls of each source are bounded separately
+_ingestion_semaphore = asyncio.Semaphore(INGESTION_MAX_CONCURRENCY)
+
+
+async def set_command_progress(command_id: str, progress: Dict[str, Any]) -> None:
+    """Store the current stage on the command record so status queries can read it."""
+    await repo_query(
+        "UPDATE $id SET progress = $progress",
+        {"id": ensure_record_id(command_id), "progress": progress},
+    )
+
+
+class SourceProcessingInput(CommandInput):
+    content_state: Dict[str, Any]
+    notebook_id: str
+    transformations: List[str] = []
+    embed: bool = False
+    ingest_key: Optional[str] = None
+    content_hash: Optional[str] = None
+
+
+class SourceProcessingOutput(CommandOutput):
+    success: bool
+    source_id: Optional[str] = None
+    insights_created: int = 0
+    processing_time: float
+    error_message: Optional[str] = None
+
+
+@command("process_source", app="open_notebook")
+async def process_source_command(
+    input_data: SourceProcessingInput,
+) -> SourceProcessingOutput:
+    """
+    Extract, save, embed and transform a source in the background.
+    """
+    start_time = time.time()
+    command_id = (
+        str(input_data.execution_context.command_id)
+        if input_data.execution_context
+        else None
+    )
+    progress = (
+        ProgressTracker(lambda data: set_command_progress(command_id, data))
+        if command_id
+        else None
+    )
+
+    try:
+        if progress:
+            await progress.update("queued")
+
+        async with _ingestion_semaphore:
+            transformations = [
+                await Transformation.get(transformation_id)
+                for transformation_id in input_data.transformations
+            ]
+            # Model calls of ingestion give way to interactive requests
+            with priority(BACKGROUND), usage_scope(
+                "ingestion", input_data.notebook_id
+            ):
+                result = await ingest_source(
+                    input_data.content_state,
+                    input_data.notebook_id,
+                    transformations,
+                    input_data.embed,
+                    ingest_key=input_data.ingest_key,
+                    progress=progress,
+                    content_hash=input_data.content_hash,
+                )
+
+        source = result["source"]
+        processing_time = time.time() - start_time
+        if progress:
+            await progress.update("completed")
+        logger.info(f"Processed source {source.id} in {processing_time:.2f}s")
+
+        return SourceProcessingOutput(
+            success=True,
+            source_id=source.id,
+            insights_created=len(result.get("transformation") or []),
+            processing_time=processing_time,
+        )
+
+    except Exception as e:
+        processing_time = time.time() - start_time
+        logger.error(f"Source processing failed: {e}")
+        logger.exception(e)
+        if progress:
+            await progress.update("failed")
+
+        return SourceProcessingOutput(
+            success=False,
+            processing_time=processing_time,
+            error_message=str(e),
+        )
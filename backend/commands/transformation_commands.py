@@ -0,0 +1,150 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Set
+
+from loguru import logger
+from surreal_commands import CommandInput, CommandOutput, command
+
+from open_notebook.config import (
+    BATCH_DEFAULT_PROVIDER_CONCURRENCY,
+    BATCH_PROVIDER_CONCURRENCY,
+)
+from open_notebook.database.repository import ensure_record_id, repo_query
+from open_notebook.domain.models import Model, model_manager
+from open_notebook.domain.notebook import Source
+from open_notebook.domain.transformation import Transformation, TransformationBatch
+from open_notebook.graphs.transformation import get_graph as get_transformation_graph
+from open_notebook.scheduler import BACKGROUND, priority
+
+# Shared by every batch running in this worker, so concurrent batches that hit
+# the same provider respect a single limit
+_provider_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def get_provider_semaphore(provider: str) -> asyncio.Semaphore:
+    if provider not in _provider_semaphores:
+        _provider_semaphores[provider] = asyncio.Semaphore(
+            BATCH_PROVIDER_CONCURRENCY.get(provider, BATCH_DEFAULT_PROVIDER_CONCURRENCY)
+        )
+    return _provider_semaphores[provider]
+
+
+async def get_existing_insight_types(source_ids: List[str]) -> Dict[str, Set[str]]:
+    """Map each source id to the insight types it already has."""
+    rows = await repo_query(
+        "SELECT source, insight_type FROM source_insight WHERE source IN $ids",
+        {"ids": [ensure_record_id(source_id) for source_id in source_ids]},
+    )
+    existing: Dict[str, Set[str]] = {}
+    for row in rows:
+        existing.setdefault(row["source"], set()).add(row["insight_type"])
+    return existing
+
+
+class TransformationBatchInput(CommandInput):
+    batch_id: str
+
+
+class TransformationBatchOutput(CommandOutput):
+    success: bool
+    batch_id: str
+    completed: int = 0
+    skipped: int = 0
+    failed: int = 0
+    processing_time: float
+    error_message: Optional[str] = None
+
+
+@command("apply_transformations", app="open_notebook")
+async def apply_transformations_command(
+    input_data: TransformationBatchInput,
+) -> TransformationBatchOutput:
+    """
+    Apply the transformations of a batch to all of its sources.
+
+    Pairs already completed or skipped in a previous run are not repeated, and
+    sources that already have an insight of the transformation's type are skipped.
+    """
+    start_time = time.time()
+    batch = None
+
+    try:
+        batch = await TransformationBatch.get(input_data.batch_id)
+        await batch.start(
+            str(input_data.execution_context.command_id)
+            if input_data.execution_context
+            else None
+        )
+
+        transformations = {
+            transformation_id: await Transformation.get(transformation_id)
+            for transformation_id in batch.transformations
+        }
+        model_id = batch.model_id or await model_manager.get_default_model_id(
+            "transformation"
+        )
+        provider = (await Model.get(model_id)).provider if model_id else "default"
+        semaphore = get_provider_semaphore(provider)
+        existing = await get_existing_insight_types(batch.sources)
+
+        pending = batch.pending_tasks()
+        logger.info(
+            f"Running {len(pending)} of {batch.total} transformations for batch {batch.id} on {provider}"
+        )
+
+        async def run_task(task_key: str) -> None:
+            source_id, transformation_id = task_key.split("|", 1)
+            transformation = transformations[transformation_id]
+            if transformation.title in existing.get(source_id, set()):
+                await batch.checkpoint(task_key, "skipped")
+                return
+
+            async with semaphore:
+                try:
+                    source = await Source.get(source_id)
+                    await get_transformation_graph().ainvoke(
+                        dict(source=source, transformation=transformation),
+                        config=dict(configurable={"model_id": batch.model_id}),
+                    )
+                except Exception as e:
+                    logger.error(f"Transformation {task_key} failed: {e}")
+                    await batch.record_failure(task_key, str(e))
+                    return
+            await batch.checkpoint(task_key, "completed")
+
+        with priority(BACKGROUND):
+            await asyncio.gather(*[run_task(task_key) for task_key in pending])
+
+        await batch.set_status("completed_with_errors" if batch.failed else "completed")
+        processing_time = time.time() - start_time
+        logger.info(
+            f"Batch {batch.id} finished in {processing_time:.2f}s: "
+            f"{len(batch.completed)} completed, {len(batch.skipped)} skipped, {len(batch.failed)} failed"
+        )
+
+        return TransformationBatchOutput(
+            success=not batch.failed,
+            batch_id=input_data.batch_id,
+            completed=len(batch.completed),
+            skipped=len(batch.skipped),
+            failed=len(batch.failed),
+            processing_time=processing_time,
+        )
+
+    except Exception as e:
+        processing_time = time.time() - start_time
+        logger.error(f"Transformation batch {input_data.batch_id} failed: {e}")
+        logger.exception(e)
+        if batch:
+            # Leave it resumable instead of running forever
+            try:
+                await batch.set_status("failed")
+            except Exception as status_error:
+                logger.error(f"Could not mark batch {batch.id} failed: {status_error}")
+
+        return TransformationBatchOutput(
+            success=False,
+            batch_id=input_data.batch_id,
+            processing_time=processing_time,
+            error_message=str(e),
+        )
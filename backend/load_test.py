@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Load test of the Open Notebook API.
+
+Sends GET requests to a running API from concurrent clients for a fixed time
+and reports the throughput, latency percentiles and transferred size of each
+path. Run it before and after a change to compare:
+
+    uv run load_test.py
+    uv run load_test.py --path /api/sources --path /api/sources/source:abc
+    uv run load_test.py --concurrency 50 --seconds 30 --no-gzip
+    uv run load_test.py --seed-sources 1000 --path /api/sources
+
+--seed-sources first creates a notebook holding that many text sources and
+adds its source list to the tested paths.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+
+DEFAULT_PATHS = ["/api/notebooks", "/api/sources", "/api/notes"]
+
+
+async def worker(
+    client: httpx.AsyncClient,
+    paths: List[str],
+    deadline: float,
+    latencies: Dict[str, List[float]],
+    sizes: Dict[str, List[int]],
+    errors: Dict[str, int],
+) -> None:
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            async with client.stream("GET", path) as response:
+                # Bytes on the wire, before decompression
+                size = 0
+                async for chunk in response.aiter_raw():
+                    size += len(chunk)
+        except httpx.HTTPError:
+            errors[path] += 1
+            continue
+        if response.is_error:
+            errors[path] += 1
+            continue
+        latencies[path].append(time.perf_counter() - start)
+        sizes[path].append(size)
+
+
+async def seed_sources(client: httpx.AsyncClient, count: int, concurrency: int) -> str:
+    """Create a notebook with `count` small text sources and return its id."""
+    response = await client.post(
+        "/api/notebooks",
+        json={"name": f"Load test ({count} sources)", "description": "load_test.py"},
+    )
+    response.raise_for_status()
+    notebook_id = response.json()["id"]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def create(i: int) -> None:
+        async with semaphore:
+            response = await client.post(
+                "/api/sources",
+                json={
+                    "notebook_id": notebook_id,
+                    "type": "text",
+                    "title": f"Load test source {i}",
+                    "content": f"Load test source {i} in notebook {notebook_id}.",
+                },
+            )
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(create(i) for i in range(count)))
+    print(f"Seeded {count} sources in {time.perf_counter() - start:.1f}s\n")
+    return notebook_id
+
+
+async def run(args: argparse.Namespace) -> None:
+    headers = {"Accept-Encoding": "identity" if args.no_gzip else "gzip"}
+    password = os.getenv("OPEN_NOTEBOOK_PASSWORD")
+    if password:
+        headers["Authorization"] = f"Bearer {password}"
+    limits = httpx.Limits(max_connections=args.concurrency)
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    sizes: Dict[str, List[int]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    async with httpx.AsyncClient(
+        base_url=args.base_url, headers=headers, limits=limits, timeout=60.0
+    ) as client:
+        if args.seed_sources:
+            notebook_id = await seed_sources(
+                client, args.seed_sources, args.concurrency
+            )
+            args.paths.append(f"/api/sources?notebook_id={notebook_id}")
+        # Warm up connections and caches before timing
+        for path in args.paths:
+            await client.get(path)
+        deadline = time.perf_counter() + args.seconds
+        await asyncio.gather(
+            *(
+                worker(client, args.paths, deadline, latencies, sizes, errors)
+                for _ in range(args.concurrency)
+            )
+        )
+
+    width = max(40, *(len(path) for path in args.paths))
+    print(
+        f"{'path':<{width}} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'KB':>8} {'errors':>7}"
+    )
+    for path in args.paths:
+        times = sorted(latencies[path])
+        if not times:
+            print(f"{path:<{width}} {'no successful requests':>35} {errors[path]:>7}")
+            continue
+        p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+        print(
+            f"{path:<{width}} {len(times) / args.seconds:>8.1f} "
+            f"{statistics.median(times) * 1000:>8.1f} {p95 * 1000:>8.1f} "
+            f"{statistics.mean(sizes[path]) / 1024:>8.1f} {errors[path]:>7}"
+        )
+    total = sum(len(times) for times in latencies.values())
+    print(f"\nTotal: {total / args.seconds:.1f} req/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--base-url",
+        default=os.getenv("API_BASE_URL", "http://127.0.0.1:5055"),
+        help="API to test (API_BASE_URL)",
+    )
+    parser.add_argument(
+        "--path",
+        dest="paths",
+        action="append",
+        help="Path to request, repeatable (notebooks, sources and notes lists)",
+    )
+    parser.add_argument("--concurrency", type=int, default=20, help="Clients")
+    parser.add_argument("--seconds", type=float, default=10, help="Test duration")
+    parser.add_argument(
+        "--no-gzip", action="store_true", help="Ask for uncompressed responses"
+    )
+    parser.add_argument(
+        "--seed-sources",
+        type=int,
+        default=0,
+        help="Create a notebook with this many sources first and test its list",
+    )
+    args = parser.parse_args()
+    args.paths = args.paths or list(DEFAULT_PATHS)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Dict,
+    Generic,
+    Hashable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from loguru import logger
+
+from open_notebook.config import (
+    ASK_CACHE_MAX_ENTRIES,
+    ASK_CACHE_SIMILARITY_THRESHOLD,
+    ASK_CACHE_TTL_SECONDS,
+    LLM_CACHE_FOLDER,
+    LLM_CACHE_MAX_MB,
+)
+from open_notebook.database.repository import ensure_record_id, repo_query
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+# Record ids cited by the ask pipeline, e.g. [source:abc123] or [note:xyz]
+CITATION_PATTERN = re.compile(
+    r"\[((?:source|note|source_insight|source_embedding):[A-Za-z0-9_]+)\]"
+)
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Least-recently-used cache whose entries also expire after `ttl` seconds.
+
+    Not thread-safe: meant to be used from a single event loop.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[K, Tuple[float, V]]" = OrderedDict()
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl is not None and time.monotonic() - stored_at > self.ttl
+
+    def get(self, key: K) -> Optional[V]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        stored_at, value = item
+        if self._expired(stored_at):
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        self._data[key] = (time.monotonic(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K) -> Optional[V]:
+        item = self._data.pop(key, None)
+        return item[1] if item else None
+
+    def items(self) -> Iterator[Tuple[K, V]]:
+        """Iterate over live entries without touching their LRU position."""
+        for key in [k for k, (t, _) in self._data.items() if self._expired(t)]:
+            del self._data[key]
+        for key, (_, value) in list(self._data.items()):
+            yield key, value
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    norm_a = math.sqrt(sum(x * x for x in a))
+    norm_b = math.sqrt(sum(x * x for x in b))
+    if not norm_a or not norm_b:
+        return 0.0
+    return sum(x * y for x, y in zip(a, b)) / (norm_a * norm_b)
+
+
+_hyperplanes: Dict[int, List[List[float]]] = {}
+
+
+def similarity_bucket(embedding: List[float], bits: int = 16) -> str:
+    """
+    Locality-sensitive hash of an embedding.
+
+    Each bit is the side of a fixed random hyperplane the embedding falls on, so
+    embeddings with a high cosine similarity usually share a bucket.
+    """
+    dimensions = len(embedding)
+    if dimensions not in _hyperplanes:
+        rng = random.Random(dimensions)
+        _hyperplanes[dimensions] = [
+            [rng.gauss(0, 1) for _ in range(dimensions)] for _ in range(bits)
+        ]
+    value = 0
+    for plane in _hyperplanes[dimensions][:bits]:
+        value = (value << 1) | (sum(x * y for x, y in zip(embedding, plane)) >= 0)
+    return f"{value:0{(bits + 3) // 4}x}"
+
+
+def extract_citations(text: str) -> List[str]:
+    """Return the unique record ids cited in an answer, in order of appearance."""
+    return list(dict.fromkeys(CITATION_PATTERN.findall(text or "")))
+
+
+async def get_record_versions(ids: List[str]) -> Dict[str, Optional[str]]:
+    """Map each existing record id to its `updated` timestamp."""
+    if not ids:
+        return {}
+    result = await repo_query(
+        "SELECT id, updated FROM $ids",
+        {"ids": [ensure_record_id(id) for id in ids]},
+    )
+    return {
+        row["id"]: str(row["updated"]) if row.get("updated") else None
+        for row in result
+    }
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    embedding: List[float]
+    answer: str
+    citations: Dict[str, Optional[str]]
+
+
+class SemanticAnswerCache:
+    """
+    Caches final answers of the ask graph by question similarity.
+
+    A cached answer is only served while every record it cites still exists
+    with the same `updated` timestamp it had when the answer was generated.
+    """
+
+    def __init__(
+        self,
+        threshold: float = ASK_CACHE_SIMILARITY_THRESHOLD,
+        max_size: int = ASK_CACHE_MAX_ENTRIES,
+        ttl: Optional[float] = ASK_CACHE_TTL_SECONDS,
+    ):
+        self.threshold = threshold
+        self._entries: TTLCache[Tuple[str, Tuple[str, ...]], CachedAnswer] = (
+            TTLCache(max_size=max_size, ttl=ttl)
+        )
+
+    @staticmethod
+    def _key(question: str, models: Tuple[str, ...]) -> Tuple[str, Tuple[str, ...]]:
+        return (" ".join(question.lower().split()), models)
+
+    def _best_match(
+        self,
+        embedding: List[float],
+        candidates: List[Tuple[Tuple[str, Tuple[str, ...]], CachedAnswer]],
+    ) -> Tuple[Optional[Tuple[str, Tuple[str, ...]]], Optional[CachedAnswer], float]:
+        best_key = None
+        best_entry = None
+        best_score = self.threshold
+        for key, entry in candidates:
+            score = cosine_similarity(embedding, entry.embedding)
+            if score >= best_score:
+                best_key, best_entry, best_score = key, entry, score
+        return best_key, best_entry, best_score
+
+    async def lookup(
+        self, question: str, embedding: List[float], models: Tuple[str, ...]
+    ) -> Optional[str]:
+        # The entries are read on the event loop, as TTLCache isn't thread-safe,
+        # and compared in a thread, as scoring every entry is CPU-bound
+        candidates = [
+            (key, entry) for key, entry in self._entries.items() if key[1] == models
+        ]
+        best_key, best_entry, best_score = await asyncio.to_thread(
+            self._best_match, embedding, candidates
+        )
+
+        if best_key is None or best_entry is None:
+            return None
+
+        current = await get_record_versions(list(best_entry.citations.keys()))
+        if current != best_entry.citations:
+            logger.debug(f"Cached answer for '{best_entry.question}' is stale")
+            self._entries.pop(best_key)
+            return None
+
+        self._entries.get(best_key)
+        logger.debug(
+            f"Serving cached answer for '{best_entry.question}' (score {best_score:.3f})"
+        )
+        return best_entry.answer
+
+    async def store(
+        self,
+        question: str,
+        embedding: List[float],
+        models: Tuple[str, ...],
+        answer: str,
+    ) -> None:
+        citations = await get_record_versions(extract_citations(answer))
+        self._entries.set(
+            self._key(question, models),
+            CachedAnswer(
+                question=question,
+                embedding=embedding,
+                answer=answer,
+                citations=citations,
+            ),
+        )
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+ask_cache = SemanticAnswerCache()
+
+
+class LLMResponseCache:
+    """
+    Disk-backed cache of model responses for deterministic prompts.
+
+    Each entry is a JSON file named after the hash of its key. When the folder
+    grows beyond `max_bytes`, the least recently used entries are deleted.
+    """
+
+    def __init__(self, folder: str = LLM_CACHE_FOLDER, max_mb: int = LLM_CACHE_MAX_MB):
+        self.folder = folder
+        self.max_bytes = max_mb * 1024 * 1024
+        self._size: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self.latency_saved = 0.0
+
+    @staticmethod
+    def make_key(
+        model_id: Optional[str], system_prompt: str, input_text: str, **kwargs
+    ) -> str:
+        payload = json.dumps(
+            {
+                "model_id": model_id,
+                "system_prompt": hashlib.sha256(system_prompt.encode()).hexdigest(),
+                "input_text": hashlib.sha256(input_text.encode()).hexdigest(),
+                "kwargs": kwargs,
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.folder, f"{key}.json")
+
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+            os.utime(path)
+            return entry
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable cache entry {key}: {e}")
+            return None
+
+    def _write(self, key: str, entry: Dict[str, Any]) -> None:
+        os.makedirs(self.folder, exist_ok=True)
+        if self._size is None:
+            self._size = sum(
+                f.stat().st_size for f in os.scandir(self.folder) if f.is_file()
+            )
+        path = self._path(key)
+        data = json.dumps(entry).encode()
+        # Overwriting an entry replaces its bytes rather than adding to them
+        if os.path.exists(path):
+            self._size -= os.path.getsize(path)
+        with open(path, "wb") as f:
+            f.write(data)
+        self._size += len(data)
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self) -> None:
+        files = sorted(
+            (f for f in os.scandir(self.folder) if f.is_file()),
+            key=lambda f: f.stat().st_mtime,
+        )
+        size = sum(f.stat().st_size for f in files)
+        target = int(self.max_bytes * 0.9)
+        for f in files:
+            if size <= target:
+                break
+            size -= f.stat().st_size
+            os.remove(f.path)
+        self._size = size
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = await asyncio.to_thread(self._read, key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.tokens_saved += entry.get("tokens", 0)
+        self.latency_saved += entry.get("latency", 0.0)
+        return entry["output"]
+
+    async def set(self, key: str, output: Any, tokens: int, latency: float) -> None:
+        try:
+            await asyncio.to_thread(
+                self._write,
+                key,
+                {"output": output, "tokens": tokens, "latency": latency},
+            )
+        except OSError as e:
+            logger.warning(f"Could not write LLM cache entry: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "tokens_saved": self.tokens_saved,
+            "latency_saved_seconds": round(self.latency_saved, 3),
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+response_cache = LLMResponseCache()
@@ -1,13 +1,105 @@
 import os
 
 # ROOT DATA FOLDER
+# Folders are created by open_notebook.lifecycle on startup, not on import
 DATA_FOLDER = "./data"
 
 # LANGGRAPH CHECKPOINT FILE
-sqlite_folder = f"{DATA_FOLDER}/sqlite-db"
-os.makedirs(sqlite_folder, exist_ok=True)
-LANGGRAPH_CHECKPOINT_FILE = f"{sqlite_folder}/checkpoints.sqlite"
+SQLITE_FOLDER = f"{DATA_FOLDER}/sqlite-db"
+LANGGRAPH_CHECKPOINT_FILE = f"{SQLITE_FOLDER}/checkpoints.sqlite"
+SOURCE_CHECKPOINT_FILE = f"{SQLITE_FOLDER}/source-checkpoints.sqlite"
 
 # UPLOADS FOLDER
 UPLOADS_FOLDER = f"{DATA_FOLDER}/uploads"
-os.makedirs(UPLOADS_FOLDER, exist_ok=True)
+
+# CONTENT-ADDRESSED UPLOADS
+# Uploaded files are stored once per sha256 of their content
+BLOBS_FOLDER = f"{DATA_FOLDER}/blobs"
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "200"))
+
+# ASK ANSWER CACHE
+ASK_CACHE_SIMILARITY_THRESHOLD = float(
+    os.getenv("ASK_CACHE_SIMILARITY_THRESHOLD", "0.95")
+)
+ASK_CACHE_MAX_ENTRIES = int(os.getenv("ASK_CACHE_MAX_ENTRIES", "256"))
+ASK_CACHE_TTL_SECONDS = float(os.getenv("ASK_CACHE_TTL_SECONDS", "3600"))
+
+# MAP-REDUCE TRANSFORMATIONS
+# Inputs larger than this many tokens are split into windows of this size
+TRANSFORMATION_CHUNK_TOKENS = int(os.getenv("TRANSFORMATION_CHUNK_TOKENS", "40000"))
+TRANSFORMATION_MAX_CONCURRENCY = int(os.getenv("TRANSFORMATION_MAX_CONCURRENCY", "4"))
+
+# LLM RESPONSE CACHE
+# Opt-in cache for transformation and prompt graph responses
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() == "true"
+LLM_CACHE_FOLDER = f"{DATA_FOLDER}/llm-cache"
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", "256"))
+
+# BATCH TRANSFORMATIONS
+# Concurrent transformations per provider, overridable per provider with
+# BATCH_PROVIDER_CONCURRENCY="openai=8,ollama=1"
+BATCH_DEFAULT_PROVIDER_CONCURRENCY = int(
+    os.getenv("BATCH_DEFAULT_PROVIDER_CONCURRENCY", "2")
+)
+BATCH_PROVIDER_CONCURRENCY = {
+    provider.strip(): int(limit)
+    for provider, limit in (
+        item.split("=", 1)
+        for item in os.getenv("BATCH_PROVIDER_CONCURRENCY", "").split(",")
+        if "=" in item
+    )
+}
+# A running batch without progress for this long is considered interrupted (its
+# worker died) and can be resumed
+BATCH_STALE_SECONDS = float(os.getenv("BATCH_STALE_SECONDS", "900"))
+
+# SOURCE INGESTION
+# Sources processed at once by each command worker, and chunks embedded at once
+# per source
+INGESTION_MAX_CONCURRENCY = int(os.getenv("INGESTION_MAX_CONCURRENCY", "2"))
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "8"))
+
+# CROSS-PROCESS CACHE INVALIDATION
+# Settings and model caches follow changes made by other processes through
+# SurrealDB LIVE queries (requires a WebSocket SURREAL_URL)
+CACHE_INVALIDATION_ENABLED = (
+    os.getenv("CACHE_INVALIDATION_ENABLED", "true").lower() == "true"
+)
+
+# MODEL CLIENTS
+# Provider clients kept per process (least recently used are dropped), and how
+# long the default model assignments are trusted before being re-read
+MODEL_CACHE_MAX_ENTRIES = int(os.getenv("MODEL_CACHE_MAX_ENTRIES", "32"))
+DEFAULT_MODELS_TTL_SECONDS = float(os.getenv("DEFAULT_MODELS_TTL_SECONDS", "60"))
+
+# Rate limits for models without their own rpm/tpm, unset means unlimited
+LLM_DEFAULT_RPM = int(os.getenv("LLM_DEFAULT_RPM", "0")) or None
+LLM_DEFAULT_TPM = int(os.getenv("LLM_DEFAULT_TPM", "0")) or None
+
+# HEDGED REQUESTS
+# Start a fallback model for chat and ask when the first one is slower than usual
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true"
+# Calls a model needs before its latency is trusted to set a deadline
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+# USAGE LEDGER
+# Model calls are recorded in the usage table, written every few seconds or
+# once a batch fills up
+USAGE_LEDGER_ENABLED = os.getenv("USAGE_LEDGER_ENABLED", "true").lower() == "true"
+USAGE_FLUSH_SECONDS = float(os.getenv("USAGE_FLUSH_SECONDS", "5"))
+USAGE_BATCH_SIZE = int(os.getenv("USAGE_BATCH_SIZE", "100"))
+
+# CHAT CONTEXT
+# Tokens of notebook context for models without a known context window, the
+# share of the window used for models that have one, and the most any single
+# source or note can take
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "60000"))
+CONTEXT_WINDOW_SHARE = float(os.getenv("CONTEXT_WINDOW_SHARE", "0.5"))
+CONTEXT_ITEM_MAX_TOKENS = int(os.getenv("CONTEXT_ITEM_MAX_TOKENS", "20000"))
+CONTEXT_CACHE_MAX_ENTRIES = int(os.getenv("CONTEXT_CACHE_MAX_ENTRIES", "128"))
+CONTEXT_CACHE_TTL_SECONDS = float(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "600"))
+# Packed contexts are cached whole, and the content of each source or note apart,
+# so a context where a few items changed only refetches those
+CONTEXT_ITEM_CACHE_MAX_ENTRIES = int(
+    os.getenv("CONTEXT_ITEM_CACHE_MAX_ENTRIES", "2048")
+)
@@ -79,7 +79,7 @@ async def repo_query(
             raise
 
 
-async def repo_create(table: str, data: Dict[str, Any]) -> Dict[str, Any]:
+async def repo_create(table: str, data: Dict[str, Any]) -> List[Dict[str, Any]]:
     """Create a new record in the specified table"""
     # Remove 'id' attribute if it exists in data
     data.pop("id", None)
@@ -1,8 +1,28 @@
+import base64
+import json
 from datetime import datetime
-from typing import Any, ClassVar, Dict, List, Optional, Type, TypeVar, cast
+from typing import (
+    Any,
+    ClassVar,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+    cast,
+)
 
 from loguru import logger
-from pydantic import BaseModel, ValidationError, field_validator, model_validator
+from pydantic import (
+    BaseModel,
+    PrivateAttr,
+    ValidationError,
+    field_validator,
+    model_validator,
+)
 
 from open_notebook.database.repository import (
     ensure_record_id,
@@ -13,6 +33,7 @@ from open_notebook.database.repository import (
     repo_update,
     repo_upsert,
 )
+from open_notebook.domain.identity import get_identity_map
 from open_notebook.exceptions import (
     DatabaseOperationError,
     InvalidInputError,
@@ -20,6 +41,37 @@ from open_notebook.exceptions import (
 )
 
 T = TypeVar("T", bound="ObjectModel")
+R = TypeVar("R", bound="RecordModel")
+
+
+# Column with the sort value as SurrealDB prints it. Datetimes are stored with
+# nanoseconds but decoded by the SDK with microseconds, so a cursor built from
+# the decoded value would not match the row it was taken from
+CURSOR_COLUMN = "cursor_value"
+
+
+def cursor_column(field: str) -> str:
+    """Projection adding the sort value that encode_cursor reads."""
+    return f"<string>{field} AS {CURSOR_COLUMN}"
+
+
+def encode_cursor(row: Dict[str, Any], field: str) -> str:
+    """Opaque cursor pointing right after a row selected with cursor_column."""
+    payload = {
+        "v": row[CURSOR_COLUMN] if isinstance(row.get(field), datetime) else row[field],
+        "dt": isinstance(row.get(field), datetime),
+        "id": row["id"],
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, bool, str]:
+    """Sort value, whether it is a datetime string, and id of a cursor."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return payload["v"], bool(payload.get("dt")), payload["id"]
+    except Exception:
+        raise InvalidInputError("Invalid pagination cursor")
 
 
 class ObjectModel(BaseModel):
@@ -27,9 +79,86 @@ class ObjectModel(BaseModel):
     table_name: ClassVar[str] = ""
     created: Optional[datetime] = None
     updated: Optional[datetime] = None
+    # Stored attributes no model reads back, such as embeddings, never fetched
+    omit_by_default: ClassVar[List[str]] = []
+    # Fields get_page can order by; ties are broken by id
+    sortable_fields: ClassVar[List[str]] = ["created", "updated"]
+    # Model fields left out by the projection this instance was loaded with
+    _omitted: Set[str] = PrivateAttr(default_factory=set)
 
     @classmethod
-    async def get_all(cls: Type[T], order_by=None) -> List[T]:
+    def _projection(
+        cls,
+        fields: Optional[Sequence[str]] = None,
+        omit: Optional[Sequence[str]] = None,
+    ) -> Tuple[str, Set[str]]:
+        """
+        Build the SELECT clause for a projection, and the model fields it leaves out.
+
+        `fields` selects only those fields (plus id, created and updated), while
+        `omit` selects everything else. Required fields can't be left out, since
+        the model couldn't be built without them.
+        """
+        model_fields = set(cls.model_fields) - set(ObjectModel.model_fields)
+        unknown = (set(fields or []) | set(omit or [])) - model_fields
+        if unknown:
+            raise InvalidInputError(
+                f"Unknown fields for {cls.table_name}: {', '.join(sorted(unknown))}"
+            )
+
+        omitted = model_fields - set(fields) if fields is not None else set(omit or [])
+        required = sorted(
+            name for name in omitted if cls.model_fields[name].is_required()
+        )
+        if required:
+            raise InvalidInputError(
+                f"Required fields of {cls.table_name} can't be omitted: {', '.join(required)}"
+            )
+
+        if fields is not None:
+            return ", ".join(["id", "created", "updated", *fields]), omitted
+        hidden = [*cls.omit_by_default, *sorted(omitted)]
+        return ("* OMIT " + ", ".join(hidden)) if hidden else "*", omitted
+
+    @classmethod
+    def _from_projection(cls: Type[T], data: Dict[str, Any], omitted: Set[str]) -> T:
+        obj = cls(**data)
+        obj._omitted = set(omitted)
+        return obj
+
+    def is_loaded(self, field: str) -> bool:
+        return field not in self._omitted
+
+    async def ensure_loaded(self, *fields: str) -> None:
+        """
+        Fetch fields left out when this object was loaded, all of them by default.
+
+        Fields that are already loaded are not fetched again, so domain methods
+        call this before reading a heavy field instead of callers having to
+        know how the object was loaded.
+        """
+        missing = sorted(
+            field for field in (fields or self._omitted) if field in self._omitted
+        )
+        if not missing or self.id is None:
+            return
+        result = await repo_query(
+            f"SELECT {', '.join(missing)} FROM $id", {"id": ensure_record_id(self.id)}
+        )
+        if not result:
+            raise NotFoundError(f"{self.table_name} with id {self.id} not found")
+        loaded = self.__class__(**{**self.model_dump(), **result[0]})
+        for field in missing:
+            setattr(self, field, getattr(loaded, field))
+        self._omitted -= set(missing)
+
+    @classmethod
+    async def get_all(
+        cls: Type[T],
+        order_by=None,
+        fields: Optional[Sequence[str]] = None,
+        omit: Optional[Sequence[str]] = None,
+    ) -> List[T]:
         try:
             # If called from a specific subclass, use its table_name
             if cls.table_name:
@@ -40,16 +169,17 @@ class ObjectModel(BaseModel):
                 raise InvalidInputError(
                     "get_all() must be called from a specific model class"
                 )
+            projection, omitted = target_class._projection(fields, omit)
             if order_by:
-                query = f"SELECT * FROM {table_name} ORDER BY {order_by}"
+                query = f"SELECT {projection} FROM {table_name} ORDER BY {order_by}"
             else:
-                query = f"SELECT * FROM {table_name}"
+                query = f"SELECT {projection} FROM {table_name}"
 
             result = await repo_query(query)
             objects = []
             for obj in result:
                 try:
-                    objects.append(target_class(**obj))
+                    objects.append(target_class._from_projection(obj, omitted))
                 except Exception as e:
                     logger.critical(f"Error creating object: {str(e)}")
 
@@ -60,7 +190,104 @@ class ObjectModel(BaseModel):
             raise DatabaseOperationError(e)
 
     @classmethod
-    async def get(cls: Type[T], id: str) -> T:
+    def _keyset(
+        cls, order_by: str, after: Optional[str] = None
+    ) -> Tuple[str, str, str, Dict[str, Any]]:
+        """
+        Parse order_by for keyset pagination.
+
+        Returns the sort field, the ORDER BY clause, the condition selecting the
+        rows after the cursor ("" without one) and its parameters.
+        """
+        parts = order_by.split()
+        field = parts[0] if parts else ""
+        direction = parts[1].upper() if len(parts) > 1 else "ASC"
+        if (
+            field not in cls.sortable_fields
+            or direction not in ("ASC", "DESC")
+            or len(parts) > 2
+        ):
+            raise InvalidInputError(
+                f"Cannot order {cls.table_name} by '{order_by}', use one of "
+                f"{', '.join(cls.sortable_fields)} followed by asc or desc"
+            )
+        order = f"ORDER BY {field} {direction}, id {direction}"
+        if not after:
+            return field, order, "", {}
+
+        value, is_datetime, last_id = decode_cursor(after)
+        op = "<" if direction == "DESC" else ">"
+        after_value = "<datetime>$after_value" if is_datetime else "$after_value"
+        condition = (
+            f"({field} {op} {after_value}"
+            f" OR ({field} = {after_value} AND id {op} $after_id))"
+        )
+        return (
+            field,
+            order,
+            condition,
+            {"after_value": value, "after_id": ensure_record_id(last_id)},
+        )
+
+    @classmethod
+    async def get_page(
+        cls: Type[T],
+        limit: Optional[int] = None,
+        after: Optional[str] = None,
+        order_by: str = "updated desc",
+        where: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+        fields: Optional[Sequence[str]] = None,
+        omit: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[T], Optional[str]]:
+        """
+        Fetch one page of records and the cursor of the next one.
+
+        Filtering happens in the query (`where` is a SurrealQL condition using
+        `params`), and pages continue from the last row seen instead of an
+        offset, so every page costs the same however deep it is. Without a
+        limit all matching records are returned and there is no next cursor.
+        """
+        if not cls.table_name:
+            raise InvalidInputError(
+                "get_page() must be called from a specific model class"
+            )
+        field, order, condition, query_params = cls._keyset(order_by, after)
+        projection, omitted = cls._projection(fields, omit)
+        # The sort field must be selected to build the next cursor
+        if fields is not None and field not in [*fields, "created", "updated"]:
+            projection = f"{projection}, {field}"
+        projection = f"{projection}, {cursor_column(field)}"
+
+        conditions = [c for c in (where, condition) if c]
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        limit_clause = f"LIMIT {limit + 1}" if limit else ""
+        try:
+            result = await repo_query(
+                f"SELECT {projection} FROM {cls.table_name} "
+                f"{where_clause} {order} {limit_clause}",
+                {**(params or {}), **query_params},
+            )
+        except Exception as e:
+            logger.error(f"Error fetching page of {cls.table_name}: {str(e)}")
+            logger.exception(e)
+            raise DatabaseOperationError(e)
+
+        next_cursor = None
+        if limit and len(result) > limit:
+            result = result[:limit]
+            next_cursor = encode_cursor(result[-1], field)
+        for row in result:
+            row.pop(CURSOR_COLUMN, None)
+        return [cls._from_projection(row, omitted) for row in result], next_cursor
+
+    @classmethod
+    async def get(
+        cls: Type[T],
+        id: str,
+        fields: Optional[Sequence[str]] = None,
+        omit: Optional[Sequence[str]] = None,
+    ) -> T:
         if not id:
             raise InvalidInputError("ID cannot be empty")
         try:
@@ -77,11 +304,26 @@ class ObjectModel(BaseModel):
                     raise InvalidInputError(f"No class found for table {table_name}")
                 target_class = cast(Type[T], found_class)
 
-            result = await repo_query("SELECT * FROM $id", {"id": ensure_record_id(id)})
-            if result:
-                return target_class(**result[0])
+            projection, omitted = target_class._projection(fields, omit)
+            identity_map = get_identity_map()
+            if identity_map:
+                # A fully loaded instance satisfies any projection
+                cached = identity_map.get(id)
+                if isinstance(cached, target_class) and not cached._omitted:
+                    return cached
+                row = await identity_map.load(table_name, id, projection)
             else:
+                result = await repo_query(
+                    f"SELECT {projection} FROM $id", {"id": ensure_record_id(id)}
+                )
+                row = result[0] if result else None
+
+            if not row:
                 raise NotFoundError(f"{table_name} with id {id} not found")
+            obj = target_class._from_projection(row, omitted)
+            if identity_map and not omitted:
+                obj = identity_map.add(obj)
+            return obj
         except Exception as e:
             logger.error(f"Error fetching object with id {id}: {str(e)}")
             logger.exception(e)
@@ -111,6 +353,7 @@ class ObjectModel(BaseModel):
 
     async def save(self) -> None:
         from open_notebook.domain.models import model_manager
+        from open_notebook.scheduler import aembed
 
         try:
             self.model_validate(self.model_dump(), strict=True)
@@ -126,7 +369,7 @@ class ObjectModel(BaseModel):
                             "No embedding model found. Content will not be searchable."
                         )
                     data["embedding"] = (
-                        (await EMBEDDING_MODEL.aembed([embedding_content]))[0]
+                        (await aembed(EMBEDDING_MODEL, [embedding_content]))[0]
                         if EMBEDDING_MODEL
                         else []
                     )
@@ -145,6 +388,7 @@ class ObjectModel(BaseModel):
                     self.__class__.table_name, self.id, data
                 )
             # Update the current instance with the result
+            self._omitted -= set(repo_result[0])
             for key, value in repo_result[0].items():
                 if hasattr(self, key):
                     if isinstance(getattr(self, key), BaseModel):
@@ -152,6 +396,10 @@ class ObjectModel(BaseModel):
                     else:
                         setattr(self, key, value)
 
+            identity_map = get_identity_map()
+            if identity_map and not self._omitted:
+                identity_map.replace(self)
+
         except ValidationError as e:
             logger.error(f"Validation failed: {e}")
             raise
@@ -160,7 +408,8 @@ class ObjectModel(BaseModel):
             raise DatabaseOperationError(e)
 
     def _prepare_save_data(self) -> Dict[str, Any]:
-        data = self.model_dump()
+        # Fields that were never loaded must not overwrite the stored values
+        data = self.model_dump(exclude=self._omitted)
         return {key: value for key, value in data.items() if value is not None}
 
     async def delete(self) -> bool:
@@ -168,6 +417,9 @@ class ObjectModel(BaseModel):
             raise InvalidInputError("Cannot delete object without an ID")
         try:
             logger.debug(f"Deleting record with id {self.id}")
+            identity_map = get_identity_map()
+            if identity_map:
+                identity_map.discard(self.id)
             return await repo_delete(self.id)
         except Exception as e:
             logger.error(
@@ -214,9 +466,10 @@ class RecordModel(BaseModel):
         defer_build = True
 
     def __new__(cls, **kwargs):
-        # If an instance already exists for this record_id, return it
-        if cls.record_id in cls._instances:
-            instance = cls._instances[cls.record_id]
+        # If an instance already exists for this record_id, return it; read
+        # once, since instances may be invalidated from another thread
+        instance = cls._instances.get(cls.record_id)
+        if instance is not None:
             # Update instance with any new kwargs if provided
             if kwargs:
                 for key, value in kwargs.items():
@@ -267,8 +520,11 @@ class RecordModel(BaseModel):
             object.__setattr__(self, "_db_loaded", True)
 
     @classmethod
-    async def get_instance(cls) -> "RecordModel":
+    async def get_instance(cls: Type[R]) -> R:
         """Get or create the singleton instance and load from DB"""
+        from open_notebook.domain.invalidation import start_cache_invalidation
+
+        start_cache_invalidation()
         instance = cls()
         await instance._load_from_db()
         return instance
@@ -316,6 +572,15 @@ class RecordModel(BaseModel):
         if cls.record_id in cls._instances:
             del cls._instances[cls.record_id]
 
+    @staticmethod
+    def invalidate_record(record_id: str):
+        """Forget the instance of a record so it is reloaded on next use"""
+        RecordModel._instances.pop(record_id, None)
+
+    @staticmethod
+    def invalidate_all():
+        RecordModel._instances.clear()
+
     async def patch(self, model_dict: dict):
         """Update model attributes from dictionary and save"""
         for key, value in model_dict.items():
@@ -0,0 +1,378 @@
+"""
+Notebook context for chat, packed into a token budget.
+
+The selected sources and notes are fetched with one query per kind of record:
+titles, insights, notes and the embedded chunks of "full content" sources. Every
+piece is scored by its similarity to the question, when there is one, and
+pieces are packed greedily into the model's token budget: insights and notes
+first, then chunks of full text, best scores first. No single source or note
+can take more than CONTEXT_ITEM_MAX_TOKENS.
+
+Each context has a version, derived from the selection, budget, question and
+the `updated` timestamp of every included record. Packed contexts are cached by
+that version without the question, plus the similarity bucket of the question,
+so close rephrasings of a question share a context. The fetched, token-counted
+content of each record is cached by the record's own version and the same
+bucket, so when a few records change only those are read again before packing.
+"""
+
+import asyncio
+import dataclasses
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+from loguru import logger
+
+from open_notebook.cache import TTLCache, similarity_bucket
+from open_notebook.config import (
+    CONTEXT_CACHE_MAX_ENTRIES,
+    CONTEXT_CACHE_TTL_SECONDS,
+    CONTEXT_ITEM_CACHE_MAX_ENTRIES,
+    CONTEXT_ITEM_MAX_TOKENS,
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_WINDOW_SHARE,
+)
+from open_notebook.database.repository import ensure_record_id, repo_query
+from open_notebook.domain.models import Model, model_manager
+from open_notebook.scheduler import aembed
+from open_notebook.utils import split_text, token_count
+
+Level = Literal["short", "long"]
+
+# Characters of a note kept in short context
+NOTE_PREVIEW_CHARS = 100
+
+# Pieces cut to fit the budget are dropped instead when less than this remains
+MIN_PIECE_TOKENS = 50
+
+# Similarity to the question, 0 for records embedded with another model
+SCORE = """IF array::len($question) > 0
+    AND array::len(embedding ?? []) = array::len($question)
+    THEN vector::similarity::cosine(embedding, $question) ELSE 0 END"""
+
+
+@dataclass
+class Piece:
+    item_id: str
+    kind: Literal["insight", "note", "chunk"]
+    text: str
+    score: float = 0.0
+    order: int = 0
+    data: Dict[str, Any] = field(default_factory=dict)
+    tokens: int = 0
+
+
+@dataclass
+class Item:
+    title: Optional[str]
+    pieces: List[Piece]
+
+
+@dataclass
+class PackedContext:
+    sources: List[Dict[str, Any]]
+    notes: List[Dict[str, Any]]
+    total_tokens: int
+    token_budget: int
+    truncated: bool
+    version: str
+
+
+# (context version without the question, question bucket) -> packed context
+_cache: TTLCache[Tuple[str, str], PackedContext] = TTLCache(
+    max_size=CONTEXT_CACHE_MAX_ENTRIES, ttl=CONTEXT_CACHE_TTL_SECONDS
+)
+
+# (record id, level, record version, question bucket) -> fetched content
+_items: TTLCache[Tuple[str, str, str, str], Item] = TTLCache(
+    max_size=CONTEXT_ITEM_CACHE_MAX_ENTRIES, ttl=CONTEXT_CACHE_TTL_SECONDS
+)
+
+
+async def get_item_versions(ids: List[str]) -> Dict[str, str]:
+    """Version of each existing record, from its timestamp and processed content."""
+    if not ids:
+        return {}
+    rows = await repo_query(
+        """
+        SELECT
+            id,
+            updated,
+            type::thing("source_stats", record::id(id)).insight_count AS insights,
+            type::thing("source_stats", record::id(id)).chunk_count AS chunks
+        FROM $ids
+        """,
+        {"ids": [ensure_record_id(id) for id in ids]},
+    )
+    return {
+        str(row["id"]): "/".join(
+            str(row.get(key)) for key in ("updated", "insights", "chunks")
+        )
+        for row in rows
+    }
+
+
+def get_context_version(
+    notebook_id: str,
+    sources: Dict[str, Level],
+    notes: Dict[str, Level],
+    question: Optional[str],
+    budget: int,
+    versions: Dict[str, str],
+) -> str:
+    """Version of a context, changing whenever its content could."""
+    fingerprint = [
+        notebook_id,
+        {str(ensure_record_id(id)): level for id, level in sources.items()},
+        {str(ensure_record_id(id)): level for id, level in notes.items()},
+        question or "",
+        budget,
+        versions,
+    ]
+    payload = json.dumps(fingerprint, sort_keys=True).encode()
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+async def get_token_budget(model_id: Optional[str] = None) -> int:
+    """Context tokens for a model, or for the default chat model."""
+    model_id = model_id or await model_manager.get_default_model_id("chat")
+    if model_id:
+        try:
+            model = await Model.get(model_id)
+            if model.context_window:
+                return int(model.context_window * CONTEXT_WINDOW_SHARE)
+        except Exception as e:
+            logger.warning(f"Could not read the context window of {model_id}: {e}")
+    return CONTEXT_TOKEN_BUDGET
+
+
+async def _fetch_items(
+    sources: Dict[str, Level],
+    notes: Dict[str, Level],
+    question: Optional[List[float]],
+) -> Dict[str, Item]:
+    """Title and every piece of content the given records could add, by record id."""
+    source_ids = [ensure_record_id(id) for id in sources]
+    long_ids = [
+        ensure_record_id(id) for id, level in sources.items() if level == "long"
+    ]
+    note_ids = [ensure_record_id(id) for id in notes]
+
+    async def query(sql: str, ids: list) -> List[Dict[str, Any]]:
+        if not ids:
+            return []
+        return await repo_query(sql, {"ids": ids, "question": question or []})
+
+    titles, insights, chunks, note_rows = await asyncio.gather(
+        query("SELECT id, title FROM $ids", source_ids),
+        query(
+            f"""
+            SELECT id, source, insight_type, content, {SCORE} AS score
+            FROM source_insight WHERE source IN $ids
+            """,
+            source_ids,
+        ),
+        query(
+            f"""
+            SELECT source, order, content, {SCORE} AS score
+            FROM source_embedding WHERE source IN $ids
+            """,
+            long_ids,
+        ),
+        query(f"SELECT id, title, content, {SCORE} AS score FROM $ids", note_ids),
+    )
+
+    items = {row["id"]: Item(title=row.get("title"), pieces=[]) for row in titles}
+    for row in insights:
+        items[row["source"]].pieces.append(
+            Piece(
+                item_id=row["source"],
+                kind="insight",
+                text=row.get("content") or "",
+                score=row.get("score") or 0.0,
+                data=dict(id=row["id"], insight_type=row.get("insight_type")),
+            )
+        )
+    for row in chunks:
+        items[row["source"]].pieces.append(
+            Piece(
+                item_id=row["source"],
+                kind="chunk",
+                text=row.get("content") or "",
+                score=row.get("score") or 0.0,
+                order=row.get("order") or 0,
+            )
+        )
+
+    # Sources that were never embedded are split on the fly, in document order
+    unembedded = set(map(str, long_ids)) - {row["source"] for row in chunks}
+    for row in await query(
+        "SELECT id, full_text FROM $ids", [ensure_record_id(id) for id in unembedded]
+    ):
+        items[row["id"]].pieces += [
+            Piece(item_id=row["id"], kind="chunk", text=text, order=order)
+            for order, text in enumerate(split_text(row.get("full_text") or ""))
+        ]
+
+    for row in note_rows:
+        content = row.get("content") or ""
+        if notes.get(row["id"]) == "short":
+            content = content[:NOTE_PREVIEW_CHARS]
+        piece = Piece(
+            item_id=row["id"],
+            kind="note",
+            text=content,
+            score=row.get("score") or 0.0,
+        )
+        items[row["id"]] = Item(title=row.get("title"), pieces=[piece])
+    return items
+
+
+def _count_tokens(items: Dict[str, Item]) -> None:
+    for item in items.values():
+        for piece in item.pieces:
+            piece.tokens = token_count(piece.text)
+
+
+def _pack(items: List[Item], budget: int) -> Tuple[List[Piece], int, bool]:
+    """Greedily keep the best pieces that fit the budget and the per-item cap."""
+    used = sum(token_count(item.title or "") for item in items)
+    per_item: Dict[str, int] = {}
+    kept: List[Piece] = []
+    truncated = False
+
+    pieces = sorted(
+        (piece for item in items for piece in item.pieces),
+        key=lambda piece: (piece.kind == "chunk", -piece.score, piece.order),
+    )
+    for piece in pieces:
+        allowed = min(
+            budget - used, CONTEXT_ITEM_MAX_TOKENS - per_item.get(piece.item_id, 0)
+        )
+        if piece.tokens > allowed:
+            truncated = True
+            # Chunks are small enough to skip, longer insights and notes are cut
+            if piece.kind == "chunk" or allowed < MIN_PIECE_TOKENS:
+                continue
+            # Cut a copy, the cached piece is shared with other contexts
+            text = piece.text[: len(piece.text) * allowed // piece.tokens]
+            piece = dataclasses.replace(piece, text=text, tokens=token_count(text))
+        used += piece.tokens
+        per_item[piece.item_id] = per_item.get(piece.item_id, 0) + piece.tokens
+        kept.append(piece)
+    return kept, used, truncated
+
+
+async def build_context(
+    notebook_id: str,
+    sources: Dict[str, Level],
+    notes: Dict[str, Level],
+    question: Optional[str] = None,
+    model_id: Optional[str] = None,
+    token_budget: Optional[int] = None,
+    versions: Optional[Dict[str, str]] = None,
+) -> PackedContext:
+    """
+    Build the chat context of a notebook from the selected sources and notes.
+
+    Sources at "short" level contribute their insights, and at "long" level also
+    their full text; notes contribute a preview or their full content. Pass the
+    `versions` of get_item_versions when already read, to skip reading them again.
+    """
+    sources = {str(ensure_record_id(id)): level for id, level in sources.items()}
+    notes = {str(ensure_record_id(id)): level for id, level in notes.items()}
+    budget = token_budget or await get_token_budget(model_id)
+    if versions is None:
+        versions = await get_item_versions([*sources, *notes])
+    version = get_context_version(
+        notebook_id, sources, notes, question, budget, versions
+    )
+
+    embedding = None
+    if question:
+        embedding_model = await model_manager.get_embedding_model()
+        if embedding_model:
+            embedding = (await aembed(embedding_model, [question]))[0]
+    bucket = similarity_bucket(embedding) if embedding else ""
+
+    # The question only matters through its embedding, like for the items
+    cache_key = (
+        get_context_version(notebook_id, sources, notes, None, budget, versions),
+        bucket,
+    )
+    cached = _cache.get(cache_key)
+    if cached:
+        return dataclasses.replace(cached, version=version)
+
+    # Reuse the content of records unchanged since it was fetched, read the rest
+    selected = [
+        (id, level)
+        for id, level in [*sources.items(), *notes.items()]
+        if id in versions
+    ]
+    items: Dict[str, Item] = {}
+    stale_sources: Dict[str, Level] = {}
+    stale_notes: Dict[str, Level] = {}
+    for id, level in selected:
+        item = _items.get((id, level, versions[id], bucket))
+        if item is not None:
+            items[id] = item
+        elif id in sources:
+            stale_sources[id] = level
+        else:
+            stale_notes[id] = level
+    if stale_sources or stale_notes:
+        fetched = await _fetch_items(stale_sources, stale_notes, embedding)
+        # Counting tokens is CPU-bound, keep it off the event loop
+        await asyncio.to_thread(_count_tokens, fetched)
+        for id, item in fetched.items():
+            level = sources.get(id) or notes[id]
+            _items.set((id, level, versions[id], bucket), item)
+        items.update(fetched)
+
+    kept, used, truncated = _pack(list(items.values()), budget)
+
+    by_item: Dict[str, List[Piece]] = {}
+    for piece in kept:
+        by_item.setdefault(piece.item_id, []).append(piece)
+
+    source_contexts = []
+    for source_id, level in sources.items():
+        if source_id not in items:
+            continue
+        pieces = by_item.get(source_id, [])
+        context: Dict[str, Any] = dict(
+            id=source_id,
+            title=items[source_id].title,
+            insights=[
+                {**piece.data, "content": piece.text}
+                for piece in pieces
+                if piece.kind == "insight"
+            ],
+        )
+        if level == "long":
+            chunks = sorted(
+                (piece for piece in pieces if piece.kind == "chunk"),
+                key=lambda piece: piece.order,
+            )
+            context["full_text"] = "\n\n".join(piece.text for piece in chunks)
+        source_contexts.append(context)
+
+    note_contexts = [
+        dict(id=piece.item_id, title=items[note_id].title, content=piece.text)
+        for note_id in notes
+        for piece in by_item.get(note_id, [])
+    ]
+
+    packed = PackedContext(
+        sources=source_contexts,
+        notes=note_contexts,
+        total_tokens=used,
+        token_budget=budget,
+        truncated=truncated,
+        version=version,
+    )
+    _cache.set(cache_key, packed)
+    return packed
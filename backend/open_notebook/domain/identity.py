@@ -0,0 +1,121 @@
+"""
+Request-scoped identity map and record loader.
+
+Inside an `identity_scope()`, ObjectModel.get returns the same instance for the
+same record instead of querying it again, and gets issued concurrently (in the
+same event loop tick) are coalesced into one `SELECT ... FROM $ids` per table.
+Outside of a scope every get queries the database, as before.
+
+A scope only lives as long as one request or job, so objects never go stale
+across requests; within the scope, save() and delete() keep the map current.
+"""
+
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterator,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    cast,
+)
+
+from open_notebook.database.repository import ensure_record_id, repo_query
+
+if TYPE_CHECKING:
+    from open_notebook.domain.base import ObjectModel
+
+T = TypeVar("T", bound="ObjectModel")
+
+_current: ContextVar[Optional["IdentityMap"]] = ContextVar(
+    "identity_map", default=None
+)
+
+
+def record_key(record_id: str) -> str:
+    """Normalize a record id so different spellings of it share an entry."""
+    return str(ensure_record_id(record_id))
+
+
+class IdentityMap:
+    def __init__(self) -> None:
+        self._objects: Dict[str, "ObjectModel"] = {}
+        # (table, projection) -> record key -> pending result
+        self._batches: Dict[Tuple[str, str], Dict[str, asyncio.Future]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def get(self, record_id: str) -> Optional["ObjectModel"]:
+        return self._objects.get(record_key(record_id))
+
+    def add(self, obj: T) -> T:
+        """Track a fully loaded object, returning the instance already tracked if any."""
+        # Unsaved objects have no identity to share
+        if obj.id is None:
+            return obj
+        # An instance tracked under the same id is of the same table and class
+        return cast(T, self._objects.setdefault(record_key(obj.id), obj))
+
+    def replace(self, obj: "ObjectModel") -> None:
+        if obj.id is None:
+            return
+        self._objects[record_key(obj.id)] = obj
+
+    def discard(self, record_id: str) -> None:
+        self._objects.pop(record_key(record_id), None)
+
+    async def load(
+        self, table: str, record_id: str, projection: str
+    ) -> Optional[Dict[str, Any]]:
+        """Fetch a record's row, batched with the other loads of this tick."""
+        key = record_key(record_id)
+        batch = self._batches.get((table, projection))
+        if batch is None:
+            batch = self._batches[(table, projection)] = {}
+            asyncio.get_running_loop().call_soon(self._dispatch, table, projection)
+        if key not in batch:
+            batch[key] = asyncio.get_running_loop().create_future()
+        # Shielded so a cancelled caller doesn't cancel the result others wait on
+        return await asyncio.shield(batch[key])
+
+    def _dispatch(self, table: str, projection: str) -> None:
+        batch = self._batches.pop((table, projection))
+        task = asyncio.ensure_future(self._fetch(projection, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, projection: str, batch: Dict[str, asyncio.Future]) -> None:
+        try:
+            rows = await repo_query(
+                f"SELECT {projection} FROM $ids",
+                {"ids": [ensure_record_id(key) for key in batch]},
+            )
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        by_id = {record_key(row["id"]): row for row in rows}
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(by_id.get(key))
+
+
+def get_identity_map() -> Optional[IdentityMap]:
+    return _current.get()
+
+
+@contextmanager
+def identity_scope() -> Iterator[IdentityMap]:
+    """Share one identity map between everything run inside the block."""
+    identity_map = IdentityMap()
+    token = _current.set(identity_map)
+    try:
+        yield identity_map
+    finally:
+        _current.reset(token)
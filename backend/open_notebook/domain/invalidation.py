@@ -0,0 +1,162 @@
+"""
+Cross-process cache invalidation.
+
+The API, the command worker and the Streamlit UI each keep their own settings
+records (RecordModel singletons) and model clients (ModelManager). Each process
+subscribes to LIVE queries on the tables those caches are built from and drops
+the entries that changed, so an edit made in one process is picked up by the
+others without a restart.
+
+The subscriptions run on their own thread and event loop, since Streamlit
+runs every call in a short-lived loop of its own. A dropped connection does not
+end a subscription, so each connection is also pinged and replaced, with the
+table invalidated, when it stops answering.
+"""
+
+import asyncio
+import threading
+from typing import Any, Optional
+
+from loguru import logger
+
+from open_notebook.config import CACHE_INVALIDATION_ENABLED
+from open_notebook.database.repository import db_connection, get_database_url
+
+WATCHED_TABLES = ["open_notebook", "model"]
+RECONNECT_DELAY_SECONDS = 5.0
+LIVENESS_CHECK_SECONDS = 30.0
+
+_started = False
+_start_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_task: Optional[asyncio.Task] = None
+
+
+def invalidate(table: str, record_id: Optional[str] = None) -> None:
+    """Drop the cached state built from a record, or from a whole table."""
+    from open_notebook.domain.base import RecordModel
+    from open_notebook.domain.models import DefaultModels, model_manager
+
+    if table == "model":
+        if record_id:
+            model_manager.invalidate_model(record_id)
+        else:
+            model_manager.clear_cache()
+        return
+
+    if record_id:
+        RecordModel.invalidate_record(record_id)
+    else:
+        RecordModel.invalidate_all()
+    if record_id in (None, DefaultModels.record_id):
+        model_manager.invalidate_defaults()
+
+
+def _changed_record_id(notification: Any) -> Optional[str]:
+    if not isinstance(notification, dict):
+        return None
+    record = notification.get("result", notification)
+    record_id = record.get("id") if isinstance(record, dict) else None
+    return str(record_id) if record_id else None
+
+
+async def _follow(connection: Any, table: str) -> None:
+    live_id = await connection.live(table)
+    subscription = await connection.subscribe_live(live_id)
+    # Changes made while we were not subscribed went unnoticed
+    invalidate(table)
+    logger.debug(f"Watching {table} for changes")
+    async for notification in subscription:
+        invalidate(table, _changed_record_id(notification))
+
+
+async def _check_alive(connection: Any) -> None:
+    """
+    Raise once the connection stops answering.
+
+    The SDK's subscriptions wait on a queue that nothing closes when the
+    WebSocket drops, so a dead connection would otherwise look like a quiet one.
+    """
+    while True:
+        await asyncio.sleep(LIVENESS_CHECK_SECONDS)
+        try:
+            await asyncio.wait_for(
+                connection.query("RETURN 1"), LIVENESS_CHECK_SECONDS
+            )
+        except asyncio.TimeoutError:
+            raise ConnectionError("the database stopped answering")
+
+
+async def _watch(table: str) -> None:
+    while True:
+        try:
+            async with db_connection() as connection:
+                tasks = [
+                    asyncio.ensure_future(_follow(connection, table)),
+                    asyncio.ensure_future(_check_alive(connection)),
+                ]
+                try:
+                    done, _ = await asyncio.wait(
+                        tasks, return_when=asyncio.FIRST_COMPLETED
+                    )
+                finally:
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                for task in done:
+                    task.result()
+                raise ConnectionError("subscription ended")
+        except Exception as e:
+            logger.warning(
+                f"Lost the change feed for {table}, reconnecting in "
+                f"{RECONNECT_DELAY_SECONDS:.0f}s: {e}"
+            )
+        await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+
+async def _watch_all() -> None:
+    await asyncio.gather(*[_watch(table) for table in WATCHED_TABLES])
+
+
+def _run() -> None:
+    global _loop, _task
+    _loop = asyncio.new_event_loop()
+    _task = _loop.create_task(_watch_all())
+    try:
+        _loop.run_until_complete(_task)
+    except asyncio.CancelledError:
+        pass
+    finally:
+        _loop.close()
+
+
+def start_cache_invalidation() -> None:
+    """Start following changes in this process; later calls do nothing."""
+    global _started, _thread
+    if _started:
+        return
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+
+        if not CACHE_INVALIDATION_ENABLED:
+            return
+        if not get_database_url().startswith(("ws://", "wss://")):
+            logger.info(
+                "Cache invalidation needs a WebSocket SURREAL_URL, changes made "
+                "by other processes are picked up on restart"
+            )
+            return
+
+        _thread = threading.Thread(target=_run, name="cache-invalidation", daemon=True)
+        _thread.start()
+
+
+def stop_cache_invalidation(timeout: float = 5.0) -> None:
+    """Close the change feeds of this process, waiting up to `timeout` seconds."""
+    if _thread is None or _loop is None or _task is None:
+        return
+    _loop.call_soon_threadsafe(_task.cancel)
+    _thread.join(timeout)
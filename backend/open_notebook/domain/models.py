@@ -1,17 +1,29 @@
-from typing import ClassVar, Dict, Optional, Union
-
-from esperanto import (
-    AIFactory,
-    EmbeddingModel,
-    LanguageModel,
-    SpeechToTextModel,
-    TextToSpeechModel,
-)
-
+import copy
+import json
+import threading
+import time
+from typing import TYPE_CHECKING, Any, ClassVar, Dict, List, Optional, Tuple, Union
+
+from open_notebook.cache import TTLCache
+from open_notebook.config import DEFAULT_MODELS_TTL_SECONDS, MODEL_CACHE_MAX_ENTRIES
 from open_notebook.database.repository import repo_query
 from open_notebook.domain.base import ObjectModel, RecordModel
+from open_notebook.domain.invalidation import start_cache_invalidation
+from open_notebook.scheduler import scheduler
+from open_notebook.usage import ledger
+
+# esperanto loads every provider SDK, so it is only imported once a model is needed
+if TYPE_CHECKING:
+    from esperanto import (
+        EmbeddingModel,
+        LanguageModel,
+        SpeechToTextModel,
+        TextToSpeechModel,
+    )
 
-ModelType = Union[LanguageModel, EmbeddingModel, SpeechToTextModel, TextToSpeechModel]
+ModelType = Union[
+    "LanguageModel", "EmbeddingModel", "SpeechToTextModel", "TextToSpeechModel"
+]
 
 
 class Model(ObjectModel):
@@ -19,6 +31,14 @@ class Model(ObjectModel):
     name: str
     provider: str
     type: str
+    # Provider limits for this model, requests and tokens per minute
+    rpm: Optional[int] = None
+    tpm: Optional[int] = None
+    # Prices per million input and output tokens, for the usage ledger
+    input_cost: Optional[float] = None
+    output_cost: Optional[float] = None
+    # Tokens the model accepts, to size the context sent to it
+    context_window: Optional[int] = None
 
     @classmethod
     async def get_models_by_type(cls, model_type):
@@ -38,6 +58,8 @@ class DefaultModels(RecordModel):
     # default_vision_model: Optional[str]
     default_embedding_model: Optional[str] = None
     default_tools_model: Optional[str] = None
+    # Model ids to fall back to, in order, per model type (chat, tools, ...)
+    fallback_models: Optional[Dict[str, List[str]]] = None
 
 
 class ModelManager:
@@ -51,17 +73,53 @@ class ModelManager:
     def __init__(self):
         if not hasattr(self, "_initialized"):
             self._initialized = True
-            self._model_cache: Dict[str, ModelType] = {}
+            self._model_cache: TTLCache[Tuple[str, str], ModelType] = TTLCache(
+                max_size=MODEL_CACHE_MAX_ENTRIES
+            )
+            # Entries may be invalidated from the cache invalidation thread
+            self._cache_lock = threading.Lock()
             self._default_models = None
+            self._defaults_loaded_at = 0.0
+            self.hits = 0
+            self.instantiations = 0
+            self.variants_shared = 0
+            self.defaults_refreshes = 0
+
+    @staticmethod
+    def _cache_key(model_id: str, kwargs: Dict[str, Any]) -> Tuple[str, str]:
+        # Same kwargs in any order, or with equal values, share one entry
+        return model_id, json.dumps(kwargs, sort_keys=True, default=str)
+
+    def _with_config(self, base: ModelType, kwargs: Dict[str, Any]) -> ModelType:
+        """
+        Derive a variant of a model client with different settings.
+
+        The variant is a shallow copy, so it shares the provider's HTTP clients
+        and connection pools with the base instead of opening its own.
+        """
+        variant = copy.copy(base)
+        variant.config = {**(getattr(base, "config", None) or {}), **kwargs}
+        for key, value in kwargs.items():
+            if hasattr(variant, key):
+                setattr(variant, key, value)
+        return variant
 
     async def get_model(self, model_id: str, **kwargs) -> Optional[ModelType]:
         if not model_id:
             return None
 
-        cache_key = f"{model_id}:{str(kwargs)}"
+        from esperanto import (
+            AIFactory,
+            EmbeddingModel,
+            LanguageModel,
+            SpeechToTextModel,
+            TextToSpeechModel,
+        )
 
-        if cache_key in self._model_cache:
-            cached_model = self._model_cache[cache_key]
+        cache_key = self._cache_key(model_id, kwargs)
+        with self._cache_lock:
+            cached_model = self._model_cache.get(cache_key)
+        if cached_model is not None:
             if not isinstance(
                 cached_model,
                 (LanguageModel, EmbeddingModel, SpeechToTextModel, TextToSpeechModel),
@@ -69,8 +127,19 @@ class ModelManager:
                 raise TypeError(
                     f"Cached model is of unexpected type: {type(cached_model)}"
                 )
+            self.hits += 1
             return cached_model
 
+        if kwargs:
+            base_model = await self.get_model(model_id)
+            if base_model is None:
+                return None
+            variant = self._with_config(base_model, kwargs)
+            self.variants_shared += 1
+            with self._cache_lock:
+                self._model_cache.set(cache_key, variant)
+            return variant
+
         try:
             model: Model = await Model.get(model_id)
         except Exception:
@@ -112,52 +181,71 @@ class ModelManager:
         else:
             raise ValueError(f"Invalid model type: {model.type}")
 
-        self._model_cache[cache_key] = model_instance
+        key = f"{model.provider}/{model.name}"
+        scheduler.configure(key, model.rpm, model.tpm)
+        ledger.set_pricing(key, model.input_cost, model.output_cost)
+        self.instantiations += 1
+        with self._cache_lock:
+            self._model_cache.set(cache_key, model_instance)
         return model_instance
 
     async def refresh_defaults(self):
         """Refresh the default models from the database"""
+        # The singleton is only read from the database once, drop it to reload
+        DefaultModels.clear_instance()
         self._default_models = await DefaultModels.get_instance()
+        self._defaults_loaded_at = time.monotonic()
+        self.defaults_refreshes += 1
 
     async def get_defaults(self) -> DefaultModels:
         """Get the default models configuration"""
-        if not self._default_models:
+        start_cache_invalidation()
+        if (
+            not self._default_models
+            or time.monotonic() - self._defaults_loaded_at > DEFAULT_MODELS_TTL_SECONDS
+        ):
             await self.refresh_defaults()
             if not self._default_models:
                 raise RuntimeError("Failed to initialize default models configuration")
         return self._default_models
 
-    async def get_speech_to_text(self, **kwargs) -> Optional[SpeechToTextModel]:
+    async def get_speech_to_text(self, **kwargs) -> Optional["SpeechToTextModel"]:
         """Get the default speech-to-text model"""
         defaults = await self.get_defaults()
         model_id = defaults.default_speech_to_text_model
         if not model_id:
             return None
         model = await self.get_model(model_id, **kwargs)
+        from esperanto import SpeechToTextModel
+
         assert model is None or isinstance(model, SpeechToTextModel), (
             f"Expected SpeechToTextModel but got {type(model)}"
         )
         return model
 
-    async def get_text_to_speech(self, **kwargs) -> Optional[TextToSpeechModel]:
+    async def get_text_to_speech(self, **kwargs) -> Optional["TextToSpeechModel"]:
         """Get the default text-to-speech model"""
         defaults = await self.get_defaults()
         model_id = defaults.default_text_to_speech_model
         if not model_id:
             return None
         model = await self.get_model(model_id, **kwargs)
+        from esperanto import TextToSpeechModel
+
         assert model is None or isinstance(model, TextToSpeechModel), (
             f"Expected TextToSpeechModel but got {type(model)}"
         )
         return model
 
-    async def get_embedding_model(self, **kwargs) -> Optional[EmbeddingModel]:
+    async def get_embedding_model(self, **kwargs) -> Optional["EmbeddingModel"]:
         """Get the default embedding model"""
         defaults = await self.get_defaults()
         model_id = defaults.default_embedding_model
         if not model_id:
             return None
         model = await self.get_model(model_id, **kwargs)
+        from esperanto import EmbeddingModel
+
         assert model is None or isinstance(model, EmbeddingModel), (
             f"Expected EmbeddingModel but got {type(model)}"
         )
@@ -171,6 +259,14 @@ class ModelManager:
             model_type: The type of model to retrieve (e.g., 'chat', 'embedding', etc.)
             **kwargs: Additional arguments to pass to the model constructor
         """
+        model_id = await self.get_default_model_id(model_type)
+        if not model_id:
+            return None
+
+        return await self.get_model(model_id, **kwargs)
+
+    async def get_default_model_id(self, model_type: str) -> Optional[str]:
+        """Get the ID of the default model for a specific type."""
         defaults = await self.get_defaults()
         model_id = None
 
@@ -194,14 +290,39 @@ class ModelManager:
         elif model_type == "large_context":
             model_id = defaults.large_context_model
 
-        if not model_id:
-            return None
+        return model_id
 
-        return await self.get_model(model_id, **kwargs)
+    async def get_fallback_model_ids(self, model_type: str) -> List[str]:
+        """Get the ids of the fallback models for a model type, in order."""
+        defaults = await self.get_defaults()
+        return (defaults.fallback_models or {}).get(model_type, [])
 
     def clear_cache(self):
         """Clear the model cache"""
-        self._model_cache.clear()
+        with self._cache_lock:
+            self._model_cache.clear()
+
+    def invalidate_model(self, model_id: str):
+        """Drop the cached clients of a model, for every set of kwargs"""
+        with self._cache_lock:
+            for cache_key, _ in list(self._model_cache.items()):
+                if cache_key[0] == model_id:
+                    self._model_cache.pop(cache_key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "instantiations": self.instantiations,
+            "variants_shared": self.variants_shared,
+            "instantiations_avoided": self.hits + self.variants_shared,
+            "cached_clients": len(self._model_cache),
+            "max_cached_clients": self._model_cache.max_size,
+            "defaults_refreshes": self.defaults_refreshes,
+        }
+
+    def invalidate_defaults(self):
+        """Reload the default models on next use"""
+        self._default_models = None
 
 
 model_manager = ModelManager()
@@ -1,19 +1,44 @@
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
-from typing import Any, ClassVar, Dict, List, Literal, Optional, Tuple
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    ClassVar,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 from loguru import logger
 from pydantic import BaseModel, Field, field_validator
 
+from open_notebook.config import EMBEDDING_MAX_CONCURRENCY
 from open_notebook.database.repository import ensure_record_id, repo_query
-from open_notebook.domain.base import ObjectModel
+from open_notebook.domain.base import (
+    CURSOR_COLUMN,
+    ObjectModel,
+    cursor_column,
+    encode_cursor,
+)
 from open_notebook.domain.models import model_manager
+from open_notebook.domain.stats import (
+    get_notebook_ids,
+    refresh_notebook_stats,
+    refresh_source_stats,
+)
 from open_notebook.exceptions import DatabaseOperationError, InvalidInputError
+from open_notebook.scheduler import aembed
+from open_notebook.usage import usage_scope
 from open_notebook.utils import split_text
 
 
 class Notebook(ObjectModel):
     table_name: ClassVar[str] = "notebook"
+    sortable_fields: ClassVar[List[str]] = ["created", "updated", "name"]
     name: str
     description: str
     archived: Optional[bool] = False
@@ -25,35 +50,46 @@ class Notebook(ObjectModel):
             raise InvalidInputError("Notebook name cannot be empty")
         return v
 
-    async def get_sources(self) -> List["Source"]:
+    async def get_sources(
+        self,
+        fields: Optional[Sequence[str]] = None,
+        omit: Optional[Sequence[str]] = ("full_text",),
+    ) -> List["Source"]:
+        # Selecting from the references reads only this notebook's sources, see
+        # Source.get_summaries
         try:
+            projection, omitted = Source._projection(fields, omit)
             srcs = await repo_query(
-                """
-                select * omit source.full_text from (
-                select in as source from reference where out=$id
-                fetch source
-            ) order by source.updated desc
-            """,
+                f"""
+                SELECT {projection}
+                FROM (SELECT VALUE in FROM reference WHERE out = $id)
+                ORDER BY updated DESC
+                """,
                 {"id": ensure_record_id(self.id)},
             )
-            return [Source(**src["source"]) for src in srcs] if srcs else []
+            return [Source._from_projection(src, omitted) for src in srcs]
         except Exception as e:
             logger.error(f"Error fetching sources for notebook {self.id}: {str(e)}")
             logger.exception(e)
             raise DatabaseOperationError(e)
 
-    async def get_notes(self) -> List["Note"]:
+    async def get_notes(
+        self,
+        fields: Optional[Sequence[str]] = None,
+        omit: Optional[Sequence[str]] = ("content",),
+    ) -> List["Note"]:
+        # Embeddings are never loaded here (Note.omit_by_default)
         try:
+            projection, omitted = Note._projection(fields, omit)
             srcs = await repo_query(
-                """
-            select * omit note.content, note.embedding from (
-                select in as note from artifact where out=$id
-                fetch note
-            ) order by note.updated desc
-            """,
+                f"""
+                SELECT {projection}
+                FROM (SELECT VALUE in FROM artifact WHERE out = $id)
+                ORDER BY updated DESC
+                """,
                 {"id": ensure_record_id(self.id)},
             )
-            return [Note(**src["note"]) for src in srcs] if srcs else []
+            return [Note._from_projection(src, omitted) for src in srcs]
         except Exception as e:
             logger.error(f"Error fetching notes for notebook {self.id}: {str(e)}")
             logger.exception(e)
@@ -92,6 +128,7 @@ class Asset(BaseModel):
 
 class SourceEmbedding(ObjectModel):
     table_name: ClassVar[str] = "source_embedding"
+    omit_by_default: ClassVar[List[str]] = ["embedding"]
     content: str
 
     async def get_source(self) -> "Source":
@@ -111,6 +148,7 @@ class SourceEmbedding(ObjectModel):
 
 class SourceInsight(ObjectModel):
     table_name: ClassVar[str] = "source_insight"
+    omit_by_default: ClassVar[List[str]] = ["embedding"]
     insight_type: str
     content: str
 
@@ -128,6 +166,15 @@ class SourceInsight(ObjectModel):
             logger.exception(e)
             raise DatabaseOperationError(e)
 
+    async def delete(self) -> bool:
+        result = await repo_query(
+            "SELECT source FROM $id", {"id": ensure_record_id(self.id)}
+        )
+        deleted = await super().delete()
+        for row in result:
+            await refresh_source_stats(row["source"])
+        return deleted
+
     async def save_as_note(self, notebook_id: str = None) -> Any:
         source = await self.get_source()
         note = Note(
@@ -146,6 +193,90 @@ class Source(ObjectModel):
     title: Optional[str] = None
     topics: Optional[List[str]] = Field(default_factory=list)
     full_text: Optional[str] = None
+    ingest_key: Optional[str] = None
+    content_hash: Optional[str] = None
+
+    @classmethod
+    async def get_summaries(
+        cls,
+        notebook_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        after: Optional[str] = None,
+        ids: Optional[List[str]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        List sources without their text, with their materialized stats.
+
+        Counts are read from source_stats instead of being computed per source.
+        Pages are keyset paginated like ObjectModel.get_page. `ids` restricts
+        the listing to the given sources.
+        """
+        _, order, condition, params = cls._keyset("updated desc", after)
+        conditions = [condition] if condition else []
+        table = "source"
+        if notebook_id:
+            # Reading the notebook's references visits only its sources, where
+            # `id IN (subquery)` would rerun the subquery for every source
+            table = "(SELECT VALUE in FROM reference WHERE out = $notebook)"
+            params["notebook"] = ensure_record_id(notebook_id)
+        if ids:
+            conditions.append("id IN $ids")
+            params["ids"] = [ensure_record_id(source_id) for source_id in ids]
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        limit_clause = f"LIMIT {limit + 1}" if limit else ""
+        try:
+            result = await repo_query(
+                f"""
+                SELECT id, title, topics, asset, created, updated,
+                    {cursor_column("updated")},
+                    type::thing("source_stats", record::id(id)) AS stats
+                FROM {table} {where}
+                {order} {limit_clause}
+                FETCH stats
+                """,
+                params,
+            )
+            for row in result:
+                stats = row.pop("stats", None) or {}
+                row["embedded_chunks"] = stats.get("chunk_count", 0)
+                row["insights_count"] = stats.get("insight_count", 0)
+                row["token_count"] = stats.get("token_count", 0)
+                row["last_ingested"] = stats.get("last_ingested")
+
+            next_cursor = None
+            if limit and len(result) > limit:
+                result = result[:limit]
+                next_cursor = encode_cursor(result[-1], "updated")
+            for row in result:
+                row.pop(CURSOR_COLUMN, None)
+            return result, next_cursor
+        except Exception as e:
+            logger.error(f"Error fetching source summaries: {str(e)}")
+            logger.exception(e)
+            raise DatabaseOperationError(e)
+
+    @classmethod
+    async def get_by_content_hash(cls, content_hash: str) -> Optional["Source"]:
+        """
+        Find the oldest source created from an upload with these exact bytes.
+
+        The hash is only set once the source's ingestion completed, so sources
+        without embeddings or insights yet never match.
+        """
+        result = await repo_query(
+            "SELECT * FROM source WHERE content_hash = $hash ORDER BY created LIMIT 1",
+            {"hash": content_hash},
+        )
+        return cls(**result[0]) if result else None
+
+    @classmethod
+    async def get_by_ingest_key(cls, ingest_key: str) -> Optional["Source"]:
+        """Find the source created by an ingestion with this idempotency key."""
+        result = await repo_query(
+            "SELECT * FROM source WHERE ingest_key = $key LIMIT 1",
+            {"key": ingest_key},
+        )
+        return cls(**result[0]) if result else None
 
     async def get_context(
         self, context_size: Literal["short", "long"] = "short"
@@ -153,6 +284,7 @@ class Source(ObjectModel):
         insights_list = await self.get_insights()
         insights = [insight.model_dump() for insight in insights_list]
         if context_size == "long":
+            await self.ensure_loaded("full_text")
             return dict(
                 id=self.id,
                 title=self.title,
@@ -178,15 +310,22 @@ class Source(ObjectModel):
             logger.exception(e)
             raise DatabaseOperationError(f"Failed to count chunks for source: {str(e)}")
 
-    async def get_insights(self) -> List[SourceInsight]:
+    async def get_insights(
+        self,
+        fields: Optional[Sequence[str]] = None,
+        omit: Optional[Sequence[str]] = None,
+    ) -> List[SourceInsight]:
         try:
+            projection, omitted = SourceInsight._projection(fields, omit)
             result = await repo_query(
-                """
-                SELECT * FROM source_insight WHERE source=$id
+                f"""
+                SELECT {projection} FROM source_insight WHERE source=$id
                 """,
                 {"id": ensure_record_id(self.id)},
             )
-            return [SourceInsight(**insight) for insight in result]
+            return [
+                SourceInsight._from_projection(insight, omitted) for insight in result
+            ]
         except Exception as e:
             logger.error(f"Error fetching insights for source {self.id}: {str(e)}")
             logger.exception(e)
@@ -195,13 +334,55 @@ class Source(ObjectModel):
     async def add_to_notebook(self, notebook_id: str) -> Any:
         if not notebook_id:
             raise InvalidInputError("Notebook ID must be provided")
-        return await self.relate("reference", notebook_id)
+        result = await self.relate("reference", notebook_id)
+        await refresh_notebook_stats(notebook_id)
+        return result
+
+    async def is_in_notebook(self, notebook_id: str) -> bool:
+        result = await repo_query(
+            "SELECT id FROM reference WHERE in = $source AND out = $notebook LIMIT 1",
+            {
+                "source": ensure_record_id(self.id),
+                "notebook": ensure_record_id(notebook_id),
+            },
+        )
+        return bool(result)
 
-    async def vectorize(self) -> None:
+    async def set_content_hash(self, content_hash: str) -> None:
+        """Make this source the match for uploads with these bytes."""
+        await repo_query(
+            "UPDATE $source SET content_hash = $hash",
+            {"source": ensure_record_id(self.id), "hash": content_hash},
+        )
+        self.content_hash = content_hash
+
+    async def delete(self) -> bool:
+        notebook_ids = await get_notebook_ids(self.id, "reference") if self.id else []
+        deleted = await super().delete()
+        for notebook_id in notebook_ids:
+            await refresh_notebook_stats(notebook_id)
+        return deleted
+
+    async def vectorize(
+        self,
+        on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+        resume: bool = False,
+    ) -> None:
+        """
+        Split the source text into chunks and store their embeddings.
+
+        on_progress, if given, is awaited with (embedded chunks, total chunks)
+        after each chunk is embedded. With resume, chunks already stored by an
+        interrupted run are kept and only the missing ones are embedded.
+        """
+        if self.id is None:
+            raise InvalidInputError("Cannot vectorize an unsaved source")
+        source_id = self.id
         logger.info(f"Starting vectorization for source {self.id}")
         EMBEDDING_MODEL = await model_manager.get_embedding_model()
 
         try:
+            await self.ensure_loaded("full_text")
             if not self.full_text:
                 logger.warning(f"No text to vectorize for source {self.id}")
                 return
@@ -216,46 +397,73 @@ class Source(ObjectModel):
                 logger.warning("No chunks created after splitting")
                 return
 
+            stored: set = set()
+            if resume:
+                stored = set(
+                    await repo_query(
+                        "SELECT VALUE order FROM source_embedding WHERE source = $id",
+                        {"id": ensure_record_id(self.id)},
+                    )
+                )
+                if stored:
+                    logger.info(
+                        f"Reusing {len(stored)} stored chunks for source {self.id}"
+                    )
+
             # Process chunks concurrently using async gather
             logger.info("Starting concurrent processing of chunks")
+            semaphore = asyncio.Semaphore(EMBEDDING_MAX_CONCURRENCY)
+            embedded = len(stored)
 
-            async def process_chunk(
-                idx: int, chunk: str
-            ) -> Tuple[int, List[float], str]:
+            async def process_chunk(idx: int, chunk: str) -> Dict[str, Any]:
+                nonlocal embedded
                 logger.debug(f"Processing chunk {idx}/{chunk_count}")
                 try:
-                    embedding = (await EMBEDDING_MODEL.aembed([chunk]))[0]
-                    cleaned_content = chunk
+                    async with semaphore:
+                        embedding = (await aembed(EMBEDDING_MODEL, [chunk]))[0]
                     logger.debug(f"Successfully processed chunk {idx}")
-                    return (idx, embedding, cleaned_content)
                 except Exception as e:
                     logger.error(f"Error processing chunk {idx}: {str(e)}")
                     raise
 
-            # Create tasks for all chunks and process them concurrently
-            tasks = [process_chunk(idx, chunk) for idx, chunk in enumerate(chunks)]
-            results = await asyncio.gather(*tasks)
-
-            logger.info(f"Parallel processing complete. Got {len(results)} results")
+                row = {
+                    "source": ensure_record_id(self.id),
+                    "order": idx,
+                    "content": chunk,
+                    "embedding": embedding,
+                }
+                if resume:
+                    # Store each chunk as soon as it is embedded so an
+                    # interrupted run keeps its progress
+                    await repo_query(
+                        "CREATE source_embedding CONTENT $row", {"row": row}
+                    )
+                embedded += 1
+                if on_progress:
+                    await on_progress(embedded, chunk_count)
+                return row
 
-            # Insert results in order (they're already ordered by index)
-            for idx, embedding, content in results:
-                logger.debug(f"Inserting chunk {idx} into database")
+            # Create tasks for all chunks and process them concurrently
+            tasks = [
+                process_chunk(idx, chunk)
+                for idx, chunk in enumerate(chunks)
+                if idx not in stored
+            ]
+            with usage_scope("vectorize"):
+                rows = await asyncio.gather(*tasks)
+            if not resume:
+                # All or nothing: the previous chunks are only replaced once every
+                # chunk is embedded, so a failed re-embed leaves them untouched
                 await repo_query(
                     """
-                    CREATE source_embedding CONTENT {
-                            "source": $source_id,
-                            "order": $order,
-                            "content": $content,
-                            "embedding": $embedding,
-                    };""",
-                    {
-                        "source_id": ensure_record_id(self.id),
-                        "order": idx,
-                        "content": content,
-                        "embedding": embedding,
-                    },
+                    BEGIN TRANSACTION;
+                    DELETE source_embedding WHERE source = $source_id;
+                    INSERT INTO source_embedding $rows;
+                    COMMIT TRANSACTION;
+                    """,
+                    {"source_id": ensure_record_id(self.id), "rows": rows},
                 )
+            await refresh_source_stats(source_id)
 
             logger.info(f"Vectorization complete for source {self.id}")
 
@@ -265,6 +473,9 @@ class Source(ObjectModel):
             raise DatabaseOperationError(e)
 
     async def add_insight(self, insight_type: str, content: str) -> Any:
+        if self.id is None:
+            raise InvalidInputError("Cannot add an insight to an unsaved source")
+        source_id = self.id
         EMBEDDING_MODEL = await model_manager.get_embedding_model()
         if not EMBEDDING_MODEL:
             logger.warning("No embedding model found. Insight will not be searchable.")
@@ -273,9 +484,9 @@ class Source(ObjectModel):
             raise InvalidInputError("Insight type and content must be provided")
         try:
             embedding = (
-                (await EMBEDDING_MODEL.aembed([content]))[0] if EMBEDDING_MODEL else []
+                (await aembed(EMBEDDING_MODEL, [content]))[0] if EMBEDDING_MODEL else []
             )
-            return await repo_query(
+            result = await repo_query(
                 """
                 CREATE source_insight CONTENT {
                         "source": $source_id,
@@ -290,6 +501,8 @@ class Source(ObjectModel):
                     "embedding": embedding,
                 },
             )
+            await refresh_source_stats(source_id)
+            return result
         except Exception as e:
             logger.error(f"Error adding insight to source {self.id}: {str(e)}")
             raise  # DatabaseOperationError(e)
@@ -297,6 +510,7 @@ class Source(ObjectModel):
 
 class Note(ObjectModel):
     table_name: ClassVar[str] = "note"
+    omit_by_default: ClassVar[List[str]] = ["embedding"]
     title: Optional[str] = None
     note_type: Optional[Literal["human", "ai"]] = None
     content: Optional[str] = None
@@ -311,7 +525,16 @@ class Note(ObjectModel):
     async def add_to_notebook(self, notebook_id: str) -> Any:
         if not notebook_id:
             raise InvalidInputError("Notebook ID must be provided")
-        return await self.relate("artifact", notebook_id)
+        result = await self.relate("artifact", notebook_id)
+        await refresh_notebook_stats(notebook_id)
+        return result
+
+    async def delete(self) -> bool:
+        notebook_ids = await get_notebook_ids(self.id, "artifact") if self.id else []
+        deleted = await super().delete()
+        for notebook_id in notebook_ids:
+            await refresh_notebook_stats(notebook_id)
+        return deleted
 
     def get_context(
         self, context_size: Literal["short", "long"] = "short"
@@ -373,7 +596,7 @@ async def vector_search(
         raise InvalidInputError("Search keyword cannot be empty")
     try:
         EMBEDDING_MODEL = await model_manager.get_embedding_model()
-        embed = (await EMBEDDING_MODEL.aembed([keyword]))[0]
+        embed = (await aembed(EMBEDDING_MODEL, [keyword]))[0]
         results = await repo_query(
             """
             SELECT * FROM fn::vector_search($embed, $results, $source, $note, $minimum_score);
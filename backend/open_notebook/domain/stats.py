@@ -0,0 +1,154 @@
+"""
+Materialized statistics for sources and notebooks.
+
+Counts live in their own tables (source_stats and notebook_stats, keyed by the
+id of the record they describe) so that keeping them current never bumps the
+`updated` timestamp of the source or notebook itself. They are refreshed by the
+domain layer after the writes that change them; a failed refresh is only
+logged, and rebuild_stats() repairs any drift.
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from open_notebook.database.repository import ensure_record_id, repo_query
+from open_notebook.utils import token_count
+
+SOURCE_COUNTS_QUERY = """
+UPSERT type::thing("source_stats", record::id($source)) SET
+    source = $source,
+    chunk_count = array::len(
+        SELECT VALUE id FROM source_embedding WHERE source = $source
+    ),
+    insight_count = array::len(
+        SELECT VALUE id FROM source_insight WHERE source = $source
+    );
+"""
+
+NOTEBOOK_STATS_QUERY = """
+LET $sources = SELECT VALUE in FROM reference WHERE out = $notebook;
+UPSERT type::thing("notebook_stats", record::id($notebook)) SET
+    notebook = $notebook,
+    source_count = array::len($sources),
+    note_count = array::len(SELECT VALUE id FROM artifact WHERE out = $notebook),
+    token_count = math::sum(
+        SELECT VALUE token_count FROM source_stats WHERE source IN $sources
+    ),
+    last_ingested = array::max(
+        SELECT VALUE last_ingested FROM source_stats WHERE source IN $sources
+    );
+"""
+
+
+async def refresh_source_stats(source_id: str) -> None:
+    """Recount the chunks and insights of a source."""
+    try:
+        await repo_query(SOURCE_COUNTS_QUERY, {"source": ensure_record_id(source_id)})
+    except Exception as e:
+        logger.warning(f"Could not refresh stats for {source_id}: {e}")
+
+
+async def record_ingestion(source_id: str, full_text: Optional[str]) -> None:
+    """Store the token count of a freshly ingested source and when it happened."""
+    try:
+        tokens = await asyncio.to_thread(token_count, full_text or "")
+        await repo_query(
+            """
+            UPSERT type::thing("source_stats", record::id($source)) SET
+                source = $source,
+                token_count = $tokens,
+                last_ingested = time::now();
+            """,
+            {"source": ensure_record_id(source_id), "tokens": tokens},
+        )
+    except Exception as e:
+        logger.warning(f"Could not record ingestion stats for {source_id}: {e}")
+
+
+async def refresh_notebook_stats(notebook_id: str) -> None:
+    """Recount the sources, notes and tokens of a notebook."""
+    try:
+        await repo_query(
+            NOTEBOOK_STATS_QUERY, {"notebook": ensure_record_id(notebook_id)}
+        )
+    except Exception as e:
+        logger.warning(f"Could not refresh stats for {notebook_id}: {e}")
+
+
+async def get_notebook_ids(record_id: str, relationship: str) -> List[str]:
+    """Notebooks a source (reference) or note (artifact) belongs to."""
+    result = await repo_query(
+        f"SELECT out FROM {relationship} WHERE in = $id",
+        {"id": ensure_record_id(record_id)},
+    )
+    return [row["out"] for row in result]
+
+
+async def get_notebook_stats(
+    notebook_ids: Optional[List[str]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Map each notebook id to its stats, for all notebooks or only the given ones."""
+    if notebook_ids is None:
+        result = await repo_query("SELECT * FROM notebook_stats")
+    else:
+        result = await repo_query(
+            "SELECT * FROM notebook_stats WHERE notebook IN $ids",
+            {"ids": [ensure_record_id(notebook_id) for notebook_id in notebook_ids]},
+        )
+    return {row["notebook"]: row for row in result}
+
+
+async def rebuild_stats() -> Dict[str, int]:
+    """
+    Recompute every source and notebook stats record from the data itself.
+
+    Token counts are only recomputed for sources that don't have one yet, since
+    that needs the full text of each source.
+    """
+    await repo_query(
+        """
+        DELETE source_stats WHERE source NOT IN (SELECT VALUE id FROM source);
+        DELETE notebook_stats WHERE notebook NOT IN (SELECT VALUE id FROM notebook);
+        """
+    )
+
+    source_ids = [row["id"] for row in await repo_query("SELECT id FROM source")]
+    counted = {
+        row["source"]
+        for row in await repo_query(
+            "SELECT source FROM source_stats WHERE last_ingested != NONE"
+        )
+    }
+    for source_id in source_ids:
+        await refresh_source_stats(source_id)
+        if source_id not in counted:
+            result = await repo_query(
+                "SELECT full_text, created FROM $id", {"id": ensure_record_id(source_id)}
+            )
+            if result:
+                tokens = await asyncio.to_thread(
+                    token_count, result[0].get("full_text") or ""
+                )
+                await repo_query(
+                    """
+                    UPDATE type::thing("source_stats", record::id($source)) SET
+                        token_count = $tokens,
+                        last_ingested = $created;
+                    """,
+                    {
+                        "source": ensure_record_id(source_id),
+                        "tokens": tokens,
+                        "created": result[0].get("created"),
+                    },
+                )
+
+    notebook_ids = [row["id"] for row in await repo_query("SELECT id FROM notebook")]
+    for notebook_id in notebook_ids:
+        await refresh_notebook_stats(notebook_id)
+
+    logger.info(
+        f"Rebuilt stats for {len(source_ids)} sources and {len(notebook_ids)} notebooks"
+    )
+    return {"sources": len(source_ids), "notebooks": len(notebook_ids)}
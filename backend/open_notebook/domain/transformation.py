@@ -1,7 +1,8 @@
-from typing import ClassVar, Optional
+from typing import Any, ClassVar, Dict, List, Literal, Optional
 
 from pydantic import Field
 
+from open_notebook.database.repository import ensure_record_id, repo_query
 from open_notebook.domain.base import ObjectModel, RecordModel
 
 
@@ -19,3 +20,78 @@ class DefaultPrompts(RecordModel):
     transformation_instructions: Optional[str] = Field(
         None, description="Instructions for executing a transformation"
     )
+
+
+class TransformationBatch(ObjectModel):
+    """
+    A run of one or more transformations over a set of sources.
+
+    Every (source, transformation) pair is checkpointed as soon as it finishes,
+    so an interrupted batch can be resumed without redoing finished work.
+    """
+
+    table_name: ClassVar[str] = "transformation_batch"
+    transformations: List[str]
+    sources: List[str]
+    notebook_id: Optional[str] = None
+    model_id: Optional[str] = None
+    status: str = "pending"
+    completed: List[str] = Field(default_factory=list)
+    skipped: List[str] = Field(default_factory=list)
+    failed: List[Dict[str, Any]] = Field(default_factory=list)
+    command: Optional[str] = None
+
+    @staticmethod
+    def task_key(source_id: str, transformation_id: str) -> str:
+        return f"{source_id}|{transformation_id}"
+
+    @property
+    def total(self) -> int:
+        return len(self.sources) * len(self.transformations)
+
+    def pending_tasks(self) -> List[str]:
+        done = set(self.completed) | set(self.skipped)
+        return [
+            self.task_key(source_id, transformation_id)
+            for source_id in self.sources
+            for transformation_id in self.transformations
+            if self.task_key(source_id, transformation_id) not in done
+        ]
+
+    async def start(self, command_id: Optional[str] = None) -> None:
+        """Mark the batch as running and clear previous failures so they are retried."""
+        self.status = "running"
+        self.failed = []
+        self.command = command_id or self.command
+        await repo_query(
+            "UPDATE $id SET status = $status, failed = [], command = $command",
+            {
+                "id": ensure_record_id(self.id),
+                "status": self.status,
+                "command": self.command,
+            },
+        )
+
+    async def checkpoint(
+        self, task_key: str, outcome: Literal["completed", "skipped"]
+    ) -> None:
+        getattr(self, outcome).append(task_key)
+        await repo_query(
+            f"UPDATE $id SET {outcome} = array::union({outcome}, [$task])",
+            {"id": ensure_record_id(self.id), "task": task_key},
+        )
+
+    async def record_failure(self, task_key: str, error: str) -> None:
+        failure = {"task": task_key, "error": error}
+        self.failed.append(failure)
+        await repo_query(
+            "UPDATE $id SET failed += $failure",
+            {"id": ensure_record_id(self.id), "failure": failure},
+        )
+
+    async def set_status(self, status: str) -> None:
+        self.status = status
+        await repo_query(
+            "UPDATE $id SET status = $status",
+            {"id": ensure_record_id(self.id), "status": status},
+        )
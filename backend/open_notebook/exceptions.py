@@ -68,3 +68,9 @@ class NoTranscriptFound(OpenNotebookError):
     """Raised when no transcript is found for a video."""
 
     pass
+
+
+class FileTooLargeError(FileOperationError):
+    """Raised when an uploaded file exceeds the configured size limit."""
+
+    pass
@@ -1,3 +1,4 @@
+import functools
 import operator
 from typing import Annotated, List
 
@@ -5,12 +6,14 @@ from ai_prompter import Prompter
 from langchain_core.output_parsers.pydantic import PydanticOutputParser
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import END, START, StateGraph
+from langgraph.graph.state import CompiledStateGraph
 from langgraph.types import Send
 from pydantic import BaseModel, Field
 from typing_extensions import TypedDict
 
 from open_notebook.domain.notebook import vector_search
 from open_notebook.graphs.utils import provision_langchain_model
+from open_notebook.usage import usage_scope
 from open_notebook.utils import clean_thinking_content
 
 
@@ -57,12 +60,14 @@ async def call_model_with_messages(state: ThreadState, config: RunnableConfig) -
         system_prompt,
         config.get("configurable", {}).get("strategy_model"),
         "tools",
+        hedge=True,
         max_tokens=2000,
         structured=dict(type="json"),
     )
     # model = model.bind_tools(tools)
     # First get the raw response from the model
-    ai_message = await model.ainvoke(system_prompt)
+    with usage_scope("ask"):
+        ai_message = await model.ainvoke(system_prompt)
 
     # Clean the thinking content from the response
     cleaned_content = clean_thinking_content(ai_message.content)
@@ -104,9 +109,11 @@ async def provide_answer(state: SubGraphState, config: RunnableConfig) -> dict:
         system_prompt,
         config.get("configurable", {}).get("answer_model"),
         "tools",
+        hedge=True,
         max_tokens=2000,
     )
-    ai_message = await model.ainvoke(system_prompt)
+    with usage_scope("ask"):
+        ai_message = await model.ainvoke(system_prompt)
     return {"answers": [clean_thinking_content(ai_message.content)]}
 
 
@@ -116,19 +123,23 @@ async def write_final_answer(state: ThreadState, config: RunnableConfig) -> dict
         system_prompt,
         config.get("configurable", {}).get("final_answer_model"),
         "tools",
+        hedge=True,
         max_tokens=2000,
     )
-    ai_message = await model.ainvoke(system_prompt)
+    with usage_scope("ask"):
+        ai_message = await model.ainvoke(system_prompt)
     return {"final_answer": clean_thinking_content(ai_message.content)}
 
 
-agent_state = StateGraph(ThreadState)
-agent_state.add_node("agent", call_model_with_messages)
-agent_state.add_node("provide_answer", provide_answer)
-agent_state.add_node("write_final_answer", write_final_answer)
-agent_state.add_edge(START, "agent")
-agent_state.add_conditional_edges("agent", trigger_queries, ["provide_answer"])
-agent_state.add_edge("provide_answer", "write_final_answer")
-agent_state.add_edge("write_final_answer", END)
-
-graph = agent_state.compile()
+@functools.cache
+def get_graph() -> CompiledStateGraph:
+    """The ask graph, compiled on first use."""
+    agent_state = StateGraph(ThreadState)
+    agent_state.add_node("agent", call_model_with_messages)
+    agent_state.add_node("provide_answer", provide_answer)
+    agent_state.add_node("write_final_answer", write_final_answer)
+    agent_state.add_edge(START, "agent")
+    agent_state.add_conditional_edges("agent", trigger_queries, ["provide_answer"])
+    agent_state.add_edge("provide_answer", "write_final_answer")
+    agent_state.add_edge("write_final_answer", END)
+    return agent_state.compile()
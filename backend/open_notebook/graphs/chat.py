@@ -1,5 +1,7 @@
 import asyncio
+import os
 import sqlite3
+import threading
 from typing import Annotated, Optional
 
 from ai_prompter import Prompter
@@ -8,11 +10,14 @@ from langchain_core.runnables import RunnableConfig
 from langgraph.checkpoint.sqlite import SqliteSaver
 from langgraph.graph import END, START, StateGraph
 from langgraph.graph.message import add_messages
+from langgraph.graph.state import CompiledStateGraph
 from typing_extensions import TypedDict
 
-from open_notebook.config import LANGGRAPH_CHECKPOINT_FILE
+from open_notebook.config import LANGGRAPH_CHECKPOINT_FILE, SQLITE_FOLDER
 from open_notebook.domain.notebook import Notebook
 from open_notebook.graphs.utils import provision_langchain_model
+from open_notebook.lifecycle import on_shutdown
+from open_notebook.usage import usage_scope
 
 
 class ThreadState(TypedDict):
@@ -30,21 +35,39 @@ def call_model_with_messages(state: ThreadState, config: RunnableConfig) -> dict
             str(payload),
             config.get("configurable", {}).get("model_id"),
             "chat",
+            hedge=True,
             max_tokens=10000,
         )
     )
-    ai_message = model.invoke(payload)
+    notebook = state.get("notebook")
+    with usage_scope("chat", notebook.id if notebook else None):
+        ai_message = model.invoke(payload)
     return {"messages": ai_message}
 
 
-conn = sqlite3.connect(
-    LANGGRAPH_CHECKPOINT_FILE,
-    check_same_thread=False,
-)
-memory = SqliteSaver(conn)
+_graph: Optional[CompiledStateGraph] = None
+_graph_lock = threading.Lock()
 
-agent_state = StateGraph(ThreadState)
-agent_state.add_node("agent", call_model_with_messages)
-agent_state.add_edge(START, "agent")
-agent_state.add_edge("agent", END)
-graph = agent_state.compile(checkpointer=memory)
+
+def get_graph() -> CompiledStateGraph:
+    """
+    The chat graph, compiled on first use.
+
+    Its checkpoint connection stays open for the life of the process and is
+    closed by open_notebook.lifecycle.shutdown().
+    """
+    global _graph
+    with _graph_lock:
+        if _graph is None:
+            os.makedirs(SQLITE_FOLDER, exist_ok=True)
+            conn = sqlite3.connect(
+                LANGGRAPH_CHECKPOINT_FILE,
+                check_same_thread=False,
+            )
+            on_shutdown(conn.close)
+            agent_state = StateGraph(ThreadState)
+            agent_state.add_node("agent", call_model_with_messages)
+            agent_state.add_edge(START, "agent")
+            agent_state.add_edge("agent", END)
+            _graph = agent_state.compile(checkpointer=SqliteSaver(conn))
+        return _graph
@@ -1,13 +1,16 @@
+import functools
 from typing import Any, Optional
 
 from ai_prompter import Prompter
-from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import END, START, StateGraph
+from langgraph.graph.state import CompiledStateGraph
 from loguru import logger
 from typing_extensions import TypedDict
 
-from open_notebook.graphs.utils import provision_langchain_model
+from open_notebook.config import LLM_CACHE_ENABLED
+from open_notebook.graphs.utils import invoke_with_cache
+from open_notebook.usage import usage_scope
 
 
 class PatternChainState(TypedDict):
@@ -22,22 +25,26 @@ async def call_model(state: dict, config: RunnableConfig) -> dict:
     system_prompt = Prompter(
         template_text=state["prompt"], parser=state.get("parser")
     ).render(data=state)
-    payload = [SystemMessage(content=system_prompt)] + [HumanMessage(content=content)]
-    chain = await provision_langchain_model(
-        str(payload),
-        config.get("configurable", {}).get("model_id"),
-        "transformation",
-        max_tokens=5000,
-    )
-
-    response = await chain.ainvoke(payload)
-
-    return {"output": response.content}
-
-
-agent_state = StateGraph(PatternChainState)
-agent_state.add_node("agent", call_model)
-agent_state.add_edge(START, "agent")
-agent_state.add_edge("agent", END)
-
-graph = agent_state.compile()
+    with usage_scope("prompt"):
+        output = await invoke_with_cache(
+            system_prompt,
+            content,
+            config.get("configurable", {}).get("model_id"),
+            "transformation",
+            use_cache=config.get("configurable", {}).get(
+                "use_cache", LLM_CACHE_ENABLED
+            ),
+            max_tokens=5000,
+        )
+
+    return {"output": output}
+
+
+@functools.cache
+def get_graph() -> CompiledStateGraph:
+    """The prompt graph, compiled on first use."""
+    agent_state = StateGraph(PatternChainState)
+    agent_state.add_node("agent", call_model)
+    agent_state.add_edge(START, "agent")
+    agent_state.add_edge("agent", END)
+    return agent_state.compile()
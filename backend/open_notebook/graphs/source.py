@@ -1,18 +1,28 @@
+import asyncio
+import hashlib
 import operator
-from typing import Any, Dict, List, Optional
+import weakref
+from contextlib import AsyncExitStack
+from typing import Any, Dict, List, Optional, Tuple
 
 from content_core import extract_content
 from content_core.common import ProcessSourceState
 from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langgraph.graph import END, START, StateGraph
+from langgraph.graph.state import CompiledStateGraph
 from langgraph.types import Send
 from loguru import logger
 from typing_extensions import Annotated, TypedDict
 
+from open_notebook.config import SOURCE_CHECKPOINT_FILE
 from open_notebook.domain.content_settings import ContentSettings
 from open_notebook.domain.notebook import Asset, Source
+from open_notebook.domain.stats import record_ingestion
 from open_notebook.domain.transformation import Transformation
-from open_notebook.graphs.transformation import graph as transform_graph
+from open_notebook.graphs.transformation import get_graph as get_transformation_graph
+from open_notebook.lifecycle import on_shutdown
+from open_notebook.progress import ProgressTracker
 
 
 class SourceState(TypedDict):
@@ -22,14 +32,28 @@ class SourceState(TypedDict):
     source: Source
     transformation: Annotated[list, operator.add]
     embed: bool
+    ingest_key: Optional[str]
+    content_hash: Optional[str]
+
+
+class VectorizeState(TypedDict):
+    source: Source
 
 
 class TransformationState(TypedDict):
     source: Source
     transformation: Transformation
+    total: int
 
 
-async def content_process(state: SourceState) -> dict:
+def get_progress(config: RunnableConfig) -> Optional[ProgressTracker]:
+    return config.get("configurable", {}).get("progress")
+
+
+async def content_process(state: SourceState, config: RunnableConfig) -> dict:
+    progress = get_progress(config)
+    if progress:
+        await progress.update("extracting")
     content_settings = ContentSettings()
     content_state: Dict[str, Any] = state["content_state"]
 
@@ -45,47 +69,95 @@ async def content_process(state: SourceState) -> dict:
     return {"content_state": processed_state}
 
 
-async def save_source(state: SourceState) -> dict:
+async def save_source(state: SourceState, config: RunnableConfig) -> dict:
+    progress = get_progress(config)
+    if progress:
+        await progress.update("saving")
     content_state = state["content_state"]
 
-    source = Source(
-        asset=Asset(url=content_state.url, file_path=content_state.file_path),
-        full_text=content_state.content,
-        title=content_state.title,
-    )
-    await source.save()
+    # A retry of a run that died right after saving must not create a duplicate
+    ingest_key = state.get("ingest_key")
+    source = await Source.get_by_ingest_key(ingest_key) if ingest_key else None
+    if source:
+        logger.info(f"Reusing source {source.id} saved by a previous attempt")
+    else:
+        source = Source(
+            asset=Asset(url=content_state.url, file_path=content_state.file_path),
+            full_text=content_state.content,
+            title=content_state.title,
+            ingest_key=ingest_key,
+        )
+        await source.save()
+    assert source.id, "Source was not saved"
 
-    if state["notebook_id"]:
-        logger.debug(f"Adding source to notebook {state['notebook_id']}")
-        await source.add_to_notebook(state["notebook_id"])
+    # Both steps are repeated for a reused source, as the previous attempt may
+    # have died before them. Stats first, so the notebook's include this source
+    await record_ingestion(source.id, source.full_text)
 
-    if state["embed"]:
-        logger.debug("Embedding content for vector search")
-        await source.vectorize()
+    notebook_id = state["notebook_id"]
+    if notebook_id and not await source.is_in_notebook(notebook_id):
+        logger.debug(f"Adding source to notebook {notebook_id}")
+        await source.add_to_notebook(notebook_id)
+
+    if progress:
+        # Without embeddings the source is searchable by text once saved
+        if not state["embed"]:
+            await progress.reach("searchable")
+        if not state["apply_transformations"]:
+            await progress.reach("enriched")
 
     return {"source": source}
 
 
-def trigger_transformations(state: SourceState, config: RunnableConfig) -> List[Send]:
-    if len(state["apply_transformations"]) == 0:
-        return []
+async def vectorize(state: VectorizeState, config: RunnableConfig) -> dict:
+    progress = get_progress(config)
+    logger.debug("Embedding content for vector search")
 
-    to_apply = state["apply_transformations"]
-    logger.debug(f"Applying transformations {to_apply}")
+    async def on_embedding_progress(current: int, total: int) -> None:
+        if progress:
+            await progress.update("embedding", current, total)
 
-    return [
-        Send(
-            "transform_content",
-            {
-                "source": state["source"],
-                "transformation": t,
-            },
+    await state["source"].vectorize(
+        on_progress=on_embedding_progress if progress else None, resume=True
+    )
+    if progress:
+        await progress.reach("searchable")
+    return {}
+
+
+def trigger_enrichment(state: SourceState, config: RunnableConfig) -> List[Send]:
+    """
+    Start embedding and every transformation at once.
+
+    Transformations only need the extracted text, so they don't wait for the
+    chunks to be embedded and ingestion takes about as long as the slower of
+    the two instead of their sum.
+    """
+    sends = []
+    if state["embed"]:
+        sends.append(Send("vectorize", {"source": state["source"]}))
+
+    to_apply = state["apply_transformations"]
+    if to_apply:
+        logger.debug(f"Applying transformations {to_apply}")
+        sends.extend(
+            Send(
+                "transform_content",
+                {
+                    "source": state["source"],
+                    "transformation": t,
+                    "total": len(to_apply),
+                },
+            )
+            for t in to_apply
         )
-        for t in to_apply
-    ]
+
+    return sends
 
 
-async def transform_content(state: TransformationState) -> Optional[dict]:
+async def transform_content(
+    state: TransformationState, config: RunnableConfig
+) -> Optional[dict]:
     source = state["source"]
     content = source.full_text
     if not content:
@@ -93,10 +165,15 @@ async def transform_content(state: TransformationState) -> Optional[dict]:
     transformation: Transformation = state["transformation"]
 
     logger.debug(f"Applying transformation {transformation.name}")
-    result = await transform_graph.ainvoke(
+    result = await get_transformation_graph().ainvoke(
         dict(input_text=content, transformation=transformation)
     )
     await source.add_insight(transformation.title, result["output"])
+    progress = get_progress(config)
+    if progress:
+        await progress.advance("transforming", state["total"])
+        if progress.stages["transforming"]["current"] == state["total"]:
+            await progress.reach("enriched")
     return {
         "transformation": [
             {
@@ -107,20 +184,143 @@ async def transform_content(state: TransformationState) -> Optional[dict]:
     }
 
 
-# Create and compile the workflow
-workflow = StateGraph(SourceState)
+# Compiled graph and checkpointer of each event loop, as the checkpoint
+# connection can only be used from the loop it was opened in
+_graphs: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, Tuple[CompiledStateGraph, AsyncSqliteSaver]
+] = weakref.WeakKeyDictionary()
+
+
+def build_workflow() -> StateGraph:
+    workflow = StateGraph(SourceState)
+
+    # Add nodes
+    workflow.add_node("content_process", content_process)
+    workflow.add_node("save_source", save_source)
+    workflow.add_node("vectorize", vectorize)
+    workflow.add_node("transform_content", transform_content)
+    # Define the graph edges
+    workflow.add_edge(START, "content_process")
+    workflow.add_edge("content_process", "save_source")
+    workflow.add_conditional_edges(
+        "save_source", trigger_enrichment, ["vectorize", "transform_content"]
+    )
+    workflow.add_edge("vectorize", END)
+    workflow.add_edge("transform_content", END)
+    return workflow
+
+
+async def get_graph() -> Tuple[CompiledStateGraph, AsyncSqliteSaver]:
+    """
+    The source graph and its checkpointer, opened on first use in this loop.
+
+    The checkpoint connection stays open for the life of the process and is
+    closed by open_notebook.lifecycle.shutdown().
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _graphs:
+        stack = AsyncExitStack()
+        saver = await stack.enter_async_context(
+            AsyncSqliteSaver.from_conn_string(SOURCE_CHECKPOINT_FILE)
+        )
+        if loop in _graphs:
+            # Opened concurrently by another ingestion
+            await stack.aclose()
+        else:
+            _graphs[loop] = (build_workflow().compile(checkpointer=saver), saver)
+            on_shutdown(stack.aclose)
+    return _graphs[loop]
+
+
+def _hash_file(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+async def compute_ingest_key(
+    content_state: Dict[str, Any],
+    notebook_id: str,
+    content_hash: Optional[str] = None,
+) -> str:
+    """
+    Idempotency key of an ingestion: the hash of its content plus the notebook.
+
+    Files are hashed by their bytes, so uploading the same file twice gives the
+    same key even though each upload is stored under a new name. Pass
+    content_hash when the file was already hashed while it was stored.
+    """
+    if content_hash is None:
+        if content_state.get("file_path"):
+            content_hash = await asyncio.to_thread(
+                _hash_file, content_state["file_path"]
+            )
+        elif content_state.get("url"):
+            content_hash = hashlib.sha256(content_state["url"].encode()).hexdigest()
+        else:
+            content_hash = hashlib.sha256(
+                (content_state.get("content") or "").encode()
+            ).hexdigest()
+    return hashlib.sha256(f"{notebook_id}|{content_hash}".encode()).hexdigest()
+
+
+async def ingest_source(
+    content_state: Dict[str, Any],
+    notebook_id: str,
+    transformations: List[Transformation],
+    embed: bool,
+    ingest_key: Optional[str] = None,
+    progress: Optional[ProgressTracker] = None,
+    content_hash: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Run the source graph with a persistent checkpoint per ingest key.
+
+    If a previous attempt with the same key failed part way, it is resumed at the
+    failed step, reusing the extracted text and the chunks already embedded. If
+    it already completed, the source it created is returned.
+    """
+    ingest_key = ingest_key or await compute_ingest_key(
+        content_state, notebook_id, content_hash
+    )
+    config = RunnableConfig(
+        configurable={"thread_id": ingest_key, "progress": progress}
+    )
+
+    graph, saver = await get_graph()
+    snapshot = await graph.aget_state(config)
+
+    if snapshot.next:
+        logger.info(f"Resuming ingestion {ingest_key} at {snapshot.next}")
+        result = await graph.ainvoke(None, config)
+    else:
+        existing = await Source.get_by_ingest_key(ingest_key)
+        if existing:
+            logger.info(f"Content already ingested as source {existing.id}")
+            if content_hash and not existing.content_hash:
+                await existing.set_content_hash(content_hash)
+            return {"source": existing, "transformation": []}
+        result = await graph.ainvoke(
+            {
+                "content_state": content_state,
+                "notebook_id": notebook_id,
+                "apply_transformations": transformations,
+                "embed": embed,
+                "ingest_key": ingest_key,
+                "content_hash": content_hash,
+            },
+            config,
+        )
+
+    # Uploads are deduplicated by content hash, which is only recorded now that
+    # every step ran; until then a re-upload resumes this run instead
+    if result.get("content_hash"):
+        await result["source"].set_content_hash(result["content_hash"])
 
-# Add nodes
-workflow.add_node("content_process", content_process)
-workflow.add_node("save_source", save_source)
-workflow.add_node("transform_content", transform_content)
-# Define the graph edges
-workflow.add_edge(START, "content_process")
-workflow.add_edge("content_process", "save_source")
-workflow.add_conditional_edges(
-    "save_source", trigger_transformations, ["transform_content"]
-)
-workflow.add_edge("transform_content", END)
+    # Completed runs are found through source.ingest_key, the checkpoint
+    # is only needed to resume failed ones
+    await saver.adelete_thread(ingest_key)
 
-# Compile the graph
-source_graph = workflow.compile()
+    return result
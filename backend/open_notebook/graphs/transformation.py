@@ -1,51 +1,149 @@
+import asyncio
+import functools
+from typing import List, Optional
+
 from ai_prompter import Prompter
-from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import END, START, StateGraph
+from langgraph.graph.state import CompiledStateGraph
+from loguru import logger
 from typing_extensions import TypedDict
 
+from open_notebook.config import (
+    LLM_CACHE_ENABLED,
+    TRANSFORMATION_CHUNK_TOKENS,
+    TRANSFORMATION_MAX_CONCURRENCY,
+)
 from open_notebook.domain.notebook import Source
 from open_notebook.domain.transformation import DefaultPrompts, Transformation
-from open_notebook.graphs.utils import provision_langchain_model
-from open_notebook.utils import clean_thinking_content
+from open_notebook.graphs.utils import invoke_with_cache
+from open_notebook.usage import usage_scope
+from open_notebook.utils import clean_thinking_content, split_text, token_count
+
+REDUCE_INSTRUCTIONS = """# PARTIAL RESULTS
+
+The INPUT below is not the original document. It contains partial results, separated by horizontal rules, that were produced by applying the instructions above to consecutive sections of a longer document. Combine them into a single result that follows the instructions above as if they had been applied to the whole document. Remove repetition and keep the requested output format."""
 
 
 class TransformationState(TypedDict):
     input_text: str
     source: Source
     transformation: Transformation
+    map_reduce: Optional[bool]
     output: str
 
 
+async def call_transformation_model(
+    system_prompt: str, content: str, model_id: Optional[str], use_cache: bool
+) -> str:
+    response_content = await invoke_with_cache(
+        system_prompt,
+        content,
+        model_id,
+        "transformation",
+        use_cache=use_cache,
+        max_tokens=5055,
+    )
+
+    # Clean thinking content from the response
+    return clean_thinking_content(response_content)
+
+
+async def map_reduce_transformation(
+    template_text: str,
+    state: dict,
+    content: str,
+    model_id: Optional[str],
+    use_cache: bool,
+) -> str:
+    """
+    Apply a transformation to content larger than the model context.
+
+    The content is split into windows that are transformed concurrently, and the
+    partial outputs are then merged in rounds until a single output remains.
+    """
+    semaphore = asyncio.Semaphore(TRANSFORMATION_MAX_CONCURRENCY)
+
+    async def bounded_call(system_prompt: str, text: str) -> str:
+        async with semaphore:
+            return await call_transformation_model(
+                system_prompt, text, model_id, use_cache
+            )
+
+    map_prompt = Prompter(template_text=f"{template_text}\n\n# INPUT").render(
+        data=state
+    )
+    # Tokenizing a whole book takes a while, so it runs off the event loop
+    windows = await asyncio.to_thread(
+        split_text, content, chunk_size=TRANSFORMATION_CHUNK_TOKENS
+    )
+    logger.debug(f"Map-reduce transformation over {len(windows)} windows")
+    partials: List[str] = await asyncio.gather(
+        *[bounded_call(map_prompt, window) for window in windows]
+    )
+
+    reduce_prompt = Prompter(
+        template_text=f"{template_text}\n\n{REDUCE_INSTRUCTIONS}\n\n# INPUT"
+    ).render(data=state)
+    while len(partials) > 1:
+        groups: List[List[str]] = [[]]
+        group_tokens = 0
+        for partial in partials:
+            partial_tokens = token_count(partial)
+            if (
+                len(groups[-1]) >= 2
+                and group_tokens + partial_tokens > TRANSFORMATION_CHUNK_TOKENS
+            ):
+                groups.append([])
+                group_tokens = 0
+            groups[-1].append(partial)
+            group_tokens += partial_tokens
+        logger.debug(f"Reducing {len(partials)} partial outputs in {len(groups)} groups")
+        partials = await asyncio.gather(
+            *[
+                bounded_call(reduce_prompt, "\n\n---\n\n".join(group))
+                if len(group) > 1
+                else asyncio.sleep(0, result=group[0])
+                for group in groups
+            ]
+        )
+
+    return partials[0]
+
+
 async def run_transformation(state: dict, config: RunnableConfig) -> dict:
     source: Source = state.get("source")
     content = state.get("input_text")
     assert source or content, "No content to transform"
     transformation: Transformation = state["transformation"]
     if not content:
+        await source.ensure_loaded("full_text")
         content = source.full_text
+    assert content, "No content to transform"
     transformation_template_text = transformation.prompt
     default_prompts: DefaultPrompts = DefaultPrompts()
     if default_prompts.transformation_instructions:
         transformation_template_text = f"{default_prompts.transformation_instructions}\n\n{transformation_template_text}"
 
-    transformation_template_text = f"{transformation_template_text}\n\n# INPUT"
-
-    system_prompt = Prompter(template_text=transformation_template_text).render(
-        data=state
-    )
-    payload = [SystemMessage(content=system_prompt)] + [HumanMessage(content=content)]
-    chain = await provision_langchain_model(
-        str(payload),
-        config.get("configurable", {}).get("model_id"),
-        "transformation",
-        max_tokens=5055,
-    )
-
-    response = await chain.ainvoke(payload)
+    model_id = config.get("configurable", {}).get("model_id")
+    use_cache = config.get("configurable", {}).get("use_cache", LLM_CACHE_ENABLED)
+    map_reduce = state.get("map_reduce")
+    if map_reduce is None:
+        tokens = await asyncio.to_thread(token_count, content)
+        map_reduce = tokens > TRANSFORMATION_CHUNK_TOKENS
 
-    # Clean thinking content from the response
-    cleaned_content = clean_thinking_content(response.content)
+    with usage_scope("transformation"):
+        if map_reduce:
+            cleaned_content = await map_reduce_transformation(
+                transformation_template_text, state, content, model_id, use_cache
+            )
+        else:
+            system_prompt = Prompter(
+                template_text=f"{transformation_template_text}\n\n# INPUT"
+            ).render(data=state)
+            cleaned_content = await call_transformation_model(
+                system_prompt, content, model_id, use_cache
+            )
 
     if source:
         await source.add_insight(transformation.title, cleaned_content)
@@ -55,8 +153,11 @@ async def run_transformation(state: dict, config: RunnableConfig) -> dict:
     }
 
 
-agent_state = StateGraph(TransformationState)
-agent_state.add_node("agent", run_transformation)
-agent_state.add_edge(START, "agent")
-agent_state.add_edge("agent", END)
-graph = agent_state.compile()
+@functools.cache
+def get_graph() -> CompiledStateGraph:
+    """The transformation graph, compiled on first use."""
+    agent_state = StateGraph(TransformationState)
+    agent_state.add_node("agent", run_transformation)
+    agent_state.add_edge(START, "agent")
+    agent_state.add_edge("agent", END)
+    return agent_state.compile()
@@ -1,19 +1,25 @@
+import time
+from typing import Any, Optional, Tuple
+
 from esperanto import LanguageModel
 from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import HumanMessage, SystemMessage
 from loguru import logger
 
+from open_notebook.cache import response_cache
+from open_notebook.config import LLM_HEDGING_ENABLED
 from open_notebook.domain.models import model_manager
+from open_notebook.routing import RoutedChatModel
+from open_notebook.scheduler import model_key, rate_limited
 from open_notebook.utils import token_count
 
 
-async def provision_langchain_model(
-    content, model_id, default_type, **kwargs
-) -> BaseChatModel:
+async def resolve_route(
+    content, model_id, default_type
+) -> Tuple[Optional[str], str]:
     """
-    Returns the best model to use based on the context size and on whether there is a specific model being requested in Config.
-    If context > 105_000, returns the large_context_model
-    If model_id is specified in Config, returns that model
-    Otherwise, returns the default model for the given type
+    Returns the ID of the model to use for this content, and the model type
+    whose fallbacks apply to it.
     """
     tokens = token_count(content)
 
@@ -21,12 +27,103 @@ async def provision_langchain_model(
         logger.debug(
             f"Using large context model because the content has {tokens} tokens"
         )
-        model = await model_manager.get_default_model("large_context", **kwargs)
+        return (
+            await model_manager.get_default_model_id("large_context"),
+            "large_context",
+        )
     elif model_id:
-        model = await model_manager.get_model(model_id, **kwargs)
+        return model_id, default_type
     else:
-        model = await model_manager.get_default_model(default_type, **kwargs)
+        return await model_manager.get_default_model_id(default_type), default_type
+
+
+async def resolve_model_id(content, model_id, default_type) -> Optional[str]:
+    """
+    Returns the ID of the model provision_langchain_model would use for this content.
+    """
+    return (await resolve_route(content, model_id, default_type))[0]
+
+
+async def provision_langchain_model(
+    content, model_id, default_type, hedge: bool = False, **kwargs
+) -> BaseChatModel:
+    """
+    Returns the best model to use based on the context size and on whether there is a specific model being requested in Config.
+    If context > 105_000, returns the large_context_model
+    If model_id is specified in Config, returns that model
+    Otherwise, returns the default model for the given type
+
+    When fallback models are configured for the model type, the model is routed
+    through them in order if it fails, and with `hedge` (and LLM_HEDGING_ENABLED)
+    a fallback is also started when the model is slower than usual.
+    """
+    model_id, route_type = await resolve_route(content, model_id, default_type)
+    model = await model_manager.get_model(model_id, **kwargs)
 
     logger.debug(f"Using model: {model}")
     assert isinstance(model, LanguageModel), f"Model is not a LanguageModel: {model}"
-    return model.to_langchain()
+
+    candidates = [model]
+    for fallback_id in await model_manager.get_fallback_model_ids(route_type):
+        if fallback_id == model_id:
+            continue
+        try:
+            fallback = await model_manager.get_model(fallback_id, **kwargs)
+        except Exception as e:
+            logger.warning(f"Skipping fallback model {fallback_id}: {e}")
+            continue
+        if isinstance(fallback, LanguageModel):
+            candidates.append(fallback)
+
+    if len(candidates) == 1:
+        return rate_limited(model.to_langchain(), model)
+    return RoutedChatModel(
+        candidates=[
+            rate_limited(candidate.to_langchain(), candidate)
+            for candidate in candidates
+        ],
+        keys=[model_key(candidate) for candidate in candidates],
+        hedge=hedge and LLM_HEDGING_ENABLED,
+    )
+
+
+async def invoke_with_cache(
+    system_prompt: str,
+    content: str,
+    model_id: Optional[str],
+    default_type: str,
+    use_cache: bool = False,
+    **kwargs,
+) -> Any:
+    """
+    Runs a system prompt + human message through the provisioned model and
+    returns the response content, reusing a cached response for identical
+    (model, system prompt, input, kwargs) when use_cache is set.
+    """
+    payload = [SystemMessage(content=system_prompt)] + [HumanMessage(content=content)]
+
+    cache_key = None
+    if use_cache:
+        resolved_id = await resolve_model_id(str(payload), model_id, default_type)
+        cache_key = response_cache.make_key(
+            resolved_id, system_prompt, content, **kwargs
+        )
+        cached = await response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    chain = await provision_langchain_model(
+        str(payload), model_id, default_type, **kwargs
+    )
+    start_time = time.monotonic()
+    response = await chain.ainvoke(payload)
+
+    if cache_key:
+        await response_cache.set(
+            cache_key,
+            response.content,
+            tokens=token_count(str(payload)) + token_count(str(response.content)),
+            latency=time.monotonic() - start_time,
+        )
+
+    return response.content
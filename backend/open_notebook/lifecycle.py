@@ -0,0 +1,75 @@
+"""
+Startup and shutdown of an Open Notebook process.
+
+Importing open_notebook has no side effects. Data folders are created by
+startup(), graphs are compiled on first use, and resources that hold
+connections (the chat checkpoint database, change feeds, the usage buffer) are
+released by shutdown().
+
+The API runs both from its FastAPI lifespan, and the command worker from
+run_worker.py. The Streamlit UI only calls ensure_data_folders(), since it has
+no shutdown of its own.
+"""
+
+import asyncio
+import inspect
+import os
+import threading
+from typing import Awaitable, Callable, List, TypeVar, Union
+
+from loguru import logger
+
+from open_notebook.config import (
+    BLOBS_FOLDER,
+    DATA_FOLDER,
+    SQLITE_FOLDER,
+    UPLOADS_FOLDER,
+)
+
+Hook = Callable[[], Union[None, Awaitable[None]]]
+H = TypeVar("H", bound=Hook)
+
+_shutdown_hooks: List[Hook] = []
+_hooks_lock = threading.Lock()
+
+
+def on_shutdown(hook: H) -> H:
+    """Run `hook` on shutdown, after the hooks registered later than it."""
+    with _hooks_lock:
+        _shutdown_hooks.append(hook)
+    return hook
+
+
+def ensure_data_folders() -> None:
+    for folder in (DATA_FOLDER, SQLITE_FOLDER, UPLOADS_FOLDER, BLOBS_FOLDER):
+        os.makedirs(folder, exist_ok=True)
+
+
+async def startup() -> None:
+    """Prepare this process to serve requests or run commands."""
+    from open_notebook.domain.invalidation import start_cache_invalidation
+
+    ensure_data_folders()
+    start_cache_invalidation()
+    logger.info("Open Notebook started")
+
+
+async def shutdown() -> None:
+    """Close what this process opened, in reverse order of opening."""
+    from open_notebook.domain.invalidation import stop_cache_invalidation
+    from open_notebook.usage import ledger
+
+    with _hooks_lock:
+        hooks = _shutdown_hooks[::-1]
+        _shutdown_hooks.clear()
+    for hook in hooks:
+        try:
+            result = hook()
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            logger.warning(f"Shutdown hook {hook} failed: {e}")
+
+    await ledger.flush()
+    await asyncio.to_thread(stop_cache_invalidation)
+    logger.info("Open Notebook stopped")
@@ -1,7 +1,6 @@
 from typing import ClassVar, List, Optional
 
 from loguru import logger
-from podcastfy.client import generate_podcast
 from pydantic import Field, field_validator, model_validator
 
 from open_notebook.config import DATA_FOLDER
@@ -126,6 +125,8 @@ class PodcastConfig(ObjectModel):
             f"Generating episode {episode_name} with config {conversation_config} and using model {llm_model_name}, tts model {tts_model}"
         )
 
+        from podcastfy.client import generate_podcast
+
         try:
             audio_file = generate_podcast(
                 conversation_config=conversation_config,
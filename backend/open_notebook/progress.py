@@ -0,0 +1,69 @@
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from loguru import logger
+
+
+class ProgressTracker:
+    """
+    Tracks the stages of a long running job and forwards them to a sink.
+
+    Stages may run concurrently; each keeps its own counters and the most
+    recently updated one is reported as the current stage. Updates within a
+    stage are throttled to one every `min_interval` seconds, except for its
+    first and last step, so reporting per chunk doesn't turn into a database
+    write per chunk.
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[Dict[str, Any]], Awaitable[None]],
+        min_interval: float = 1.0,
+    ):
+        self.sink = sink
+        self.min_interval = min_interval
+        self.stage: Optional[str] = None
+        self.stages: Dict[str, Dict[str, Optional[int]]] = {}
+        self.milestones: Dict[str, bool] = {}
+        self._last_report = 0.0
+
+    async def update(
+        self, stage: str, current: Optional[int] = None, total: Optional[int] = None
+    ) -> None:
+        new_stage = stage not in self.stages
+        self.stage = stage
+        self.stages[stage] = {"current": current, "total": total}
+        if (
+            not new_stage
+            and (current is None or current != total)
+            and time.monotonic() - self._last_report < self.min_interval
+        ):
+            return
+        await self._report()
+
+    async def advance(self, stage: str, total: Optional[int] = None) -> None:
+        """Count one more finished step of a stage whose steps complete out of order."""
+        current = (self.stages.get(stage, {}).get("current") or 0) + 1
+        await self.update(stage, current, total)
+
+    async def reach(self, milestone: str) -> None:
+        """Record a point of the job that callers care about, such as `searchable`."""
+        self.milestones[milestone] = True
+        await self._report()
+
+    async def _report(self) -> None:
+        self._last_report = time.monotonic()
+        current = self.stages.get(self.stage or "", {})
+        try:
+            await self.sink(
+                {
+                    "stage": self.stage,
+                    "current": current.get("current"),
+                    "total": current.get("total"),
+                    "stages": self.stages,
+                    **self.milestones,
+                }
+            )
+        except Exception as e:
+            # Progress is informational, it must never fail the job itself
+            logger.warning(f"Could not report progress: {e}")
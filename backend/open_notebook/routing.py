@@ -0,0 +1,327 @@
+"""
+Fallback chains and hedged requests for chat models.
+
+A RoutedChatModel wraps the model picked for a call together with the fallbacks
+configured for its model type. Candidates are tried in order, moving on to the
+next one when a provider fails. With hedging on, a backup is also started when
+the current candidate hasn't produced a first token by the p95 time-to-first-token
+seen for it; whichever streams first is kept and the other call is cancelled.
+
+Time to first token is tracked per provider/model in a decaying histogram, so
+deadlines follow recent behaviour and a provider with too few samples is never
+hedged.
+"""
+
+import asyncio
+import bisect
+import contextvars
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessageChunk,
+    BaseMessage,
+    BaseMessageChunk,
+    message_chunk_to_message,
+)
+from langchain_core.outputs import ChatGeneration, ChatResult
+from loguru import logger
+from pydantic import ConfigDict
+
+from open_notebook.config import LLM_HEDGE_MIN_SAMPLES
+
+# Upper bounds of the histogram buckets, 50ms to about 4 minutes
+LATENCY_BUCKETS = [0.05 * 1.5**i for i in range(22)]
+
+# Counts are halved past this many samples, so old latencies fade out
+HISTOGRAM_WINDOW = 200
+
+
+class LatencyHistogram:
+    def __init__(self) -> None:
+        self._counts = [0.0] * (len(LATENCY_BUCKETS) + 1)
+        self._lock = threading.Lock()
+        self.samples = 0
+        self.failures = 0
+        self.fallbacks = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self.samples += 1
+            if sum(self._counts) >= 2 * HISTOGRAM_WINDOW:
+                self._counts = [count / 2 for count in self._counts]
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile, None without samples."""
+        with self._lock:
+            total = sum(self._counts)
+            if not total:
+                return None
+            seen = 0.0
+            for index, count in enumerate(self._counts):
+                seen += count
+                if seen >= q * total:
+                    break
+        return LATENCY_BUCKETS[min(index, len(LATENCY_BUCKETS) - 1)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "samples": self.samples,
+            "p50_seconds": self.quantile(0.5),
+            "p95_seconds": self.quantile(0.95),
+            "failures": self.failures,
+            "fallbacks": self.fallbacks,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+_histograms: Dict[str, LatencyHistogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def latency(key: str) -> LatencyHistogram:
+    with _histograms_lock:
+        if key not in _histograms:
+            _histograms[key] = LatencyHistogram()
+        return _histograms[key]
+
+
+def get_routing_stats() -> List[Dict[str, Any]]:
+    return [
+        {"key": key, **histogram.get_stats()}
+        for key, histogram in list(_histograms.items())
+    ]
+
+
+def hedge_deadline(key: str) -> Optional[float]:
+    """Seconds to wait for a first token before hedging, None if not known yet."""
+    histogram = latency(key)
+    if histogram.samples < LLM_HEDGE_MIN_SAMPLES:
+        return None
+    return histogram.quantile(0.95)
+
+
+class _Race:
+    """
+    Bookkeeping of one routed call, shared by the sync and async drivers.
+
+    Candidates report ("first", index, None) on their first chunk, then
+    ("done", index, message) or ("error", index, exception).
+    """
+
+    def __init__(
+        self,
+        router: "RoutedChatModel",
+        launch: Callable[[int], None],
+        cancel: Callable[[int], object],
+    ):
+        self.router = router
+        self.launch = launch
+        self.cancel = cancel
+        self.started: List[float] = []
+        self.active: set = set()
+        self.winner: Optional[int] = None
+        self.hedged = False
+
+    def start_next(self) -> bool:
+        index = len(self.started)
+        if index >= len(self.router.candidates):
+            return False
+        self.started.append(time.monotonic())
+        self.active.add(index)
+        self.launch(index)
+        return True
+
+    def timeout(self) -> Optional[float]:
+        """Seconds until a backup should be started, None to wait indefinitely."""
+        if (
+            not self.router.hedge
+            or self.hedged
+            or self.winner is not None
+            or len(self.active) != 1
+            or len(self.started) >= len(self.router.candidates)
+        ):
+            return None
+        index = next(iter(self.active))
+        deadline = hedge_deadline(self.router.keys[index])
+        if deadline is None:
+            return None
+        return max(0.0, self.started[index] + deadline - time.monotonic())
+
+    def on_timeout(self) -> None:
+        self.hedged = True
+        latency(self.router.keys[len(self.started)]).hedges += 1
+        self.start_next()
+
+    def on_event(self, index: int, kind: str, payload: Any) -> Optional[BaseMessage]:
+        """Handle a candidate's report, returning the final message when done."""
+        if self.winner is not None and index != self.winner:
+            return None
+        key = self.router.keys[index]
+
+        if kind == "first":
+            self.winner = index
+            for other in self.active - {index}:
+                self.cancel(other)
+            self.active = {index}
+            if self.hedged and index == len(self.started) - 1:
+                latency(key).hedge_wins += 1
+            return None
+
+        if kind == "done":
+            return payload
+
+        self.active.discard(index)
+        latency(key).failures += 1
+        if self.winner == index:
+            self.winner = None
+        if not self.active:
+            logger.warning(f"Model {key} failed: {payload}")
+            if not self.start_next():
+                raise payload
+            latency(self.router.keys[len(self.started) - 1]).fallbacks += 1
+        return None
+
+
+class RoutedChatModel(BaseChatModel):
+    """Chat model that routes each call over a chain of candidate models."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    candidates: List[Any]
+    keys: List[str]
+    hedge: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "routed"
+
+    async def _astream_candidate(
+        self, index: int, events: asyncio.Queue, messages, stop, kwargs
+    ) -> None:
+        start = time.monotonic()
+        message: Optional[BaseMessageChunk] = None
+        try:
+            async for chunk in self.candidates[index].astream(
+                messages, stop=stop, **kwargs
+            ):
+                if message is None:
+                    latency(self.keys[index]).record(time.monotonic() - start)
+                    events.put_nowait((index, "first", None))
+                    message = chunk
+                else:
+                    message += chunk
+            if message is None:
+                events.put_nowait((index, "first", None))
+            message = message or AIMessageChunk(content="")
+            events.put_nowait((index, "done", message_chunk_to_message(message)))
+        except Exception as e:
+            events.put_nowait((index, "error", e))
+
+    def _stream_candidate(
+        self,
+        index: int,
+        events: queue.Queue,
+        cancelled: threading.Event,
+        messages,
+        stop,
+        kwargs,
+    ) -> None:
+        start = time.monotonic()
+        message: Optional[BaseMessageChunk] = None
+        stream = self.candidates[index].stream(messages, stop=stop, **kwargs)
+        try:
+            for chunk in stream:
+                if cancelled.is_set():
+                    return
+                if message is None:
+                    latency(self.keys[index]).record(time.monotonic() - start)
+                    events.put((index, "first", None))
+                    message = chunk
+                else:
+                    message += chunk
+            if message is None:
+                events.put((index, "first", None))
+            message = message or AIMessageChunk(content="")
+            events.put((index, "done", message_chunk_to_message(message)))
+        except Exception as e:
+            events.put((index, "error", e))
+        finally:
+            # Closing the generator also closes the provider's response
+            stream.close()
+
+    async def _agenerate(
+        self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs
+    ) -> ChatResult:
+        events: asyncio.Queue = asyncio.Queue()
+        tasks: Dict[int, asyncio.Task] = {}
+
+        def launch(index: int) -> None:
+            tasks[index] = asyncio.create_task(
+                self._astream_candidate(index, events, messages, stop, kwargs)
+            )
+
+        race = _Race(self, launch, lambda index: tasks[index].cancel())
+        race.start_next()
+        try:
+            while True:
+                try:
+                    index, kind, payload = await asyncio.wait_for(
+                        events.get(), race.timeout()
+                    )
+                except asyncio.TimeoutError:
+                    race.on_timeout()
+                    continue
+                message = race.on_event(index, kind, payload)
+                if message is not None:
+                    return ChatResult(generations=[ChatGeneration(message=message)])
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+    def _generate(
+        self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs
+    ) -> ChatResult:
+        events: queue.Queue = queue.Queue()
+        cancelled: Dict[int, threading.Event] = {}
+
+        def launch(index: int) -> None:
+            cancelled[index] = threading.Event()
+            # Run with the caller's context, so priority and usage scope carry over
+            context = contextvars.copy_context()
+            threading.Thread(
+                target=context.run,
+                args=(
+                    self._stream_candidate,
+                    index,
+                    events,
+                    cancelled[index],
+                    messages,
+                    stop,
+                    kwargs,
+                ),
+                daemon=True,
+            ).start()
+
+        race = _Race(self, launch, lambda index: cancelled[index].set())
+        race.start_next()
+        try:
+            while True:
+                try:
+                    index, kind, payload = events.get(timeout=race.timeout())
+                except queue.Empty:
+                    race.on_timeout()
+                    continue
+                message = race.on_event(index, kind, payload)
+                if message is not None:
+                    return ChatResult(generations=[ChatGeneration(message=message)])
+        finally:
+            for event in cancelled.values():
+                event.set()
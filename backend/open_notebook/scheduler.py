@@ -0,0 +1,291 @@
+"""
+Rate limiting for model provider calls.
+
+Every language and embedding model gets a limiter, keyed by provider and model
+name, with optional requests-per-minute and tokens-per-minute buckets taken
+from its Model record. Calls wait in a queue ordered by priority, so an
+interactive chat isn't stuck behind the embeddings of a background ingest, and
+the limit is shared by everything running in the process instead of each job
+collecting 429s on its own.
+
+Token usage is only known once a call is done, so tokens are charged as they
+are counted (input before the call, output after it) and a bucket in debt
+holds the queue until it refills.
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.rate_limiters import BaseRateLimiter
+
+from open_notebook.config import LLM_DEFAULT_RPM, LLM_DEFAULT_TPM
+from open_notebook.usage import ledger
+from open_notebook.utils import token_count
+
+# Priority classes, lower runs first
+INTERACTIVE = 0
+BACKGROUND = 10
+
+# How often queued calls that are not first in line check their turn
+QUEUE_POLL_SECONDS = 0.05
+
+_priority: ContextVar[int] = ContextVar("llm_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(level: int) -> Iterator[None]:
+    """Run the model calls made inside the block with this priority."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.available = self.capacity
+        self._updated = time.monotonic()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.available = min(
+            self.capacity, self.available + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available, capped to the bucket size."""
+        missing = min(amount, self.capacity) - self.available
+        return max(0.0, missing / self.rate)
+
+
+class RateLimiter:
+    """Requests and tokens per minute for one provider/model, with a priority queue."""
+
+    def __init__(
+        self, key: str, rpm: Optional[int] = None, tpm: Optional[int] = None
+    ):
+        self.key = key
+        self._lock = threading.Lock()
+        self._queue: List[Tuple[int, int]] = []
+        self._tickets = itertools.count()
+        self.admitted = 0
+        self.queued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.configure(rpm, tpm)
+
+    def configure(self, rpm: Optional[int], tpm: Optional[int]) -> None:
+        with self._lock:
+            self.rpm = rpm
+            self.tpm = tpm
+            self._requests = TokenBucket(rpm) if rpm else None
+            self._tokens = TokenBucket(tpm) if tpm else None
+
+    @property
+    def limited(self) -> bool:
+        return bool(self._requests or self._tokens)
+
+    def _try_admit(self, ticket: Tuple[int, int], cost: int) -> float:
+        """Admit the ticket if it is next and within limits, else return the wait."""
+        with self._lock:
+            if self._queue[0] != ticket:
+                return QUEUE_POLL_SECONDS
+            wait = 0.0
+            for bucket, amount in ((self._requests, 1), (self._tokens, cost)):
+                if bucket:
+                    bucket.refill()
+                    wait = max(wait, bucket.wait_time(amount))
+            if wait > 0:
+                return wait
+            if self._requests:
+                self._requests.available -= 1
+            if self._tokens:
+                self._tokens.available -= cost
+            heapq.heappop(self._queue)
+            return 0.0
+
+    def _enqueue(self) -> Tuple[int, int]:
+        ticket = (_priority.get(), next(self._tickets))
+        with self._lock:
+            heapq.heappush(self._queue, ticket)
+        return ticket
+
+    def _leave(self, ticket: Tuple[int, int]) -> None:
+        with self._lock:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+
+    def _record(self, waited: float) -> None:
+        self.admitted += 1
+        if waited > 0:
+            self.queued += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    async def acquire(self, cost: int = 0) -> float:
+        """Wait for a turn to make one call costing `cost` tokens; returns the wait."""
+        if not self.limited:
+            self._record(0.0)
+            return 0.0
+        start = time.monotonic()
+        ticket = self._enqueue()
+        try:
+            while (delay := self._try_admit(ticket, cost)) > 0:
+                await asyncio.sleep(delay)
+        except BaseException:
+            self._leave(ticket)
+            raise
+        waited = time.monotonic() - start
+        self._record(waited)
+        return waited
+
+    def acquire_sync(self, cost: int = 0) -> float:
+        """Blocking acquire, for models invoked synchronously."""
+        if not self.limited:
+            self._record(0.0)
+            return 0.0
+        start = time.monotonic()
+        ticket = self._enqueue()
+        try:
+            while (delay := self._try_admit(ticket, cost)) > 0:
+                time.sleep(delay)
+        except BaseException:
+            self._leave(ticket)
+            raise
+        waited = time.monotonic() - start
+        self._record(waited)
+        return waited
+
+    def charge(self, tokens: int) -> None:
+        """Charge tokens counted after a call was admitted."""
+        with self._lock:
+            if self._tokens and tokens:
+                self._tokens.refill()
+                self._tokens.available -= tokens
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "key": self.key,
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "waiting": len(self._queue),
+            "avg_wait_seconds": round(self.total_wait / self.queued, 3)
+            if self.queued
+            else 0.0,
+            "max_wait_seconds": round(self.max_wait, 3),
+        }
+
+
+class LLMScheduler:
+    def __init__(self) -> None:
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, key: str) -> RateLimiter:
+        with self._lock:
+            if key not in self._limiters:
+                self._limiters[key] = RateLimiter(
+                    key, LLM_DEFAULT_RPM, LLM_DEFAULT_TPM
+                )
+            return self._limiters[key]
+
+    def configure(self, key: str, rpm: Optional[int], tpm: Optional[int]) -> None:
+        """Apply the limits of a Model record, falling back to the process defaults."""
+        self.limiter(key).configure(rpm or LLM_DEFAULT_RPM, tpm or LLM_DEFAULT_TPM)
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        return [limiter.get_stats() for limiter in list(self._limiters.values())]
+
+
+scheduler = LLMScheduler()
+
+
+def model_key(model: Any) -> str:
+    """Limiter key of an esperanto model instance."""
+    provider = getattr(model, "provider", None) or "unknown"
+    name = getattr(model, "model_name", None) or "default"
+    return f"{provider}/{name}"
+
+
+async def aembed(model: Any, texts: List[str]) -> List[List[float]]:
+    """Embed texts with an esperanto embedding model, within its rate limits."""
+    key = model_key(model)
+    tokens = sum(token_count(text) for text in texts)
+    await scheduler.limiter(key).acquire(tokens)
+    start = time.monotonic()
+    embeddings = await model.aembed(texts)
+    ledger.record(key, "embedding", tokens, 0, time.monotonic() - start)
+    return embeddings
+
+
+class SchedulerRateLimiter(BaseRateLimiter):
+    """Lets LangChain chat models wait for their turn in the scheduler."""
+
+    def __init__(self, limiter: RateLimiter):
+        self.limiter = limiter
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        if not blocking:
+            return not self.limiter.limited
+        self.limiter.acquire_sync()
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        if not blocking:
+            return not self.limiter.limited
+        await self.limiter.acquire()
+        return True
+
+
+class TokenCharger(BaseCallbackHandler):
+    """Charges the tokens of each chat call to its limiter."""
+
+    def __init__(self, limiter: RateLimiter):
+        self.limiter = limiter
+
+    def on_chat_model_start(self, serialized, messages, **kwargs) -> None:
+        # Runs before the rate limiter is acquired, so the prompt is charged upfront
+        self.limiter.charge(
+            sum(
+                token_count(str(message.content))
+                for batch in messages
+                for message in batch
+            )
+        )
+
+    def on_llm_end(self, response: LLMResult, **kwargs) -> None:
+        output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                output_tokens += (
+                    usage["output_tokens"] if usage else token_count(generation.text)
+                )
+        self.limiter.charge(output_tokens)
+
+
+def rate_limited(chat_model: Any, model: Any) -> Any:
+    """Attach the limiter of an esperanto model to the LangChain model built from it."""
+    key = model_key(model)
+    limiter = scheduler.limiter(key)
+    # Lets the usage ledger name the model the same way as the scheduler
+    chat_model.metadata = {**(chat_model.metadata or {}), "model_key": key}
+    chat_model.rate_limiter = SchedulerRateLimiter(limiter)
+    chat_model.callbacks = [*(chat_model.callbacks or []), TokenCharger(limiter)]
+    return chat_model
@@ -0,0 +1,265 @@
+"""
+Token, cost and latency ledger for model calls.
+
+Every chat model call made through LangChain in this process is recorded by a
+callback registered as a configure hook, so it also covers graphs and libraries
+that build their own models; embeddings are recorded by scheduler.aembed. Each
+record names the model, the pipeline stage that made the call (the caller) and,
+when known, the notebook, as set with usage_scope().
+
+Records are buffered in memory and written to the usage table in batches from a
+background thread, so recording never waits on the database. Cost uses the
+input and output prices of the Model record, and is 0 for models without them.
+"""
+
+import asyncio
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.tracers.context import register_configure_hook
+from loguru import logger
+
+from open_notebook.config import (
+    USAGE_BATCH_SIZE,
+    USAGE_FLUSH_SECONDS,
+    USAGE_LEDGER_ENABLED,
+)
+from open_notebook.database.repository import ensure_record_id, repo_insert, repo_query
+from open_notebook.utils import token_cost, token_count
+
+# Records kept while the database can't be written, the oldest are dropped past it
+MAX_BUFFERED_RECORDS = 10_000
+
+GROUP_FIELDS = {
+    "notebook": "notebook",
+    "model": "model",
+    "caller": "caller",
+    "kind": "kind",
+    "day": 'time::format(created, "%Y-%m-%d") AS day',
+}
+
+_scope: ContextVar[Tuple[str, Optional[str]]] = ContextVar(
+    "usage_scope", default=("other", None)
+)
+
+
+@contextmanager
+def usage_scope(caller: str, notebook_id: Optional[str] = None) -> Iterator[None]:
+    """Attribute the model calls made inside the block to a caller and notebook."""
+    token = _scope.set((caller, notebook_id or _scope.get()[1]))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+class UsageLedger:
+    def __init__(self) -> None:
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        # provider/model -> (input, output) cost per million tokens
+        self._pricing: Dict[str, Tuple[float, float]] = {}
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+
+    def set_pricing(
+        self, key: str, input_cost: Optional[float], output_cost: Optional[float]
+    ) -> None:
+        self._pricing[key] = (input_cost or 0.0, output_cost or 0.0)
+
+    def record(
+        self,
+        model: str,
+        kind: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        latency: float,
+    ) -> None:
+        if not USAGE_LEDGER_ENABLED:
+            return
+        caller, notebook_id = _scope.get()
+        input_cost, output_cost = self._pricing.get(model, (0.0, 0.0))
+        record = {
+            "model": model,
+            "kind": kind,
+            "caller": caller,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "latency": round(latency, 3),
+            "cost": token_cost(prompt_tokens, input_cost)
+            + token_cost(completion_tokens, output_cost),
+            "created": datetime.now(timezone.utc),
+        }
+        if notebook_id:
+            record["notebook"] = ensure_record_id(notebook_id)
+        with self._lock:
+            self._buffer.append(record)
+            self.recorded += 1
+            if len(self._buffer) > MAX_BUFFERED_RECORDS:
+                del self._buffer[0]
+                self.dropped += 1
+            full = len(self._buffer) >= USAGE_BATCH_SIZE
+        self._start_writer()
+        if full:
+            self._wakeup.set()
+
+    def _take(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            batch = self._buffer[:USAGE_BATCH_SIZE]
+            del self._buffer[:USAGE_BATCH_SIZE]
+        return batch
+
+    def _requeue(self, batch: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._buffer[:0] = batch
+
+    async def flush(self) -> None:
+        """Write out everything buffered so far."""
+        while batch := self._take():
+            try:
+                await repo_insert("usage", batch)
+            except Exception as e:
+                logger.warning(f"Could not write {len(batch)} usage records: {e}")
+                self._requeue(batch)
+                return
+            self.written += len(batch)
+
+    def flush_sync(self) -> None:
+        if self._buffer:
+            asyncio.run(self.flush())
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(USAGE_FLUSH_SECONDS)
+            self._wakeup.clear()
+            try:
+                asyncio.run(self.flush())
+            except Exception as e:
+                logger.warning(f"Usage writer failed: {e}")
+
+    def _start_writer(self) -> None:
+        if self._writer is not None:
+            return
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._run, name="usage-writer", daemon=True
+                )
+                self._writer.start()
+                atexit.register(self.flush_sync)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "recorded": self.recorded,
+            "written": self.written,
+            "buffered": len(self._buffer),
+            "dropped": self.dropped,
+        }
+
+
+ledger = UsageLedger()
+
+
+class UsageRecorder(BaseCallbackHandler):
+    """Records each chat model call in the ledger."""
+
+    def __init__(self) -> None:
+        # run id -> (model, prompt token estimate, start time)
+        self._runs: Dict[UUID, Tuple[str, int, float]] = {}
+
+    def on_chat_model_start(
+        self, serialized, messages, *, run_id: UUID, metadata=None, **kwargs
+    ) -> None:
+        params = kwargs.get("invocation_params") or {}
+        # Routed models only dispatch to other chat models, which are recorded
+        if params.get("_type") == "routed":
+            return
+        metadata = metadata or {}
+        provider = metadata.get("ls_provider") or params.get("_type") or "unknown"
+        name = (
+            metadata.get("ls_model_name")
+            or params.get("model")
+            or params.get("model_name")
+            or "default"
+        )
+        model = metadata.get("model_key") or f"{provider}/{name}"
+        prompt_tokens = sum(
+            token_count(str(message.content))
+            for batch in messages
+            for message in batch
+        )
+        self._runs[run_id] = (model, prompt_tokens, time.monotonic())
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        model, prompt_tokens, start = run
+        completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                if usage:
+                    prompt_tokens = usage.get("input_tokens") or prompt_tokens
+                    completion_tokens += usage.get("output_tokens") or 0
+                else:
+                    completion_tokens += token_count(generation.text)
+        ledger.record(
+            model, "llm", prompt_tokens, completion_tokens, time.monotonic() - start
+        )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._runs.pop(run_id, None)
+
+
+_recorder: ContextVar[Optional[UsageRecorder]] = ContextVar(
+    "usage_recorder", default=UsageRecorder()
+)
+register_configure_hook(_recorder, inheritable=True)
+
+
+async def get_usage_summary(
+    group_by: List[str],
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    notebook_id: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Calls, tokens, cost and latency of recorded usage, grouped by GROUP_FIELDS."""
+    conditions = []
+    params: Dict[str, Any] = {}
+    if since:
+        conditions.append("created >= $since")
+        params["since"] = since
+    if until:
+        conditions.append("created < $until")
+        params["until"] = until
+    if notebook_id:
+        conditions.append("notebook = $notebook")
+        params["notebook"] = ensure_record_id(notebook_id)
+
+    selected = "".join(f"{GROUP_FIELDS[field]}, " for field in group_by)
+    query = f"""
+        SELECT {selected}
+            count() AS calls,
+            math::sum(prompt_tokens) AS prompt_tokens,
+            math::sum(completion_tokens) AS completion_tokens,
+            math::sum(cost) AS cost,
+            math::mean(latency) AS avg_latency,
+            math::max(latency) AS max_latency
+        FROM usage
+        {"WHERE " + " AND ".join(conditions) if conditions else ""}
+        {"GROUP BY " + ", ".join(group_by) if group_by else "GROUP ALL"}
+    """
+    return await repo_query(query, params)
@@ -6,7 +6,6 @@ from urllib.parse import urlparse
 
 import requests
 import tomli
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from packaging.version import parse as parse_version
 
 
@@ -55,6 +54,8 @@ def split_text(txt: str, chunk_size=500):
     Returns:
         list: A list of text chunks.
     """
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
     overlap = int(chunk_size * 0.15)
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
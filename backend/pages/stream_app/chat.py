@@ -8,7 +8,7 @@ from loguru import logger
 from api.episode_profiles_service import episode_profiles_service
 from api.podcast_service import PodcastService
 from open_notebook.domain.notebook import ChatSession, Notebook
-from open_notebook.graphs.chat import graph as chat_graph
+from open_notebook.graphs.chat import get_graph as get_chat_graph
 
 # from open_notebook.plugins.podcasts import PodcastConfig
 from open_notebook.utils import parse_thinking_content, token_count
@@ -40,16 +40,22 @@ def build_context(notebook_id):
         elif item_type == "note":
             context_config["notes"][item_id] = status
 
-    # Get context via API
+    # Get context via API, which only sends it again when it changed
+    known_version = st.session_state[notebook_id].get("context_version")
+    if "context" not in st.session_state[notebook_id]:
+        known_version = None
     result = context_service.get_notebook_context(
-        notebook_id=notebook_id, context_config=context_config
+        notebook_id=notebook_id, context_config=context_config, version=known_version
     )
+    if result is None:
+        return st.session_state[notebook_id]["context"]
 
     # Store in session state for compatibility
     st.session_state[notebook_id]["context"] = {
         "note": result["notes"],
         "source": result["sources"],
     }
+    st.session_state[notebook_id]["context_version"] = result.get("version")
 
     return st.session_state[notebook_id]["context"]
 
@@ -58,7 +64,7 @@ def execute_chat(txt_input, context, current_session):
     current_state = st.session_state[current_session.id]
     current_state["messages"] += [txt_input]
     current_state["context"] = context
-    result = chat_graph.invoke(
+    result = get_chat_graph().invoke(
         input=current_state,
         config=RunnableConfig(configurable={"thread_id": current_session.id}),
     )
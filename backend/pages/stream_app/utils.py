@@ -11,7 +11,8 @@ nest_asyncio.apply()
 from api.models_service import models_service
 from open_notebook.database.migrate import MigrationManager
 from open_notebook.domain.notebook import ChatSession, Notebook
-from open_notebook.graphs.chat import ThreadState, graph
+from open_notebook.graphs.chat import ThreadState, get_graph
+from open_notebook.lifecycle import ensure_data_folders
 from open_notebook.utils import (
     compare_versions,
     get_installed_version,
@@ -86,7 +87,7 @@ def setup_stream_state(current_notebook: Notebook) -> ChatSession:
     st.session_state[current_notebook.id]["active_session"] = chat_session.id
 
     # gets the existing state for the session from Langgraph state
-    existing_state = graph.get_state(
+    existing_state = get_graph().get_state(
         {"configurable": {"thread_id": chat_session.id}}
     ).values
     if not existing_state or len(existing_state.keys()) == 0:
@@ -175,6 +176,7 @@ def setup_page(
     check_password()
     
     check_migration()
+    ensure_data_folders()
     
     # Skip model check if requested (e.g., on Models page)
     if not skip_model_check:
@@ -4,6 +4,7 @@ Script to populate default models in the database based on available API keys
 """
 import asyncio
 import os
+from typing import Any, Dict, List
 from open_notebook.database.repository import db_connection
 from open_notebook.domain.models import Model, DefaultModels
 
@@ -14,7 +15,7 @@ async def populate_models():
     openai_key = os.getenv("OPENAI_API_KEY")
     openrouter_key = os.getenv("OPENROUTER_API_KEY")
     
-    models_to_create = []
+    models_to_create: List[Dict[str, Any]] = []
     
     if openai_key:
         print("✅ OpenAI API key found - adding OpenAI models")
@@ -97,7 +98,7 @@ async def populate_models():
                 language_models = [m for m in models_to_create if m["type"] == "language"]
                 if language_models:
                     defaults.default_chat_model = language_models[0]["name"]
-                    await defaults.save()
+                    await defaults.update()
                     print(f"  ✅ Set default chat model: {defaults.default_chat_model}")
             
             if not defaults.default_embedding_model:
@@ -105,7 +106,7 @@ async def populate_models():
                 embedding_models = [m for m in models_to_create if m["type"] == "embedding"]
                 if embedding_models:
                     defaults.default_embedding_model = embedding_models[0]["name"]
-                    await defaults.save()
+                    await defaults.update()
                     print(f"  ✅ Set default embedding model: {defaults.default_embedding_model}")
                     
         except Exception as e:
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Startup script for the Open Notebook command worker.
+
+Runs the surreal-commands worker between open_notebook.lifecycle startup() and
+shutdown(), all on one event loop, so resources opened on the worker's loop
+(like the source graph's checkpoint connection) are closed on that loop too.
+Takes the options of surreal-commands-worker:
+
+    uv run run_worker.py --import-modules commands
+"""
+
+import argparse
+import asyncio
+import signal
+import sys
+from pathlib import Path
+
+from surreal_commands.core.worker import (
+    DEFAULT_MAX_TASKS,
+    configure_logging,
+    import_command_modules,
+    listen_for_commands,
+)
+
+# Add the current directory to Python path so imports work
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from open_notebook.lifecycle import shutdown, startup  # noqa: E402
+
+
+async def run(max_tasks: int) -> None:
+    # Stopping the worker (Ctrl+C, or SIGTERM from supervisord) cancels the
+    # listener, so shutdown still runs on this loop
+    listener = asyncio.current_task()
+    assert listener is not None
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, listener.cancel)
+
+    await startup()
+    try:
+        await listen_for_commands(max_tasks)
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--debug", "-d", action="store_true", help="Debug logging")
+    parser.add_argument(
+        "--max-tasks",
+        "-m",
+        type=int,
+        default=DEFAULT_MAX_TASKS,
+        help="Maximum number of concurrent tasks",
+    )
+    parser.add_argument(
+        "--import-modules",
+        "-i",
+        help="Comma-separated modules registering commands (SURREAL_COMMANDS_MODULES)",
+    )
+    args = parser.parse_args()
+
+    configure_logging(args.debug)
+    modules = [
+        module.strip()
+        for module in (args.import_modules or "").split(",")
+        if module.strip()
+    ]
+    import_command_modules(modules or None)
+    try:
+        asyncio.run(run(args.max_tasks))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
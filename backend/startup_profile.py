@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Startup profile of the Open Notebook API.
+
+Imports api.main in a fresh interpreter with `-X importtime` and reports the
+root packages and modules that took longest to import. With --check, exits with
+an error when the cold start takes longer than the budget, or when a heavy
+subsystem that should only load on first use is imported at startup:
+
+    uv run startup_profile.py
+    uv run startup_profile.py --check --budget 3
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# Subsystems imported on first use, which must not load with the API
+LAZY_MODULES = [
+    "esperanto",
+    "content_core",
+    "podcast_creator",
+    "langgraph",
+    "langchain_text_splitters",
+    "tiktoken",
+    "open_notebook.graphs",
+    "commands",
+]
+
+DEFAULT_BUDGET_SECONDS = float(os.getenv("API_STARTUP_BUDGET_SECONDS", "3"))
+
+# Runs in the child interpreter: time the import and list the lazy modules loaded
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import api.main
+seconds = time.perf_counter() - start
+lazy = {lazy!r}
+loaded = [name for name in lazy if name in sys.modules]
+print(json.dumps(dict(seconds=seconds, loaded=loaded)))
+"""
+
+
+def run_child(importtime: bool) -> Tuple[Dict, str]:
+    """Import the API in a new interpreter, returning its report and stderr."""
+    flags = ["-X", "importtime"] if importtime else []
+    result = subprocess.run(
+        [sys.executable, *flags, "-c", CHILD.format(lazy=LAZY_MODULES)],
+        cwd=Path(__file__).parent,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(f"Importing api.main failed:\n{result.stderr[-4000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self µs, cumulative µs) of each line of -X importtime output."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--top", type=int, default=20, help="Rows of each table")
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=DEFAULT_BUDGET_SECONDS,
+        help="Cold start budget in seconds (API_STARTUP_BUDGET_SECONDS)",
+    )
+    parser.add_argument(
+        "--check", action="store_true", help="Fail when over budget or not lazy"
+    )
+    parser.add_argument(
+        "--runs", type=int, default=3, help="Timed imports, the fastest counts"
+    )
+    args = parser.parse_args()
+
+    _, stderr = run_child(importtime=True)
+    modules = parse_importtime(stderr)
+
+    by_package: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in modules:
+        by_package[name.split(".")[0]] += self_us
+
+    packages = sorted(by_package.items(), key=lambda item: -item[1])
+    print(f"{'package':<40} {'self ms':>10}")
+    for package, self_us in packages[: args.top]:
+        print(f"{package:<40} {self_us / 1000:>10.1f}")
+
+    slowest = sorted(modules, key=lambda item: -item[2])
+    print(f"\n{'module':<60} {'cumulative ms':>14}")
+    for name, _, cumulative_us in slowest[: args.top]:
+        print(f"{name:<60} {cumulative_us / 1000:>14.1f}")
+
+    # Timed without -X importtime, which slows imports down
+    reports = [run_child(importtime=False)[0] for _ in range(max(args.runs, 1))]
+    seconds = min(report["seconds"] for report in reports)
+    loaded = reports[0]["loaded"]
+    print(f"\nAPI cold start: {seconds:.2f}s (budget {args.budget:.2f}s)")
+    if loaded:
+        print(f"Loaded at startup, should be lazy: {', '.join(loaded)}")
+
+    if args.check and (seconds > args.budget or loaded):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()